@@ -0,0 +1,127 @@
+"""
+Benchmark: scorecards from re-parsed XLSX exports against the Parquet data
+lake, on a multi-year dataset of monthly PO and invoice spreadsheets (3 years
+of 4,000 PO lines a month by default), for the full history and for the last
+12 months.
+
+Run from the backend directory:
+    python -m benchmarks.bench_data_lake [po_lines_per_month] [years]
+"""
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from services.data_lake import DataLake
+from services.ingestion import parse_po_file, parse_invoice_file
+from services.scorecard import calculate_scorecard
+
+
+def monthly_exports(lines: int, months: int, seed: int = 31) -> list:
+    """
+    (month start, PO xlsx bytes, invoice xlsx bytes) per month, with the
+    "Case A" headers real exports use.
+    """
+    rng = np.random.default_rng(seed)
+    exports = []
+    for month in range(months):
+        start = pd.Timestamp("2022-01-01") + pd.DateOffset(months=month)
+        issued = start + pd.to_timedelta(rng.integers(0, 28, lines), unit="D")
+        po_numbers = 1_000_000 + month * lines + np.arange(lines) // 4
+        po_df = pd.DataFrame({
+            "OMS_PO_NBR": po_numbers,
+            # Four distinct SKUs per PO
+            "ITEM_ID": [f"SKU-{i:04d}" for i in rng.integers(0, 500, lines) * 4 + np.arange(lines) % 4],
+            "ISSUE_DATE": issued,
+            "ORDERED_QTY": rng.integers(1, 200, lines),
+            "PO_AMT": rng.uniform(20, 20_000, lines).round(2),
+            "MUST_ARRIVE_BY_DATE": issued + pd.Timedelta(days=14),
+            "DEL_GATE_IN_DATE": issued + pd.to_timedelta(rng.integers(7, 21, lines), unit="D"),
+            "VENDOR": "Acme Industrial",
+        })
+        invoiced = po_df.sample(frac=0.95, random_state=month)
+        inv_df = pd.DataFrame({
+            "INV_NBR": [f"INV-{n}-{i}" for i, n in enumerate(invoiced["OMS_PO_NBR"])],
+            "PO_NBR": invoiced["OMS_PO_NBR"].to_numpy(),
+            "ITEM_ID": invoiced["ITEM_ID"].to_numpy(),
+            "INV_QTY": invoiced["ORDERED_QTY"].to_numpy() - (rng.random(len(invoiced)) < 0.04),
+            "INV_AMT": invoiced["PO_AMT"].to_numpy(),
+            "INV_DT": invoiced["ISSUE_DATE"].to_numpy() + pd.Timedelta(days=25),
+            "INV_STATUS": rng.choice(["Paid", "Open", "Disputed"], len(invoiced), p=[0.85, 0.12, 0.03]),
+        })
+        exports.append((start, _xlsx(po_df), _xlsx(inv_df)))
+    return exports
+
+
+def _xlsx(df: pd.DataFrame) -> bytes:
+    buffer = BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def parse_all(exports: list):
+    po_dfs = [parse_po_file(po, f"po_{start:%Y_%m}.xlsx") for start, po, _ in exports]
+    inv_dfs = [parse_invoice_file(inv, f"invoices_{start:%Y_%m}.xlsx") for start, _, inv in exports]
+    return po_dfs, inv_dfs
+
+
+def in_window(df: pd.DataFrame, start, end) -> pd.DataFrame:
+    return df[(df["date"] >= start) & (df["date"] < end)]
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 4_000
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    months = 12 * years
+    started = time.perf_counter()
+    exports = monthly_exports(lines, months)
+    size = sum(len(po) + len(inv) for _, po, inv in exports)
+    print(f"{months} monthly PO + invoice XLSX exports, {months * lines:,} PO lines, {size / 1e6:.1f} MB "
+          f"(generated in {time.perf_counter() - started:.1f} s)")
+    end = exports[-1][0] + pd.DateOffset(months=1)
+    window_start = end - pd.DateOffset(months=12)
+
+    # Today: every scorecard re-reads the spreadsheets
+    started = time.perf_counter()
+    po_dfs, inv_dfs = parse_all(exports)
+    parse_time = time.perf_counter() - started
+    po_df, inv_df = pd.concat(po_dfs, ignore_index=True), pd.concat(inv_dfs, ignore_index=True)
+    started = time.perf_counter()
+    xlsx_full = calculate_scorecard(po_df, inv_df)
+    xlsx_full_time = parse_time + time.perf_counter() - started
+    started = time.perf_counter()
+    xlsx_window = calculate_scorecard(in_window(po_df, window_start, end), in_window(inv_df, window_start, end))
+    xlsx_window_time = parse_time + time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as directory:
+        lake = DataLake(directory)
+        started = time.perf_counter()
+        for month, (po_month, inv_month) in enumerate(zip(po_dfs, inv_dfs)):
+            lake.append("acme", "po", po_month, f"po-{month}")
+            lake.append("acme", "invoice", inv_month, f"invoice-{month}")
+        ingest_time = time.perf_counter() - started
+        lake_size = sum(
+            os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names
+        )
+
+        started = time.perf_counter()
+        lake_full = lake.scorecard("acme")
+        lake_full_time = time.perf_counter() - started
+        started = time.perf_counter()
+        lake_window = lake.scorecard("acme", window_start, end)
+        lake_window_time = time.perf_counter() - started
+
+    print(f"parse XLSX once:                {parse_time:7.2f} s")
+    print(f"write to lake once:             {ingest_time:7.2f} s  ({lake_size / 1e6:.1f} MB of Parquet)")
+    print(f"full history    XLSX: {xlsx_full_time:7.2f} s   lake: {lake_full_time:6.3f} s   "
+          f"speedup {xlsx_full_time / lake_full_time:5.0f}x   same result: {xlsx_full == lake_full}")
+    print(f"last 12 months  XLSX: {xlsx_window_time:7.2f} s   lake: {lake_window_time:6.3f} s   "
+          f"speedup {xlsx_window_time / lake_window_time:5.0f}x   same result: {xlsx_window == lake_window}")
+
+
+if __name__ == "__main__":
+    main()
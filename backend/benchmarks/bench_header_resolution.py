@@ -0,0 +1,111 @@
+"""
+Benchmark: header resolution for new vs already seen export formats, and
+finding the table in a multi-sheet workbook by sniffing the first rows of each
+sheet against loading every sheet in full.
+
+Run from the backend directory:
+    python -m benchmarks.bench_header_resolution [rows_per_sheet] [sheets]
+"""
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from services.ingestion import parse_po_file, sniff_xlsx_header
+from utils.normalization import header_row_score, resolve_columns, resolution_cache_info
+
+# Export formats seen in the wild, none of them all exact keys of PO_COLUMN_MAP
+FORMATS = [
+    ("PO No.", "Order Date", "SKU", "Qty Ordered", "Delivery Date", "Promised Date", "Total Amount", "Supplier Name"),
+    ("PurchaseOrderNumber", "ItemSKU", "Quantity", "DeliveryDate", "PromisedDate", "OrderDate", "LineAmount"),
+    ("OMS_PO_NBR", "ITEM_ID", "ISSUE_DATE", "ORDERED_QTY", "PO_AMT", "MUST_ARRIVE_BY_DATE", "DEL_GATE_IN_DATE"),
+    ("Purchase Order #", "Item", "Quantitiy", "Del Date", "Vendor", "Notes", "Unit Price"),
+]
+
+
+def workbook(rows: int, sheets: int, seed: int = 41) -> bytes:
+    """
+    A workbook whose PO lines sit on its last sheet under a three-row title
+    block, after `sheets - 1` equally large sheets of other data.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+    lines = pd.DataFrame({
+        "PO No.": 100_000 + np.arange(rows) // 4,
+        "Item": [f"SKU-{i:04d}" for i in rng.integers(0, 2_000, rows)],
+        "Qty Ordered": rng.integers(1, 200, rows),
+        "Order Date": dates,
+        "Promised Date": dates + pd.Timedelta(days=14),
+        "Delivery Date": dates + pd.to_timedelta(rng.integers(7, 21, rows), unit="D"),
+        "Total Amount": rng.uniform(20, 20_000, rows).round(2),
+    })
+    other = pd.DataFrame({
+        "Region": rng.choice(["North", "South", "East", "West"], rows),
+        "Forecast": rng.uniform(0, 1e6, rows).round(2),
+        "Comment": [f"row {i}" for i in range(rows)],
+    })
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        for sheet in range(sheets - 1):
+            other.to_excel(writer, sheet_name=f"Forecast {sheet + 1}", index=False)
+        pd.DataFrame([["Acme Industrial - PO lines"], ["Exported 2024-12-31"]]).to_excel(
+            writer, sheet_name="PO Lines", index=False, header=False
+        )
+        lines.to_excel(writer, sheet_name="PO Lines", index=False, startrow=3)
+    return buffer.getvalue()
+
+
+def load_all_sheets(content: bytes) -> tuple:
+    """
+    The alternative to sniffing: read every sheet in full, keep the best one.
+    """
+    frames = pd.read_excel(BytesIO(content), sheet_name=None, header=None)
+    best = max(
+        ((name, index, header_row_score(row, "po")) for name, frame in frames.items()
+         for index, row in enumerate(frame.head(20).itertuples(index=False))),
+        key=lambda candidate: candidate[2],
+    )
+    return best[0], best[1]
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    sheets = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    repeats = 1_000
+
+    started = time.perf_counter()
+    for headers in FORMATS:
+        resolve_columns(headers, "po")
+    cold = (time.perf_counter() - started) / len(FORMATS)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for headers in FORMATS:
+            resolve_columns(headers, "po")
+    cached = (time.perf_counter() - started) / (repeats * len(FORMATS))
+    print(f"resolve a new header format:    {cold * 1000:8.3f} ms")
+    print(f"resolve a seen header format:   {cached * 1e6:8.3f} us   {resolution_cache_info()}")
+
+    content = workbook(rows, sheets)
+    print(f"\n{sheets}-sheet workbook, {rows:,} rows per sheet, PO lines on the last sheet "
+          f"({len(content) / 1e6:.1f} MB)")
+    started = time.perf_counter()
+    sniffed = sniff_xlsx_header(BytesIO(content), "po")
+    sniff_time = time.perf_counter() - started
+    started = time.perf_counter()
+    loaded = load_all_sheets(content)
+    load_time = time.perf_counter() - started
+    started = time.perf_counter()
+    df = parse_po_file(content, "po_lines.xlsx")
+    parse_time = time.perf_counter() - started
+
+    print(f"sniff sheet + header row:       {sniff_time:8.3f} s   -> {sniffed}")
+    print(f"load every sheet in full:       {load_time:8.3f} s   -> {loaded}   "
+          f"speedup {load_time / sniff_time:5.0f}x")
+    print(f"parse_po_file (sniff + read):   {parse_time:8.3f} s   -> {len(df):,} rows, "
+          f"columns {list(df.columns)}")
+
+
+if __name__ == "__main__":
+    main()
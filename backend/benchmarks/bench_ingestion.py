@@ -0,0 +1,72 @@
+"""
+Benchmark: invoice ingestion before and after vectorized status derivation and
+compact dtypes, on a synthetic invoice ledger (1M rows by default).
+
+Run from the backend directory:
+    python -m benchmarks.bench_ingestion [rows]
+"""
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from services.ingestion import parse_invoice_file
+from utils.normalization import normalize_columns
+
+
+def legacy_parse_invoice_file(file_content: bytes, filename: str) -> pd.DataFrame:
+    """
+    parse_invoice_file as it was before the schema pass: row-wise apply for status.
+    """
+    df = pd.read_csv(BytesIO(file_content))
+    df = normalize_columns(df, file_type="invoice")
+    if "status" not in df.columns:
+        if "amount_paid" in df.columns and "amount" in df.columns:
+            df["status"] = df.apply(
+                lambda x: "Paid" if pd.notnull(x["amount_paid"]) and pd.notnull(x["amount"]) and x["amount_paid"] >= x["amount"] - 0.01 else "Pending",
+                axis=1
+            )
+    return df
+
+
+def synthetic_invoice_csv(rows: int, seed: int = 11) -> bytes:
+    rng = np.random.default_rng(seed)
+    issued = pd.Timestamp("2021-01-01") + pd.to_timedelta(rng.integers(0, 1095, rows), unit="D")
+    amount = rng.uniform(50, 25_000, rows).round(2)
+    paid = np.where(rng.random(rows) < 0.85, amount, np.where(rng.random(rows) < 0.5, amount / 2, np.nan))
+    df = pd.DataFrame({
+        "INV_NBR": [f"INV{i:08d}" for i in range(rows)],
+        "PO_NBR": [f"PO{i // 3:07d}" for i in range(rows)],
+        "INV_AMT": amount,
+        "INV_DT": issued.strftime("%Y-%m-%d"),
+        "amount_paid": paid,
+        "vendor": rng.choice([f"Vendor {i}" for i in range(200)], rows),
+    })
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def measure(parser, content: bytes):
+    started = time.perf_counter()
+    df = parser(content, "invoices.csv")
+    return time.perf_counter() - started, df.memory_usage(deep=True).sum(), df
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    content = synthetic_invoice_csv(rows)
+    print(f"rows: {rows:,}  csv: {len(content) / 1e6:.1f} MB")
+
+    legacy_time, legacy_bytes, legacy_df = measure(legacy_parse_invoice_file, content)
+    new_time, new_bytes, new_df = measure(parse_invoice_file, content)
+
+    assert (legacy_df["status"].astype(str).values == new_df["status"].astype(str).values).all()
+    print(f"legacy: {legacy_time:7.2f} s  {legacy_bytes / 1e6:8.1f} MB in frame")
+    print(f"new:    {new_time:7.2f} s  {new_bytes / 1e6:8.1f} MB in frame")
+    print(f"speedup: {legacy_time / new_time:.1f}x  memory: {new_bytes / legacy_bytes:.0%} of legacy")
+    print(new_df.dtypes.to_string())
+
+
+if __name__ == "__main__":
+    main()
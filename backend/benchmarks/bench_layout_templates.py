@@ -0,0 +1,90 @@
+"""
+Benchmark: parse_financial_pdf on recurring statement layouts, in full vs
+through learned layout templates (services/layout_templates.py).
+
+Per layout, `documents` statements with the same pages and rows but different
+figures are parsed twice: with templates off, and with a fresh template store,
+where the first LEARN_AFTER documents are parsed in full (the last of them
+also learning the template) and the rest are read through the template.
+Reports milliseconds per document and whether both give the same line items.
+A last pass changes a row of the learned layout, which must be caught by
+validation and invalidate the template.
+
+Run from the backend directory:
+    python -m benchmarks.bench_layout_templates [documents] [pages] [backend]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.pop("OPENAI_API_KEY", None)
+os.environ["SUPPLIER_EVAL_TEMPLATE_PATH"] = os.path.join(tempfile.mkdtemp(), "layout_templates.sqlite3")
+
+from benchmarks import generators
+from services import layout_templates
+from services.financials import parse_financial_pdf
+from services.layout_templates import LayoutTemplateStore
+
+
+def layouts(documents: int, pages: int) -> dict:
+    return {
+        "statements": [generators.pdf_document(generators.statement_pages(pages, seed)) for seed in range(documents)],
+        "column tables": [generators.pdf_document(generators.statement_pages(pages, seed), columns=True)
+                          for seed in range(documents)],
+    }
+
+
+def timed_parses(pdfs: list, backend: str) -> tuple:
+    seconds, results = [], []
+    for pdf in pdfs:
+        started = time.perf_counter()
+        results.append(parse_financial_pdf(pdf, "statements.pdf", backend=backend))
+        seconds.append(time.perf_counter() - started)
+    return seconds, results
+
+
+def main():
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    backend = sys.argv[3] if len(sys.argv) > 3 else None
+    learn_after = layout_templates.template_store.learn_after
+
+    # Starts the process pool outside the timings
+    layout_templates.ENABLED = False
+    parse_financial_pdf(generators.financial_pdf(1), "warmup.pdf")
+
+    print(f"{documents} documents per layout, {pages} pages, backend {backend or 'default'}; "
+          f"templates are learned after {learn_after} full parses\n")
+    for name, pdfs in layouts(documents, pages).items():
+        layout_templates.ENABLED = False
+        full, expected = timed_parses(pdfs, backend)
+
+        layout_templates.ENABLED = True
+        layout_templates.template_store = LayoutTemplateStore(":memory:")
+        templated, results = timed_parses(pdfs, backend)
+        stats = layout_templates.template_store.stats()
+
+        print(f"{name}:")
+        print(f"  full parse                    {statistics.mean(full) * 1000:8.1f} ms per document")
+        print(f"  first {learn_after} (full parse + learning) {statistics.mean(templated[:learn_after]) * 1000:8.1f} ms per document")
+        if templated[learn_after:]:
+            print(f"  through the template          {statistics.mean(templated[learn_after:]) * 1000:8.1f} ms per document "
+                  f"({statistics.mean(full[learn_after:]) / statistics.mean(templated[learn_after:]):.0f}x)")
+        print(f"  same line items: {sum(a == b for a, b in zip(results, expected))}/{documents}; "
+              f"template hits {stats['hits']}, learned {stats['learned']}")
+
+        # A row added above the liabilities moves them down: the labels no longer
+        # match and the template is dropped
+        content = generators.statement_pages(pages, documents)
+        content[-1].insert(4, "Goodwill 1,234")
+        changed = parse_financial_pdf(generators.pdf_document(content, columns=name == "column tables"), "changed.pdf",
+                                      backend=backend)
+        stats = layout_templates.template_store.stats()
+        print(f"  changed layout: parsed in full {'correctly' if changed == generators.expected_financials(documents) else 'INCORRECTLY'}, "
+              f"templates invalidated {stats['invalidated']}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark and offline check of the LLM response cache, against the stub client
+(benchmarks/llm_stub.py) installed through llm_analysis.set_client:
+
+  - caching: a lender analysis asked for twice reaches the client once; the
+    repeat is answered from SQLite.
+  - coalescing: `threads` identical analyses started together share one call.
+  - expiry: an entry older than the TTL is fetched again.
+  - failures: a cache whose database cannot be opened still answers every
+    call, counts the errors and logs a warning for each lookup and store.
+
+Run from the backend directory:
+    python -m benchmarks.bench_llm_cache [threads] [delay_seconds]
+"""
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+WORK_DIR = tempfile.mkdtemp(prefix="supplier-eval-llm-cache-")
+os.environ.setdefault("SUPPLIER_EVAL_LLM_CACHE_PATH", os.path.join(WORK_DIR, "llm_responses.sqlite3"))
+
+from benchmarks import llm_stub
+from services import llm_analysis
+from services.llm_cache import LLMResponseCache, llm_cache
+
+TTL_SECONDS = 0.5
+MESSAGES = [{"role": "user", "content": "Summarise the supplier."}]
+
+
+class Captured(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def analysis(grade: str) -> dict:
+    return llm_analysis.generate_lender_analysis({"on_time_delivery_rate": 91.5}, {"current_ratio": 1.4}, 72.5, grade)
+
+
+def ask(cache: LLMResponseCache, stub) -> dict:
+    # What llm_analysis._chat_json does, against a cache of our own
+    call = lambda: json.loads(stub.create("gpt-4o", MESSAGES).choices[0].message.content)
+    return cache.get_or_call("gpt-4o", MESSAGES, call)
+
+
+def timed(func, *args) -> tuple:
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def caching(stub):
+    calls = stub.calls
+    miss, first = timed(analysis, "Good")
+    hit, repeat = timed(analysis, "Good")
+    print("caching:")
+    print(f"  first call (client)  {miss * 1000:8.2f} ms")
+    print(f"  repeat (cache)       {hit * 1000:8.2f} ms ({miss / hit:.0f}x)")
+    print(f"  one client call: {stub.calls - calls == 1}; same response: {first == repeat == llm_stub.STUB_ANALYSIS}\n")
+
+
+def coalescing(stub, threads: int):
+    calls, before = stub.calls, llm_cache.stats()
+    with ThreadPoolExecutor(threads) as pool:
+        elapsed, responses = timed(lambda: list(pool.map(analysis, ["Fair"] * threads)))
+    after = llm_cache.stats()
+    print(f"coalescing ({threads} identical concurrent calls):")
+    print(f"  all answered in      {elapsed * 1000:8.2f} ms")
+    print(f"  one client call: {stub.calls - calls == 1}; coalesced {after['coalesced'] - before['coalesced']}, "
+          f"cache hits {after['hits'] - before['hits']}; same responses: {all(r == responses[0] for r in responses)}\n")
+
+
+def expiry(stub):
+    cache = LLMResponseCache(os.path.join(WORK_DIR, "expiring.sqlite3"), ttl_seconds=TTL_SECONDS)
+    calls = stub.calls
+    ask(cache, stub)
+    ask(cache, stub)
+    fresh = stub.calls - calls
+    time.sleep(TTL_SECONDS * 1.2)
+    ask(cache, stub)
+    print(f"expiry ({TTL_SECONDS} s TTL):")
+    print(f"  client calls within the TTL: {fresh}; after it: {stub.calls - calls - fresh}; "
+          f"refetched: {fresh == 1 and stub.calls - calls == 2}\n")
+
+
+def failures(stub):
+    # A directory cannot be opened as a database, so every lookup and store fails
+    cache = LLMResponseCache(WORK_DIR)
+    captured = Captured()
+    logger = logging.getLogger("services.llm_cache")
+    logger.addHandler(captured)
+    try:
+        responses = [ask(cache, stub) for _ in range(2)]
+    finally:
+        logger.removeHandler(captured)
+    print("failures (unopenable cache database):")
+    print(f"  answered: {all(response is not None for response in responses)}; errors counted: {cache.stats()['errors']}; "
+          f"warnings logged: {len(captured.messages)}")
+    for message in dict.fromkeys(captured.messages):
+        print(f"    {message}")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    stub = llm_stub.StubLLMClient(delay)
+    llm_analysis.set_client(stub)
+    try:
+        caching(stub)
+        coalescing(stub, threads)
+        expiry(stub)
+        failures(stub)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
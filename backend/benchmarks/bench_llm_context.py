@@ -0,0 +1,111 @@
+"""
+Benchmark: prompt size, latency and recall of the LLM extraction fallback, for
+the first 4,000 characters of the statement pages (the previous prompt) vs the
+relevance-ranked, token-budgeted excerpts of the document index.
+
+The set is generated annual reports (generators.report_pages) with a cover
+page, auditor's report and 1-5 pages of management review before statements
+whose revenue, profit, inventory and equity labels the regex matcher does not
+know. The LLM is the local stub, which reports the line items visible in its
+prompt and answers after `delay` seconds plus `per_token` seconds per prompt
+token; latency is measured end to end (index, prompt, call).
+
+Run from the backend directory:
+    python -m benchmarks.bench_llm_context [documents] [delay] [per_token] [budgets]
+e.g. python -m benchmarks.bench_llm_context 20 0.3 0.0005 250,500,1000,2000
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Every prompt reaches the (stubbed) LLM instead of the response cache
+os.environ.setdefault("SUPPLIER_EVAL_LLM_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "llm_responses.sqlite3"))
+os.environ.setdefault("SUPPLIER_EVAL_LLM_CACHE_TTL", "0")
+os.environ.setdefault("SUPPLIER_EVAL_LAYOUT_TEMPLATES", "0")
+
+from benchmarks import generators, llm_stub
+from services import llm_analysis
+from services.document_index import DocumentIndex
+from services.financials import extract_pdf_pages
+from services.line_items import match_line_items
+
+
+def legacy_extract(text: str) -> dict:
+    """
+    The previous fallback: every key, from the first 4,000 characters of the
+    statement pages.
+    """
+    prompt = f"""
+    Extract the following financial metrics from the text below. Return a JSON object with keys:
+    "revenue", "net_income", "total_assets", "total_liabilities", "current_assets", "current_liabilities", "inventory", "equity".
+
+    If a value is not found, use null. Return ONLY the JSON.
+
+    **Text**:
+    {text[:4000]} # Truncate to avoid token limits if needed
+    """
+    return llm_analysis._chat_json("gpt-3.5-turbo", [
+        {"role": "system", "content": "You are a data extraction assistant. Extract financial numbers accurately."},
+        {"role": "user", "content": prompt}
+    ])
+
+
+def documents(count: int) -> list:
+    """
+    (pages, statement text, regex result, expected line items) per report.
+    """
+    result = []
+    for seed in range(count):
+        pdf = generators.pdf_document(generators.report_pages(seed=seed, narrative_pages=seed % 5 + 1))
+        pages, statement_pages = extract_pdf_pages(pdf)
+        text = "\n".join(pages[n] for n in statement_pages)
+        result.append((pages, text, match_line_items(text), generators.expected_financials(seed)))
+    return result
+
+
+def run(docs: list, stub, extract) -> dict:
+    tokens, seconds, recovered, wanted, complete = [], [], 0, 0, 0
+    for pages, text, data, expected in docs:
+        missing = [key for key in expected if key not in data]
+        calls = len(stub.prompt_tokens)
+        started = time.perf_counter()
+        found = extract(pages, text, missing)
+        seconds.append(time.perf_counter() - started)
+        tokens.append(sum(stub.prompt_tokens[calls:]))
+        hits = sum(found.get(key) is not None and float(found[key]) == expected[key] for key in missing)
+        recovered += hits
+        wanted += len(missing)
+        complete += hits == len(missing)
+    return {
+        "tokens": statistics.mean(tokens), "max_tokens": max(tokens),
+        "ms": statistics.mean(seconds) * 1000, "recovered": recovered, "wanted": wanted, "complete": complete,
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    per_token = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0005
+    budgets = [int(b) for b in sys.argv[4].split(",")] if len(sys.argv) > 4 else [250, 500, 1000, 2000]
+
+    stub, _ = llm_stub.install(delay, per_token)
+    docs = documents(count)
+    print(f"{count} reports, {statistics.mean(len(text) for _, text, _, _ in docs):,.0f} characters of statement-page "
+          f"text on average; stub LLM: {delay * 1000:.0f} ms + {per_token * 1e6:.0f} µs per prompt token\n")
+    print(f"{'context':<26} {'prompt tokens':>14} {'(max)':>7} {'latency':>10} {'keys recovered':>16} {'reports complete':>17}")
+
+    cases = [("first 4,000 chars", lambda pages, text, missing: legacy_extract(text))]
+    for budget in budgets:
+        cases.append((f"ranked, {budget} token budget",
+                      lambda pages, text, missing, budget=budget: llm_analysis.extract_financials_with_llm(
+                          DocumentIndex(pages), keys=missing, token_budget=budget)))
+    for name, extract in cases:
+        result = run(docs, stub, extract)
+        print(f"{name:<26} {result['tokens']:>14,.0f} {result['max_tokens']:>7,} {result['ms']:>8.0f} ms "
+              f"{result['recovered']:>9} / {result['wanted']:<4} {result['complete']:>10} / {count}")
+
+
+if __name__ == "__main__":
+    main()
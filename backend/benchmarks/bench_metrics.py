@@ -0,0 +1,103 @@
+"""
+Benchmark: overhead of the stage spans, counters and request middleware
+(services/metrics.py), with metrics enabled against disabled, on the fastest
+request path (a /upload/scorecard whose files are already in the document
+cache) and on a full parse + scorecard of fresh uploads.
+
+Run from the backend directory:
+    python -m benchmarks.bench_metrics [lines] [rounds]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("SUPPLIER_EVAL_CACHE_DIR", tempfile.mkdtemp())
+
+from fastapi.testclient import TestClient
+
+import main as api
+from services import metrics
+from services.ingestion import parse_invoice_file, parse_po_file
+from services.scorecard import calculate_scorecard
+
+
+def uploads(lines: int, seed: int = 17) -> tuple:
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, lines), unit="D")
+    po_df = pd.DataFrame({
+        "PO Number": 10_000 + np.arange(lines) // 3,
+        "SKU": [f"SKU-{i}" for i in rng.integers(0, 300, lines)],
+        "Quantity": rng.integers(1, 100, lines),
+        "Amount": rng.uniform(10, 5_000, lines).round(2),
+        "Date": dates,
+        "Promised Date": dates + pd.Timedelta(days=10),
+        "Delivery Date": dates + pd.to_timedelta(rng.integers(5, 15, lines), unit="D"),
+    })
+    inv_df = pd.DataFrame({
+        "Invoice Number": [f"INV-{i}" for i in range(lines)],
+        "PO Number": po_df["PO Number"],
+        "SKU": po_df["SKU"],
+        "Quantity": po_df["Quantity"],
+        "Amount": po_df["Amount"],
+        "Date": dates + pd.Timedelta(days=20),
+        "Status": rng.choice(["Paid", "Open"], lines, p=[0.9, 0.1]),
+    })
+    return po_df.to_csv(index=False).encode(), inv_df.to_csv(index=False).encode()
+
+
+def timed_rounds(run, rounds: int) -> dict:
+    """
+    Median seconds of `run` with metrics on and off, alternating so drift
+    affects both alike.
+    """
+    times = {True: [], False: []}
+    for _ in range(rounds):
+        for enabled in (True, False):
+            metrics.ENABLED = enabled
+            started = time.perf_counter()
+            run()
+            times[enabled].append(time.perf_counter() - started)
+    metrics.ENABLED = True
+    return {enabled: statistics.median(samples) for enabled, samples in times.items()}
+
+
+def report(label: str, medians: dict):
+    overhead = (medians[True] - medians[False]) / medians[False] * 100
+    print(f"{label:<38} on {medians[True] * 1000:8.2f} ms   off {medians[False] * 1000:8.2f} ms   "
+          f"overhead {overhead:+5.2f}%")
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    po_csv, inv_csv = uploads(lines)
+    print(f"{lines:,} PO + invoice lines, {rounds} rounds each way")
+
+    started = time.perf_counter()
+    for _ in range(100_000):
+        with metrics.span("bench"):
+            pass
+    print(f"one span:                              {(time.perf_counter() - started) * 10:8.3f} us")
+
+    report("parse + scorecard (fresh uploads)", timed_rounds(
+        lambda: calculate_scorecard(parse_po_file(po_csv, "po.csv"), parse_invoice_file(inv_csv, "inv.csv")),
+        rounds,
+    ))
+
+    with TestClient(api.app) as client:
+        files = [("po_files", ("po.csv", po_csv)), ("inv_files", ("inv.csv", inv_csv))]
+        client.post("/upload/scorecard", files=files)  # parse once into the document cache
+        report("/upload/scorecard (cached uploads)", timed_rounds(
+            lambda: client.post("/upload/scorecard", files=files).raise_for_status(), rounds,
+        ))
+        scrape = client.get("/metrics")
+        print(f"/metrics: {len(scrape.text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: PDF text backends (services/pdf_text.py) on generated statements.
+
+Per sample set, reports
+  - raw extraction speed of every backend in this process (pages/second),
+  - extract_pdf_pages end to end with backend pdfplumber, pdfium and auto
+    (pages/second, including the process pool),
+  - agreement: documents whose parsed line items equal pdfplumber's and the
+    generated figures, and the share of statement-page lines PDFium's text has
+    in common with pdfplumber's layout text.
+
+Sample sets: statements after notes pages (generators.statement_pages), the
+same written as separate label and amount columns, and annual reports with
+front matter (generators.report_pages; regex only, the LLM fallback is off,
+so only the standard labels are compared with the generated figures).
+
+Run from the backend directory:
+    python -m benchmarks.bench_pdf_backends [documents] [pages]
+"""
+import difflib
+import os
+import sys
+import time
+
+# Line items are compared as the regex finds them, never through a layout template
+os.environ.pop("OPENAI_API_KEY", None)
+os.environ["SUPPLIER_EVAL_LAYOUT_TEMPLATES"] = "0"
+
+from benchmarks import generators
+from services.financials import STATEMENT_PAGE_HINTS, extract_pdf_pages, parse_financial_pdf
+from services.pdf_text import BACKENDS, extract_page_range
+
+PIPELINES = ("pdfplumber", "pdfium", "auto")
+
+
+def sample_sets(documents: int, pages: int) -> dict:
+    """
+    {set name: [(pdf bytes, expected line items)]}
+    """
+    return {
+        "statements": [
+            (generators.financial_pdf(pages, seed=seed), generators.expected_financials(seed))
+            for seed in range(documents)
+        ],
+        "column tables": [
+            (generators.pdf_document(generators.statement_pages(pages, seed), columns=True),
+             generators.expected_financials(seed))
+            for seed in range(documents)
+        ],
+        "annual reports": [
+            (generators.pdf_document(generators.report_pages(seed, narrative_pages=3, notes_pages=pages - 6)),
+             {key: value for key, value in generators.expected_financials(seed).items()
+              if generators.UNCOMMON_LABELS[key] == generators.STATEMENT_LABELS[key]})
+            for seed in range(documents)
+        ],
+    }
+
+
+def _line_agreement(fast: str, layout: str) -> float:
+    normalize = lambda text: [" ".join(line.split()) for line in text.splitlines() if line.strip()]
+    return difflib.SequenceMatcher(None, normalize(fast), normalize(layout), autojunk=False).ratio()
+
+
+def main():
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    pages = max(int(sys.argv[2]) if len(sys.argv) > 2 else 20, 7)
+
+    # Starts the process pool outside the timings
+    extract_pdf_pages(generators.financial_pdf(1), backend="pdfplumber")
+
+    for name, samples in sample_sets(documents, pages).items():
+        total_pages = sum(len(extract_pdf_pages(pdf, backend="pdfium")[0]) for pdf, _ in samples)
+        print(f"\n{name}: {documents} documents, {total_pages} pages")
+
+        for backend in BACKENDS:
+            started = time.perf_counter()
+            for pdf, _ in samples:
+                extract_page_range(pdf, list(range(total_pages // documents)), backend)
+            print(f"  {backend + ' (in process)':<32} {total_pages / (time.perf_counter() - started):9.1f} pages/s")
+
+        results = {}
+        for pipeline in PIPELINES:
+            started = time.perf_counter()
+            for pdf, _ in samples:
+                extract_pdf_pages(pdf, backend=pipeline)
+            speed = total_pages / (time.perf_counter() - started)
+            results[pipeline] = [parse_financial_pdf(pdf, "statements.pdf", backend=pipeline) for pdf, _ in samples]
+            correct = sum(
+                all(parsed.get(key) == value for key, value in expected.items())
+                for parsed, (_, expected) in zip(results[pipeline], samples)
+            )
+            same = sum(parsed == reference for parsed, reference in zip(results[pipeline], results["pdfplumber"]))
+            print(f"  {'extract_pdf_pages, ' + pipeline:<32} {speed:9.1f} pages/s   "
+                  f"line items: {same}/{documents} as pdfplumber, {correct}/{documents} correct")
+
+        ratios = []
+        for pdf, _ in samples:
+            fast, statement_pages = extract_pdf_pages(pdf, backend="pdfium")
+            statement_pages = [n for n in statement_pages if STATEMENT_PAGE_HINTS.search(fast[n])]
+            layout = extract_page_range(pdf, statement_pages, "pdfplumber")
+            ratios += [_line_agreement(fast[n], text) for n, text in zip(statement_pages, layout)]
+        print(f"  statement-page lines shared by pdfium and pdfplumber layout text: "
+              f"{sum(ratios) / max(len(ratios), 1):.1%} ({len(ratios)} pages)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark: dashboard performance slices from the supplier store's performance
+cube against scorecards computed over raw lines, and date parsing at
+ingestion with formats cached per header signature.
+
+  - dates: a PO export whose date columns mix two formats (80% ISO date-times,
+    20% US date-times, almost all distinct), as CSV. Its date columns parsed with pandas' own inference
+    (which falls back to element-by-element parsing), and with format
+    inference on the first upload and cached formats on repeats.
+  - slices: `months` of PO and invoice lines folded into the supplier store
+    and written to the data lake. The monthly on-time/paid series, its
+    3-month rolling series and one SKU's monthly series, read from the cube
+    against one data lake scorecard (or filtered line read) per month.
+
+Run from the backend directory:
+    python -m benchmarks.bench_performance_cube [po_lines] [months]
+"""
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import generators
+from services import ingestion
+from services.data_lake import DataLake
+from services.ingestion import apply_ingestion_schema, parse_invoice_file, parse_po_file
+from services.scorecard import calculate_scorecard
+from services.supplier_store import SupplierStore
+from utils.normalization import header_signature, normalize_columns
+
+ROLLING = 3
+
+
+def mixed_date_export(rows: int) -> bytes:
+    """
+    A PO export as CSV, its date columns written as ISO or US date-times.
+    """
+    po = generators.po_frame(rows, seed=5)
+    rng = np.random.default_rng(5)
+    us = rng.random(rows) < 0.2
+    for column in ("ISSUE_DATE", "MUST_ARRIVE_BY_DATE", "DEL_GATE_IN_DATE"):
+        # Seconds since the start of the day make most values distinct
+        dates = po[column] + pd.to_timedelta(rng.integers(0, 86_400, rows), unit="s")
+        po[column] = np.where(us, dates.dt.strftime("%m/%d/%Y %H:%M"), dates.dt.strftime("%Y-%m-%d %H:%M:%S"))
+    buffer = BytesIO()
+    po.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+def timed(func, *args, **kwargs) -> tuple:
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def date_parsing(rows: int):
+    raw = pd.read_csv(BytesIO(mixed_date_export(rows)))
+    signature = header_signature(raw.columns)
+    normalized = normalize_columns(raw, file_type="po")
+
+    inferred, expected = timed(apply_ingestion_schema, normalized.copy())
+    first, parsed = timed(apply_ingestion_schema, normalized.copy(), signature)
+    repeat, _ = timed(apply_ingestion_schema, normalized.copy(), signature)
+    same = all(parsed[column].equals(expected[column]) for column in ("date", "promised_date", "delivery_date"))
+
+    print(f"date columns of {rows:,} PO lines, mixed formats:")
+    print(f"  pandas inference       {inferred * 1000:8.1f} ms")
+    print(f"  first upload (infer)   {first * 1000:8.1f} ms")
+    print(f"  repeat (cached)        {repeat * 1000:8.1f} ms ({inferred / repeat:.1f}x)")
+    print(f"  same dates: {same}; cached formats {ingestion.date_format_stats()}\n")
+
+
+def monthly_windows(months: list) -> list:
+    return [(pd.Period(month, freq="M").start_time, (pd.Period(month, freq="M") + 1).start_time) for month in months]
+
+
+def slices(rows: int, months: int):
+    po = generators.po_frame(rows, seed=11, days=months * 30)
+    po_bytes, extension = generators.export(po, "csv")
+    inv_bytes, _ = generators.export(generators.invoice_frame(po, seed=11), "csv")
+    po_df = parse_po_file(po_bytes, f"po.{extension}")
+    inv_df = parse_invoice_file(inv_bytes, f"inv.{extension}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SupplierStore(os.path.join(directory, "suppliers.sqlite3"))
+        lake = DataLake(os.path.join(directory, "lake"))
+        fold, _ = timed(store.fold, "acme", po_df, inv_df)
+        lake.append("acme", "po", po_df, "po")
+        lake.append("acme", "invoice", inv_df, "invoice")
+        print(f"{len(po_df):,} PO and {len(inv_df):,} invoice lines over {months} months; "
+              f"fold with the cube {fold:.2f} s\n")
+
+        cube, series = timed(store.performance, "acme", group_by=["month"])
+        months_seen = [row["month"] for row in series if row["po_lines"]]
+        windows = monthly_windows(months_seen)
+        raw, scorecards = timed(lambda: [lake.scorecard("acme", start, end) for start, end in windows])
+        same = all(
+            row["on_time_delivery_rate"] == scorecard["on_time_delivery_rate"]
+            for row, scorecard in zip([row for row in series if row["po_lines"]], scorecards)
+        )
+        print(f"monthly series ({len(windows)} months):")
+        print(f"  data lake scorecard per month {raw * 1000:9.1f} ms")
+        print(f"  performance cube              {cube * 1000:9.1f} ms ({raw / cube:.0f}x); same on-time rates: {same}")
+
+        cube, rolling = timed(store.performance, "acme", group_by=["month"], rolling=ROLLING)
+        trailing = [(start - pd.DateOffset(months=ROLLING - 1), end) for start, end in windows]
+        raw, scorecards = timed(lambda: [lake.scorecard("acme", start, end) for start, end in trailing])
+        rates = {row["month"]: row["on_time_delivery_rate"] for row in rolling}
+        same = all(rates[month] == scorecard["on_time_delivery_rate"] for month, scorecard in zip(months_seen, scorecards))
+        print(f"{ROLLING}-month rolling series:")
+        print(f"  data lake scorecard per month {raw * 1000:9.1f} ms")
+        print(f"  performance cube              {cube * 1000:9.1f} ms ({raw / cube:.0f}x); same on-time rates: {same}")
+
+        sku = str(po_df["sku"].iloc[0])
+        cube, sku_series = timed(store.performance, "acme", group_by=["month"], skus=[sku])
+
+        def sku_scorecards():
+            lines = lake.read("acme", "po")
+            lines = lines[lines["sku"].astype(str) == sku]
+            windowed = [lines[(lines["date"] >= start) & (lines["date"] < end)] for start, end in windows]
+            return {month: calculate_scorecard(window, pd.DataFrame())
+                    for month, window in zip(months_seen, windowed) if len(window)}
+
+        raw, scorecards = timed(sku_scorecards)
+        rates = {row["month"]: row["on_time_delivery_rate"] for row in sku_series if row["po_lines"]}
+        same = rates == {month: scorecard["on_time_delivery_rate"] for month, scorecard in scorecards.items()}
+        print("one SKU's monthly series:")
+        print(f"  line read + scorecard per month {raw * 1000:7.1f} ms")
+        print(f"  performance cube                {cube * 1000:7.1f} ms ({raw / cube:.0f}x); same on-time rates: {same}")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    months = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    date_parsing(rows)
+    slices(rows, months)
+
+
+if __name__ == "__main__":
+    main()
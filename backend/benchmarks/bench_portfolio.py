@@ -0,0 +1,120 @@
+"""
+Benchmark: portfolio scoring, scalar (calculate_overall_score +
+identify_lender_concerns per supplier) against the columnar engine, with a
+bit-for-bit comparison of the two. 1M suppliers by default; the scalar path
+runs on a sample and is extrapolated.
+
+Run from the backend directory:
+    python -m benchmarks.bench_portfolio [suppliers]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.portfolio import score_portfolio, portfolio_frame
+from services.synthesis import calculate_overall_score, identify_lender_concerns
+
+SCALAR_SAMPLE = 100_000
+
+
+def synthetic_evaluations(suppliers: int, seed: int = 17) -> list:
+    """
+    (scorecard_metrics, financial_ratios, trends) triples shaped like the real ones:
+    values rounded to 2 decimals, some "N/A (...)" strings, values right on the
+    thresholds, ints as well as floats, and NaN on-time rates (suppliers with
+    no PO lines).
+    """
+    rng = np.random.default_rng(seed)
+
+    def column(low, high, edges):
+        values = rng.uniform(low, high, suppliers).round(2).astype(object)
+        on_edge = rng.random(suppliers) < 0.05
+        values[on_edge] = rng.choice(edges, on_edge.sum())
+        as_int = rng.random(suppliers) < 0.05
+        values[as_int] = [int(round(v)) for v in values[as_int]]
+        values[rng.random(suppliers) < 0.1] = "N/A (Missing data)"
+        return values
+
+    otd = column(0, 100, [70, 70.0, 69.99, 0.3, 0.5, 50.1])
+    otd[rng.random(suppliers) < 0.02] = float("nan")
+    ipr = column(0, 100, [80, 80.0, 79.99, 0.7, 85.05])
+    cr = column(0, 3, [1.5, 1.0, 0.99, 1.49])
+    nm = column(-20, 30, [15, 5, 0, 0.0, -0.01, 14.99])
+    de = column(0, 4, [1.0, 2.0, 2.5, 2.51])
+    growth = column(-30, 30, [-10, -10.0, -9.99, 0, 0.0, -0.01])
+    margin_change = column(-10, 10, [-5, -5.0, -4.99])
+    leverage_change = column(-1, 1, [0.5, 0.49])
+    return [
+        ({"on_time_delivery_rate": otd[i], "invoice_paid_rate": ipr[i]},
+         {"current_ratio": cr[i], "net_margin": nm[i], "debt_to_equity": de[i]},
+         {"revenue_growth": growth[i], "net_margin_change": margin_change[i], "debt_to_equity_change": leverage_change[i]})
+        for i in range(suppliers)
+    ]
+
+
+def scalar_scores(evaluations: list) -> list:
+    return [
+        (calculate_overall_score(scorecard, ratios, trends=trends), identify_lender_concerns(scorecard, ratios, trends=trends))
+        for scorecard, ratios, trends in evaluations
+    ]
+
+
+def mismatches(scalar: list, columnar: pd.DataFrame) -> int:
+    """
+    Rows where any output differs. Floats are compared by their exact bits.
+    """
+    bits = lambda value: np.float64(value).tobytes()
+    count = 0
+    for (overall, concerns), row in zip(scalar, columnar.itertuples(index=False)):
+        if (bits(overall["score"]) != bits(row.score)
+                or overall["grade"] != row.grade
+                or bits(overall["breakdown"]["operational_score"]) != bits(row.operational_score)
+                or bits(overall["breakdown"]["financial_score"]) != bits(row.financial_score)
+                or bits(overall["breakdown"]["trend_score"]) != bits(row.trend_score)
+                or concerns != row.lender_concerns):
+            count += 1
+    return count
+
+
+def main():
+    suppliers = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    evaluations = synthetic_evaluations(suppliers)
+    df = portfolio_frame(evaluations)
+    print(f"suppliers: {suppliers:,}")
+
+    sample = evaluations[:SCALAR_SAMPLE]
+    started = time.perf_counter()
+    scalar = scalar_scores(sample)
+    scalar_time = (time.perf_counter() - started) * suppliers / len(sample)
+
+    started = time.perf_counter()
+    flags_only = score_portfolio(df, with_concerns=False)
+    flags_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    columnar = score_portfolio(df)
+    columnar_time = time.perf_counter() - started
+
+    # Typed float columns, as read back from a batch result file (N/A -> NaN)
+    typed = df.apply(lambda column: pd.to_numeric(column, errors="coerce"))
+    started = time.perf_counter()
+    score_portfolio(typed, with_concerns=False)
+    typed_time = time.perf_counter() - started
+
+    per_million = 1_000_000 / suppliers
+    print(f"scalar (extrapolated):       {scalar_time * per_million:7.2f} s per 1M suppliers")
+    print(f"columnar, flags only:        {flags_time * per_million:7.2f} s per 1M suppliers")
+    print(f"columnar, concern messages:  {columnar_time * per_million:7.2f} s per 1M suppliers")
+    print(f"columnar, float columns:     {typed_time * per_million:7.2f} s per 1M suppliers")
+    print(f"speedup: {scalar_time / flags_time:.0f}x (flags), {scalar_time / columnar_time:.0f}x (messages), "
+          f"{scalar_time / typed_time:.0f}x (float columns)")
+
+    differing = mismatches(scalar, columnar.iloc[:len(sample)])
+    print(f"bit-identical on {len(sample):,} sampled suppliers: {differing == 0} ({differing} differing)")
+    print(flags_only["grade"].value_counts().to_string())
+
+
+if __name__ == "__main__":
+    main()
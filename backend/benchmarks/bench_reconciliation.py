@@ -0,0 +1,82 @@
+"""
+Benchmark: PO <-> invoice reconciliation on a synthetic ledger (2M PO lines and
+roughly as many invoice lines by default), whole-frame and in chunks.
+
+Run from the backend directory:
+    python -m benchmarks.bench_reconciliation [po_lines]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.reconciliation import aggregate_po_lines, aggregate_invoice_lines, reconcile
+from services.scorecard import ScorecardAccumulator
+
+
+def synthetic_ledger(po_lines: int, seed: int = 13):
+    """
+    PO lines over ~po_lines / 6 POs and 40 SKUs, and invoices for 90% of them.
+    Invoice PO numbers are strings with stray whitespace, as they come out of
+    a different system.
+    """
+    rng = np.random.default_rng(seed)
+    ordered = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 730, po_lines), unit="D")
+    po_df = pd.DataFrame({
+        "po_number": rng.integers(100_000, 100_000 + po_lines // 6, po_lines),
+        "sku": pd.Categorical(rng.choice([f"SKU-{i:03d}" for i in range(40)], po_lines)),
+        "quantity": pd.array(rng.integers(1, 50, po_lines), dtype="Int32"),
+        "amount": rng.uniform(10, 5_000, po_lines).round(2),
+        "date": ordered,
+    })
+
+    inv_df = po_df.sample(frac=0.9, random_state=seed).reset_index(drop=True)
+    short = rng.random(len(inv_df)) < 0.05
+    inv_df["quantity"] = inv_df["quantity"].where(~short, inv_df["quantity"] - 1)
+    inv_df["date"] = inv_df["date"] + pd.to_timedelta(rng.integers(0, 45, len(inv_df)), unit="D")
+    inv_df["po_number"] = inv_df["po_number"].astype(str) + " "
+    return po_df, inv_df
+
+
+def cartesian_rows(po_df: pd.DataFrame, inv_df: pd.DataFrame) -> int:
+    """
+    Rows the old line-level merge on po_number would have produced.
+    """
+    po_counts = po_df["po_number"].astype(str).value_counts()
+    inv_counts = inv_df["po_number"].str.strip().value_counts()
+    return int((po_counts * inv_counts.reindex(po_counts.index, fill_value=0)).sum())
+
+
+def main():
+    po_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    po_df, inv_df = synthetic_ledger(po_lines)
+    print(f"po lines: {len(po_df):,}  invoice lines: {len(inv_df):,}")
+    print(f"line-level merge on po_number would produce {cartesian_rows(po_df, inv_df):,} rows")
+
+    started = time.perf_counter()
+    po_agg, inv_agg = aggregate_po_lines(po_df), aggregate_invoice_lines(inv_df)
+    aggregated = time.perf_counter()
+    metrics = reconcile(po_agg, inv_agg)
+    finished = time.perf_counter()
+    print(f"aggregate: {aggregated - started:6.2f} s  ({len(po_agg):,} + {len(inv_agg):,} keys)")
+    print(f"reconcile: {finished - aggregated:6.2f} s")
+    print(f"total:     {finished - started:6.2f} s  "
+          f"({(len(po_df) + len(inv_df)) / (finished - started) / 1e6:.2f}M lines/s)")
+
+    # Streaming mode folds the same lines in chunk by chunk
+    started = time.perf_counter()
+    accumulator = ScorecardAccumulator()
+    for start in range(0, len(po_df), 250_000):
+        accumulator.add_po_chunk(po_df.iloc[start:start + 250_000])
+    for start in range(0, len(inv_df), 250_000):
+        accumulator.add_invoice_chunk(inv_df.iloc[start:start + 250_000])
+    chunked = accumulator.reconciliation()
+    print(f"chunked:   {time.perf_counter() - started:6.2f} s  (same result: {chunked == metrics})")
+
+    for name, value in metrics.items():
+        print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark: cold start of the API.
+
+  - import time: `python -X importtime -c "import main"` in fresh interpreters:
+    the median total, the slowest modules main imports directly, and which of
+    services/startup.py's HEAVY_MODULES were imported. Exits with status 1 when
+    the median is over the budget, so it can gate CI.
+  - start-up: uvicorn in a subprocess, with the warm-up on and off
+    (SUPPLIER_EVAL_WARMUP=0). Seconds until it answers GET /, until GET /ready
+    is 200, and the latency of the first /upload/scorecard and
+    /upload/financials requests sent once it is ready.
+
+`backend_dir` runs both against another checkout (e.g. a git worktree of an
+older commit); without /ready, a server counts as ready once it answers.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup [runs] [budget_ms] [backend_dir]
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import generators
+from services.startup import HEAVY_MODULES
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SLOWEST = 8
+
+
+def _environment(work_dir: str, **overrides) -> dict:
+    env = dict(os.environ)
+    env.pop("OPENAI_API_KEY", None)
+    env.update({
+        "SUPPLIER_EVAL_CACHE_DIR": os.path.join(work_dir, "documents"),
+        "SUPPLIER_EVAL_LLM_CACHE_PATH": os.path.join(work_dir, "llm_responses.sqlite3"),
+        "SUPPLIER_EVAL_SUPPLIER_STORE_PATH": os.path.join(work_dir, "suppliers.sqlite3"),
+        "SUPPLIER_EVAL_LAKE_DIR": os.path.join(work_dir, "lake"),
+        "SUPPLIER_EVAL_BATCH_DIR": os.path.join(work_dir, "batch"),
+        "SUPPLIER_EVAL_TEMPLATE_PATH": os.path.join(work_dir, "layout_templates.sqlite3"),
+        "SUPPLIER_EVAL_LAYOUT_TEMPLATES": "0",
+    })
+    env.update(overrides)
+    return env
+
+
+def import_times(backend_dir: str) -> tuple:
+    """
+    (total seconds, {module main imports directly: cumulative seconds}, heavy
+    modules imported) for one `import main` in a fresh interpreter.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        heavy = ",".join(HEAVY_MODULES)
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c",
+             f"import sys, main; print(','.join(m for m in '{heavy}'.split(',') if m in sys.modules))"],
+            cwd=backend_dir, env=_environment(work_dir), capture_output=True, text=True, check=True,
+        )
+    total, direct = None, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip() == "main":
+            total = int(cumulative) / 1e6
+        elif depth == 1:
+            direct[name.strip()] = int(cumulative) / 1e6
+    imported = [name for name in result.stdout.strip().split(",") if name]
+    return total, direct, imported
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _until(client: httpx.Client, path: str, accept) -> None:
+    while True:
+        try:
+            if accept(client.get(path).status_code):
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+
+
+def start_up(backend_dir: str, warmup: bool, uploads: dict) -> dict:
+    """
+    Seconds from launching uvicorn until it answers, until it is ready, and
+    of the first request to each upload endpoint.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        port = _free_port()
+        env = _environment(work_dir, SUPPLIER_EVAL_WARMUP="1" if warmup else "0")
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            # Quiet: the pool's resource tracker warns about semaphores when the server is stopped
+            cwd=backend_dir, env=env, stderr=subprocess.DEVNULL,
+        )
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+                _until(client, "/", lambda status: status == 200)
+                result = {"answers": time.perf_counter() - started}
+                # Checkouts without /ready answer 404: ready as soon as they answer
+                _until(client, "/ready", lambda status: status != 503)
+                result["ready"] = time.perf_counter() - started
+                for path, files in uploads.items():
+                    request_started = time.perf_counter()
+                    client.post(path, files=files).raise_for_status()
+                    result[path] = time.perf_counter() - request_started
+                return result
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main() -> int:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    budget = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 1.0
+    backend_dir = os.path.abspath(sys.argv[3]) if len(sys.argv) > 3 else BACKEND_DIR
+
+    measured = [import_times(backend_dir) for _ in range(runs)]
+    total = statistics.median(run[0] for run in measured)
+    direct = {name: statistics.median(run[1].get(name, 0) for run in measured) for name in measured[0][1]}
+    print(f"import main ({backend_dir}), median of {runs}: {total * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+    for name, seconds in sorted(direct.items(), key=lambda item: -item[1])[:SLOWEST]:
+        print(f"  {name:<32} {seconds * 1000:8.1f} ms")
+    print(f"  heavy modules imported: {', '.join(measured[0][2]) or 'none'}")
+
+    po = generators.po_frame(1000, seed=1)
+    po_bytes, extension = generators.export(po)
+    inv_bytes, _ = generators.export(generators.invoice_frame(po, seed=1))
+    uploads = {
+        "/upload/scorecard": [("po_files", (f"po.{extension}", po_bytes)), ("inv_files", (f"inv.{extension}", inv_bytes))],
+        "/upload/financials": [("files", ("statements.pdf", generators.financial_pdf(3, seed=1), "application/pdf"))],
+    }
+    print(f"\nuvicorn start-up, median of {runs}, seconds:")
+    print(f"{'':<12} {'answers':>8} {'ready':>8} " + " ".join(f"{'first ' + path:>28}" for path in uploads))
+    for warmup in (False, True):
+        results = [start_up(backend_dir, warmup, uploads) for _ in range(runs)]
+        row = {key: statistics.median(result[key] for result in results) for key in results[0]}
+        print(f"{'warm-up ' + ('on' if warmup else 'off'):<12} {row['answers']:8.2f} {row['ready']:8.2f} "
+              + " ".join(f"{row[path]:28.2f}" for path in uploads))
+
+    return 0 if total <= budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
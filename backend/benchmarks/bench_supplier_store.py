@@ -0,0 +1,96 @@
+"""
+Benchmark: a year of weekly PO/invoice uploads for one supplier, scored by
+recomputing calculate_scorecard over the full history each week against
+folding each week into the supplier store, plus a full re-upload (all rows
+already stored).
+
+Run from the backend directory:
+    python -m benchmarks.bench_supplier_store [lines_per_week] [weeks]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.scorecard import calculate_scorecard
+from services.supplier_store import SupplierStore
+
+
+def synthetic_week(week: int, lines: int, rng) -> tuple:
+    """
+    One week of PO lines (3 SKUs per PO) with delivery dates, and invoices for
+    95% of them, some short-shipped.
+    """
+    po_numbers = week * lines + np.arange(lines) // 3
+    ordered = pd.Timestamp("2024-01-01") + pd.Timedelta(days=7 * week)
+    po_df = pd.DataFrame({
+        "po_number": po_numbers,
+        "sku": [f"SKU-{i % 3}" for i in range(lines)],
+        "quantity": rng.integers(1, 50, lines),
+        "amount": rng.uniform(10, 5_000, lines).round(2),
+        "date": ordered,
+        "promised_date": ordered + pd.Timedelta(days=10),
+        "delivery_date": ordered + pd.to_timedelta(rng.integers(5, 14, lines), unit="D"),
+    })
+    inv_df = po_df.sample(frac=0.95, random_state=week)[["po_number", "sku", "quantity", "amount", "date"]]
+    inv_df["invoice_number"] = "INV-" + inv_df["po_number"].astype(str) + "-" + inv_df["sku"]
+    inv_df["quantity"] = inv_df["quantity"] - (rng.random(len(inv_df)) < 0.05)
+    inv_df["date"] = inv_df["date"] + pd.Timedelta(days=20)
+    inv_df["status"] = np.where(rng.random(len(inv_df)) < 0.9, "Paid", "Open")
+    return po_df, inv_df.reset_index(drop=True)
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    weeks = int(sys.argv[2]) if len(sys.argv) > 2 else 52
+    rng = np.random.default_rng(23)
+    uploads = [synthetic_week(week, lines, rng) for week in range(weeks)]
+    print(f"{weeks} weekly uploads of {lines:,} PO lines")
+
+    recompute_times = []
+    history = []
+    for upload in uploads:
+        history.append(upload)
+        started = time.perf_counter()
+        recomputed = calculate_scorecard(
+            pd.concat([po for po, _ in history], ignore_index=True),
+            pd.concat([inv for _, inv in history], ignore_index=True),
+        )
+        recompute_times.append(time.perf_counter() - started)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SupplierStore(os.path.join(directory, "suppliers.sqlite3"))
+        fold_times = []
+        for po_df, inv_df in uploads:
+            started = time.perf_counter()
+            store.fold("acme", po_df, inv_df)
+            fold_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _ in range(1_000):
+            folded = store.scorecard("acme")
+        read_time = (time.perf_counter() - started) / 1_000
+
+        started = time.perf_counter()
+        reupload = store.fold(
+            "acme",
+            pd.concat([po for po, _ in uploads], ignore_index=True),
+            pd.concat([inv for _, inv in uploads], ignore_index=True),
+        )
+        reupload_time = time.perf_counter() - started
+
+    print(f"recompute full history each week: {sum(recompute_times):7.2f} s total, "
+          f"first week {recompute_times[0]:6.3f} s, last week {recompute_times[-1]:6.3f} s "
+          f"(over {weeks * lines:,} lines)")
+    print(f"fold weekly delta into store:     {sum(fold_times):7.2f} s total, "
+          f"first week {fold_times[0]:6.3f} s, last week {fold_times[-1]:6.3f} s")
+    print(f"read scorecard from store:        {read_time * 1000:7.3f} ms")
+    print(f"re-upload of the full history:    {reupload_time:7.2f} s, {reupload}")
+    print(f"same scorecard: {folded == recomputed}")
+
+
+if __name__ == "__main__":
+    main()
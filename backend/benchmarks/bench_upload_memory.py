@@ -0,0 +1,135 @@
+"""
+Benchmark: peak RSS of the API server per upload request, for a large PO +
+invoice CSV export (/upload/scorecard, below the streaming threshold) and a
+large multi-page financial statement (/upload/financials). The server runs
+under uvicorn in a separate process, so the client's copies of the uploads are
+not counted; its peak RSS (VmHWM, reset before every request) and that of its
+pool workers are read from /proc. Linux only.
+
+Run from the backend directory:
+    python -m benchmarks.bench_upload_memory [po_rows] [pdf_pages] [pdf_mb] [backend_dir]
+
+`backend_dir` serves another checkout (e.g. a `git worktree` of an older
+commit) with the same uploads, for before/after numbers.
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import generators
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _status_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _descendants(pid: int) -> list:
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return children + [grandchild for child in children for grandchild in _descendants(child)]
+
+
+def _reset_peak(pid: int):
+    # Writing 5 to clear_refs resets VmHWM to the current RSS
+    with open(f"/proc/{pid}/clear_refs", "w") as f:
+        f.write("5")
+
+
+def measure(server_pid: int, request) -> dict:
+    """
+    Runs `request()` and returns the server's RSS before it and peak RSS during
+    it, and the largest peak of its worker processes, in MB.
+    """
+    workers = _descendants(server_pid)
+    for pid in [server_pid] + workers:
+        _reset_peak(pid)
+    before = _status_kb(server_pid, "VmRSS")
+    started = time.perf_counter()
+    request()
+    seconds = time.perf_counter() - started
+    peak = _status_kb(server_pid, "VmHWM")
+    worker_peak = max((_status_kb(pid, "VmHWM") for pid in _descendants(server_pid)), default=0)
+    return {"rss": before / 1024, "peak": peak / 1024, "worker_peak": worker_peak / 1024, "seconds": seconds}
+
+
+def _post(client: httpx.Client, path: str, files: list):
+    response = client.post(path, files=files)
+    response.raise_for_status()
+
+
+def main():
+    po_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 250_000
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    pdf_mb = float(sys.argv[3]) if len(sys.argv) > 3 else 40
+    backend_dir = sys.argv[4] if len(sys.argv) > 4 else BACKEND_DIR
+
+    # Each request gets new content (another seed), so nothing is served from cache
+    uploads = []
+    for seed in range(3):
+        po = generators.po_frame(po_rows, seed=seed)
+        po_bytes, po_ext = generators.export(po, "csv")
+        inv_bytes, inv_ext = generators.export(generators.invoice_frame(po, seed=seed), "csv")
+        uploads.append(([
+            ("po_files", (f"po.{po_ext}", po_bytes)),
+            ("inv_files", (f"invoices.{inv_ext}", inv_bytes)),
+        ], [("files", ("statements.pdf", generators.financial_pdf(pages, seed=seed, padding=int(pdf_mb * 1e6))))]))
+    tabular_size = sum(len(content) for _, (_, content) in uploads[0][0])
+    pdf_size = len(uploads[0][1][0][1][1])
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    work_dir = tempfile.mkdtemp(prefix="supplier-eval-bench-")
+    env = dict(
+        os.environ,
+        SUPPLIER_EVAL_CACHE_DIR=os.path.join(work_dir, "documents"),
+        SUPPLIER_EVAL_LLM_CACHE_PATH=os.path.join(work_dir, "llm_responses.sqlite3"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir, env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            while True:
+                try:
+                    client.get("/")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.2)
+            print(f"server: {backend_dir}")
+            print(f"PO + invoice CSV: {po_rows:,} PO lines, {tabular_size / 1e6:.1f} MB; "
+                  f"financial PDF: {pages} pages, {pdf_size / 1e6:.1f} MB\n")
+            # The first request of each kind starts the process pool and imports parsers
+            _post(client, "/upload/scorecard", uploads[0][0])
+            _post(client, "/upload/financials", uploads[0][1])
+
+            for path, index in (("/upload/scorecard", 0), ("/upload/financials", 1)):
+                for files in (upload[index] for upload in uploads[1:]):
+                    result = measure(server.pid, lambda: _post(client, path, files))
+                    print(f"{path:<22} server RSS {result['rss']:7.1f} MB   peak {result['peak']:7.1f} MB "
+                          f"(+{result['peak'] - result['rss']:6.1f} MB)   worker peak {result['worker_peak']:7.1f} MB   "
+                          f"{result['seconds']:6.2f} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Deterministic synthetic supplier data for the benchmarks: PO workbooks with the
+"Case A" export headers, matching invoice ledgers, and multi-page financial
+statement PDFs. The same arguments always give the same data.
+"""
+import random
+import re
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+# Named scales (rows) used by benchmarks/run.py
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+# Excel's row limit; larger exports are written as CSV
+XLSX_MAX_ROWS = 1_048_575
+
+SKUS_PER_PO = 4
+VENDORS = ["Acme Industrial", "Globex Supply", "Initech Components", "Umbrella Parts", "Stark Fasteners"]
+
+
+def po_frame(rows: int, seed: int = 0, start: str = "2022-01-01", days: int = 730, vendors: int = 1) -> pd.DataFrame:
+    """
+    PO lines as a "Case A" export (OMS_PO_NBR, ITEM_ID, ISSUE_DATE, ...): four
+    distinct SKUs per PO, a promised date 14 days after issue and deliveries
+    7-21 days after issue, so about half arrive late. Lines are spread over the
+    first `vendors` of VENDORS.
+    """
+    rng = np.random.default_rng(seed)
+    issued = pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.integers(0, days, rows)), unit="D")
+    sku_codes = rng.integers(0, 500, rows) * SKUS_PER_PO + np.arange(rows) % SKUS_PER_PO
+    skus = pd.Categorical.from_codes(sku_codes, categories=[f"SKU-{i:05d}" for i in range(500 * SKUS_PER_PO)])
+    return pd.DataFrame({
+        "OMS_PO_NBR": 1_000_000 + np.arange(rows) // SKUS_PER_PO,
+        "ITEM_ID": skus,
+        "ISSUE_DATE": issued,
+        "ORDERED_QTY": rng.integers(1, 200, rows),
+        "PO_AMT": rng.uniform(20, 20_000, rows).round(2),
+        "MUST_ARRIVE_BY_DATE": issued + pd.Timedelta(days=14),
+        "DEL_GATE_IN_DATE": issued + pd.to_timedelta(rng.integers(7, 21, rows), unit="D"),
+        "VENDOR": pd.Categorical.from_codes(rng.integers(0, vendors, rows), categories=VENDORS[:vendors]),
+    })
+
+
+def invoice_frame(po: pd.DataFrame, seed: int = 0, invoiced: float = 0.95) -> pd.DataFrame:
+    """
+    An invoice ledger for `invoiced` of the PO lines: one invoice per line, 4%
+    short-billed by one unit, dated 25 days after the PO, mostly paid.
+    """
+    rng = np.random.default_rng(seed + 1)
+    lines = po[rng.random(len(po)) < invoiced]
+    count = len(lines)
+    return pd.DataFrame({
+        "INV_NBR": "INV-" + pd.Series(np.arange(count) + 5_000_000).astype(str).to_numpy(),
+        "PO_NBR": lines["OMS_PO_NBR"].to_numpy(),
+        "ITEM_ID": lines["ITEM_ID"].to_numpy(),
+        "INV_QTY": lines["ORDERED_QTY"].to_numpy() - (rng.random(count) < 0.04),
+        "INV_AMT": lines["PO_AMT"].to_numpy(),
+        "INV_DT": lines["ISSUE_DATE"].to_numpy() + pd.Timedelta(days=25),
+        "INV_STATUS": pd.Categorical.from_codes(
+            rng.choice(3, count, p=[0.85, 0.12, 0.03]), categories=["Paid", "Open", "Disputed"]
+        ),
+    })
+
+
+def export(df: pd.DataFrame, fmt: str = "xlsx") -> tuple:
+    """
+    (bytes, extension) of the frame as an upload. Frames over Excel's row limit
+    are always written as CSV.
+    """
+    if fmt == "xlsx" and len(df) <= XLSX_MAX_ROWS:
+        buffer = BytesIO()
+        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False)
+            # Fixed metadata, so equal data gives equal bytes (and cache keys)
+            writer.book.properties.creator = "benchmarks"
+            writer.book.properties.created = pd.Timestamp("2024-01-01").to_pydatetime()
+        return buffer.getvalue(), "xlsx"
+    return df.to_csv(index=False).encode("utf-8"), "csv"
+
+
+# Words for narrative pages; none of them hint at a primary statement (see
+# STATEMENT_PAGE_HINTS in services/financials.py)
+FILLER_WORDS = ["operating", "segment", "liquidity", "subsidiary", "amortisation", "lease", "impairment",
+                "goodwill", "deferred", "tax", "provision", "note", "fair", "value", "risk", "hedging"]
+
+
+def statement_figures(seed: int = 0) -> dict:
+    """
+    The line items the statement PDF of `seed` reports, in thousands, keyed like
+    parse_financial_pdf's result (which scales them to units, see
+    expected_financials).
+    """
+    rng = random.Random(seed)
+    current_assets = rng.randint(5_000, 40_000)
+    total_assets = current_assets + rng.randint(10_000, 80_000)
+    current_liabilities = rng.randint(2_000, 30_000)
+    total_liabilities = current_liabilities + rng.randint(1_000, 40_000)
+    revenue = rng.randint(20_000, 200_000)
+    return {
+        "revenue": revenue,
+        "net_income": rng.randint(-revenue // 10, revenue // 8),
+        "total_assets": total_assets,
+        "total_liabilities": total_liabilities,
+        "current_assets": current_assets,
+        "current_liabilities": current_liabilities,
+        "inventory": rng.randint(500, current_assets // 2),
+        "equity": total_assets - total_liabilities,
+    }
+
+
+def expected_financials(seed: int = 0) -> dict:
+    """
+    What parse_financial_pdf should return for the statement PDF of `seed`.
+    """
+    return {key: float(value * 1000) for key, value in statement_figures(seed).items()}
+
+
+def _amount(value: int) -> str:
+    return f"({-value:,})" if value < 0 else f"{value:,}"
+
+
+# Labels the statement pages use, keyed like parse_financial_pdf's result
+STATEMENT_LABELS = {
+    "inventory": "Inventories",
+    "current_assets": "Total Current Assets",
+    "total_assets": "Total Assets",
+    "current_liabilities": "Total Current Liabilities",
+    "total_liabilities": "Total Liabilities",
+    "equity": "Total Equity",
+    "revenue": "Total Revenue",
+    "net_income": "Net Income",
+}
+# UK-style labels the line-item matcher does not know, so parsing falls back to the LLM
+UNCOMMON_LABELS = {
+    **STATEMENT_LABELS,
+    "inventory": "Stocks",
+    "equity": "Shareholders' funds",
+    "revenue": "Turnover",
+    "net_income": "Profit after tax",
+}
+
+
+def _statement_lines(seed: int, labels: dict) -> list:
+    figures = statement_figures(seed)
+    return [
+        "Consolidated Balance Sheet (in thousands)",
+        *(f"{labels[key]} {_amount(figures[key])}" for key in
+          ("inventory", "current_assets", "total_assets", "current_liabilities", "total_liabilities", "equity")),
+        "Consolidated Income Statement (in thousands)",
+        f"{labels['revenue']} {_amount(figures['revenue'])}",
+        f"Cost of Sales ({figures['revenue'] // 2:,})",
+        f"{labels['net_income']} {_amount(figures['net_income'])}",
+    ]
+
+
+def statement_pages(pages: int, seed: int = 0, lines_per_page: int = 45, labels: dict = None) -> list:
+    """
+    Text lines per page of an annual report: narrative and notes pages, then
+    the balance sheet and income statement on the last page (or the only one).
+    """
+    rng = random.Random(seed)
+    content = []
+    for page in range(pages - 1):
+        lines = [f"Notes to the financial statements - page {page + 1}"]
+        for _ in range(lines_per_page - 1):
+            lines.append(" ".join(rng.choice(FILLER_WORDS) for _ in range(9)) + f" {rng.randint(1, 99_999):,}")
+        content.append(lines)
+    content.append(_statement_lines(seed, labels or STATEMENT_LABELS))
+    return content
+
+
+def report_pages(seed: int = 0, narrative_pages: int = 3, notes_pages: int = 2, lines_per_page: int = 45,
+                 labels: dict = None) -> list:
+    """
+    Text lines per page of a fuller annual report: a cover page, the auditor's
+    report, management's review (which, like the auditor's report, mentions
+    revenue and financial position, so it passes STATEMENT_PAGE_HINTS), the
+    statements with UNCOMMON_LABELS by default, then notes. The front matter
+    runs well past the first 4,000 characters.
+    """
+    rng = random.Random(seed)
+    content = [["Annual Report and Financial Statements", "Acme Industrial plc", "Registered number 0" + str(seed)]]
+    content.append(["Independent auditor's report to the members"] + [
+        "In our opinion the financial statements give a true and fair view of the financial position "
+        "of the company and of its revenue and results for the year, in accordance with the framework."
+    ] * (lines_per_page - 1))
+    for page in range(narrative_pages):
+        lines = [f"Page {page + 1} of the strategic report: revenue and margin review"]
+        for _ in range(lines_per_page - 1):
+            lines.append("Turnover and margins " + " ".join(rng.choice(FILLER_WORDS) for _ in range(8))
+                         + f" {rng.randint(1, 99)} percent")
+        content.append(lines)
+    content.append(_statement_lines(seed, labels or UNCOMMON_LABELS))
+    for page in range(notes_pages):
+        lines = [f"Notes to the financial statements - page {page + 1}"]
+        for _ in range(lines_per_page - 1):
+            lines.append(" ".join(rng.choice(FILLER_WORDS) for _ in range(9)) + f" {rng.randint(1, 99_999):,}")
+        content.append(lines)
+    return content
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def financial_pdf(pages: int, seed: int = 0, padding: int = 0) -> bytes:
+    """
+    A `pages`-page financial statement PDF (see statement_pages), written
+    directly as PDF objects with the standard Helvetica font, so no PDF library
+    is needed to generate it. `padding` bytes of random data in an unused
+    stream stand in for the scanned images that make real reports large.
+    """
+    return pdf_document(statement_pages(pages, seed), seed=seed, padding=padding)
+
+
+def _text_stream(lines: list, columns: bool) -> bytes:
+    if not columns:
+        return ("BT /F1 9 Tf 40 760 Td 15 TL " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET").encode("latin-1")
+    # Labels, then the amounts as a second column at the same heights, the way
+    # table-producing tools often write statements
+    rows = [_TRAILING_AMOUNT_RE.match(line) for line in lines]
+    labels = [row.group(1) if row else line for row, line in zip(rows, lines)]
+    amounts = [row.group(2) if row else "" for row in rows]
+    return (
+        "BT /F1 9 Tf 40 760 Td 15 TL " + " ".join(f"({_escape(label)}) '" for label in labels) + " ET "
+        "BT /F1 9 Tf 420 760 Td 15 TL " + " ".join(f"({_escape(amount)}) '" for amount in amounts) + " ET"
+    ).encode("latin-1")
+
+
+_TRAILING_AMOUNT_RE = re.compile(r"(.*\S) (\(?[\d,]+\)?)$")
+
+
+def pdf_document(content: list, seed: int = 0, padding: int = 0, columns: bool = False) -> bytes:
+    """
+    A PDF with one page per list of text lines in `content` (see financial_pdf).
+    With `columns`, amounts at the end of lines are written as a separate column
+    after all the labels, which plain text extraction reads back as labels
+    followed by amounts rather than as rows.
+    """
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    if padding:
+        blob = random.Random(seed).randbytes(padding)
+        add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(blob), blob))
+    # Page objects refer to the page tree, which is written after them
+    pages_id = len(objects) + 2 * len(content) + 1
+    kids = []
+    for lines in content:
+        stream = _text_stream(lines, columns)
+        contents = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, contents, font)
+        ))
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
@@ -0,0 +1,106 @@
+"""
+Local stand-ins for the OpenAI clients, so benchmarks exercise the LLM code
+paths (response cache, deadlines, fallbacks) without network calls or an API
+key. install() swaps both the sync client (financial extraction fallback) and
+the async one (lender analysis).
+"""
+import asyncio
+import json
+import re
+import time
+from types import SimpleNamespace
+
+from services.document_index import FINANCIAL_TERMS, estimate_tokens
+from services.line_items import detect_scale
+
+STUB_ANALYSIS = {
+    "rationale": "Stubbed lender analysis.",
+    "risks": ["Stubbed risk"],
+    "strengths": ["Stubbed strength"],
+}
+_AMOUNT_RE = re.compile(r"(\()?[$€£]?\s*(\d[\d,]*(?:\.\d+)?)\)?")
+
+
+def stub_extraction(prompt: str) -> dict:
+    """
+    What the extraction fallback gets back: each requested key whose label (any
+    of FINANCIAL_TERMS) is directly followed by an amount in the excerpt, scaled by the
+    excerpt's "(in thousands)" header, else null. Like a model, it can only
+    report what the prompt shows it.
+    """
+    request, _, excerpt = prompt.partition("**")
+    keys = re.findall(r'"([a-z_]+)"', request)
+    lines = excerpt.lower().replace("\u2019", "'").splitlines()
+    scale = detect_scale(excerpt)
+    result = {}
+    for key in keys:
+        result[key] = None
+        for line in lines:
+            for term in FINANCIAL_TERMS.get(key, []):
+                position = line.find(term)
+                match = _AMOUNT_RE.search(line, position + len(term)) if position != -1 else None
+                if match and not re.search("[a-z]", line[position + len(term):match.start()]):
+                    value = float(match.group(2).replace(",", "")) * scale
+                    result[key] = -value if match.group(1) else value
+                    break
+            if result[key] is not None:
+                break
+    return result
+
+
+def _response(messages: list):
+    prompt = messages[-1]["content"]
+    body = stub_extraction(prompt) if "Extract the following financial metrics" in prompt else STUB_ANALYSIS
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(body)))])
+
+
+def _prompt_tokens(messages: list) -> int:
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+class StubLLMClient:
+    """
+    Sync client: `chat.completions.create(...)` answers after `delay` seconds
+    plus `per_token` seconds per (estimated) prompt token, a stand-in for
+    prompt processing time. Prompt sizes are kept in `prompt_tokens`.
+    """
+
+    def __init__(self, delay: float = 0.0, per_token: float = 0.0):
+        self.delay = delay
+        self.per_token = per_token
+        self.calls = 0
+        self.prompt_tokens = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _latency(self, messages: list) -> float:
+        self.calls += 1
+        self.prompt_tokens.append(_prompt_tokens(messages))
+        return self.delay + self.per_token * self.prompt_tokens[-1]
+
+    def create(self, model: str, messages: list, **kwargs):
+        time.sleep(self._latency(messages))
+        return _response(messages)
+
+
+class AsyncStubLLMClient(StubLLMClient):
+    """
+    Async client for services.llm_client.async_llm_client.
+    """
+
+    async def create(self, model: str, messages: list, **kwargs):
+        await asyncio.sleep(self._latency(messages))
+        return _response(messages)
+
+
+def install(delay: float = 0.0, per_token: float = 0.0) -> tuple:
+    """
+    Replaces the LLM clients with stubs answering after `delay` seconds (plus
+    `per_token` seconds per prompt token). Returns (sync stub, async stub).
+    """
+    from services import llm_analysis
+    from services.llm_client import async_llm_client
+
+    sync_stub, async_stub = StubLLMClient(delay, per_token), AsyncStubLLMClient(delay, per_token)
+    llm_analysis.set_client(sync_stub)
+    async_llm_client.set_client(async_stub)
+    return sync_stub, async_stub
@@ -0,0 +1,349 @@
+"""
+Benchmark harness: times parse_po_file, parse_invoice_file, calculate_scorecard
+and parse_financial_pdf on deterministic synthetic data (benchmarks/generators.py),
+and the upload endpoints end to end over HTTP against a local uvicorn server with
+the LLM stubbed (benchmarks/llm_stub.py). Results are saved as JSON so runs on
+two commits can be compared.
+
+Run from the backend directory:
+    python -m benchmarks.run [--scales 1k,10k,100k] [--pages 1,30] [--repeat 3]
+                             [--format xlsx|csv] [--only parse,scorecard,pdf,http]
+                             [--output FILE] [--compare BASELINE.json]
+    python -m benchmarks.run --compare BASELINE.json CANDIDATE.json
+
+Scales go up to 10m rows (written as CSV above Excel's row limit) and up to 300
+pages; those take minutes per case, so they are opt-in. Caches, the supplier
+store and the data lake live in a temporary directory, and every timed run
+starts with an empty document cache.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+WORK_DIR = tempfile.mkdtemp(prefix="supplier-eval-bench-")
+os.environ.setdefault("SUPPLIER_EVAL_CACHE_DIR", os.path.join(WORK_DIR, "documents"))
+os.environ.setdefault("SUPPLIER_EVAL_LLM_CACHE_PATH", os.path.join(WORK_DIR, "llm_responses.sqlite3"))
+# Every analysis reaches the (stubbed) LLM instead of the response cache
+os.environ.setdefault("SUPPLIER_EVAL_LLM_CACHE_TTL", "0")
+os.environ.setdefault("SUPPLIER_EVAL_SUPPLIER_STORE_PATH", os.path.join(WORK_DIR, "suppliers.sqlite3"))
+os.environ.setdefault("SUPPLIER_EVAL_LAKE_DIR", os.path.join(WORK_DIR, "lake"))
+os.environ.setdefault("SUPPLIER_EVAL_BATCH_DIR", os.path.join(WORK_DIR, "batch"))
+# Repeats would otherwise be read through a learned layout template (see
+# benchmarks/bench_layout_templates.py)
+os.environ.setdefault("SUPPLIER_EVAL_LAYOUT_TEMPLATES", "0")
+os.environ.setdefault("SUPPLIER_EVAL_TEMPLATE_PATH", os.path.join(WORK_DIR, "layout_templates.sqlite3"))
+
+import httpx
+import uvicorn
+
+from benchmarks import generators, llm_stub
+from services.cache import document_cache
+from services.financials import parse_financial_pdf
+from services.ingestion import parse_invoice_file, parse_po_file
+from services.scorecard import calculate_scorecard
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, ".cache", "benchmarks")
+GROUPS = ("parse", "scorecard", "pdf", "http")
+SEED = 7
+
+
+def clear_document_cache():
+    document_cache.clear()
+    shutil.rmtree(document_cache.directory, ignore_errors=True)
+
+
+def measure(func, repeat: int, setup=None, warmup: bool = False) -> tuple:
+    """
+    Calls `func` `repeat` times (after `setup`, untimed, each time) and returns
+    ({"min", "median", "max", "runs"} in seconds, the last result). `warmup`
+    adds one untimed call first, e.g. to start the process pool.
+    """
+    if warmup:
+        if setup:
+            setup()
+        func()
+    runs = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - started)
+    return {
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "max": max(runs),
+        "runs": runs,
+    }, result
+
+
+def case(name: str, scale: str, seconds: dict, rows: int = None, size: int = None, **extra) -> dict:
+    entry = {"case": name, "scale": scale, "seconds": seconds, "rows": rows, "bytes": size}
+    if rows:
+        entry["rows_per_second"] = rows / seconds["median"]
+    entry.update(extra)
+    print(f"{name:<34} {scale:>6}  median {seconds['median']:9.4f} s  min {seconds['min']:9.4f} s"
+          + (f"  {entry['rows_per_second']:12,.0f} rows/s" if rows else ""), flush=True)
+    return entry
+
+
+class Dataset:
+    """
+    The uploads of one scale: PO and invoice files in the requested format.
+    """
+
+    def __init__(self, scale: str, fmt: str):
+        self.scale = scale
+        po = generators.po_frame(generators.SCALES[scale], seed=SEED)
+        invoices = generators.invoice_frame(po, seed=SEED)
+        self.po_rows, self.inv_rows = len(po), len(invoices)
+        self.po_bytes, po_ext = generators.export(po, fmt)
+        self.inv_bytes, inv_ext = generators.export(invoices, fmt)
+        self.po_name, self.inv_name = f"po_{scale}.{po_ext}", f"invoices_{scale}.{inv_ext}"
+
+
+def bench_tabular(data: Dataset, groups: set, repeat: int) -> list:
+    results = []
+    seconds, po_df = measure(lambda: parse_po_file(data.po_bytes, data.po_name), repeat)
+    if "parse" in groups:
+        results.append(case("parse_po_file", data.scale, seconds, data.po_rows, len(data.po_bytes)))
+    seconds, inv_df = measure(lambda: parse_invoice_file(data.inv_bytes, data.inv_name), repeat)
+    if "parse" in groups:
+        results.append(case("parse_invoice_file", data.scale, seconds, data.inv_rows, len(data.inv_bytes)))
+    if "scorecard" in groups:
+        seconds, _ = measure(lambda: calculate_scorecard(po_df, inv_df), repeat)
+        results.append(case("calculate_scorecard", data.scale, seconds, len(po_df) + len(inv_df)))
+    return results
+
+
+def bench_pdf(pages: int, repeat: int) -> dict:
+    content = generators.financial_pdf(pages, seed=SEED)
+    seconds, parsed = measure(lambda: parse_financial_pdf(content, f"statements_{pages}p.pdf"), repeat)
+    correct = {key: parsed.get(key) for key in generators.expected_financials(SEED)} == generators.expected_financials(SEED)
+    return case("parse_financial_pdf", f"{pages}p", seconds, size=len(content), pages=pages, correct=correct)
+
+
+class Server:
+    """
+    The app under uvicorn on a free local port, in a background thread.
+    """
+
+    def __init__(self):
+        from main import app
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return f"http://127.0.0.1:{self.port}"
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def _post(client: httpx.Client, path: str, files: list) -> dict:
+    response = client.post(path, files=files)
+    response.raise_for_status()
+    body = response.json()
+    # /upload/financials reports per-file failures inside a 200 response
+    failed = [result for result in body.get("results", []) if "error" in result]
+    if failed:
+        raise RuntimeError(f"{path} failed: {failed}")
+    return body
+
+
+def _post_stream(client: httpx.Client, path: str, files: list) -> dict:
+    """
+    Reads an NDJSON response line by line; returns the seconds until each stage.
+    """
+    started = time.perf_counter()
+    stages = {}
+    with client.stream("POST", path, files=files) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                stage = json.loads(line)["stage"]
+                if stage == "error":
+                    raise RuntimeError(line)
+                stages[stage] = time.perf_counter() - started
+    return stages
+
+
+def bench_http(datasets: list, pages: int, repeat: int) -> list:
+    """
+    Cold-cache requests to the upload endpoints: /upload/financials for the
+    `pages`-page statement, and per dataset /upload/scorecard and both full
+    evaluation endpoints.
+    """
+    pdf = generators.financial_pdf(pages, seed=SEED)
+    pdf_file = ("financial_files", (f"statements_{pages}p.pdf", pdf, "application/pdf"))
+    results = []
+    with Server() as url, httpx.Client(base_url=url, timeout=None) as client:
+        seconds, _ = measure(
+            lambda: _post(client, "/upload/financials", [("files", pdf_file[1])]),
+            repeat, setup=clear_document_cache, warmup=True,
+        )
+        results.append(case("POST /upload/financials", f"{pages}p", seconds, size=len(pdf), pages=pages))
+        for data in datasets:
+            tabular = [
+                ("po_files", (data.po_name, data.po_bytes)),
+                ("inv_files", (data.inv_name, data.inv_bytes)),
+            ]
+            rows = data.po_rows + data.inv_rows
+            size = len(data.po_bytes) + len(data.inv_bytes)
+            seconds, _ = measure(lambda: _post(client, "/upload/scorecard", tabular), repeat, setup=clear_document_cache)
+            results.append(case("POST /upload/scorecard", data.scale, seconds, rows, size))
+            seconds, _ = measure(
+                lambda: _post(client, "/upload/full_evaluation", tabular + [pdf_file]),
+                repeat, setup=clear_document_cache,
+            )
+            results.append(case("POST /upload/full_evaluation", data.scale, seconds, rows, size + len(pdf), pages=pages))
+            stages = []
+            seconds, _ = measure(
+                lambda: stages.append(_post_stream(client, "/upload/full_evaluation/stream", tabular + [pdf_file])),
+                repeat, setup=clear_document_cache,
+            )
+            first = [min(run.values()) for run in stages]
+            results.append(case(
+                "POST /upload/full_evaluation/stream", data.scale, seconds, rows, size + len(pdf), pages=pages,
+                first_stage_seconds={"min": min(first), "median": statistics.median(first), "max": max(first)},
+            ))
+    return results
+
+
+def git_revision() -> tuple:
+    """
+    (short commit hash, whether the tree has uncommitted changes).
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR, capture_output=True, text=True,
+        ).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def _key(entry: dict) -> tuple:
+    return entry["case"], entry["scale"]
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list:
+    """
+    Prints median timings of the cases both runs have, and returns those more
+    than `threshold` (a fraction) slower in `candidate`.
+    """
+    before = {_key(entry): entry for entry in baseline["results"]}
+    print(f"\n{'case':<34} {'scale':>6} {baseline['meta']['commit']:>12} {candidate['meta']['commit']:>12}  change")
+    regressions = []
+    for entry in candidate["results"]:
+        old = before.get(_key(entry))
+        if old is None:
+            continue
+        old_median, new_median = old["seconds"]["median"], entry["seconds"]["median"]
+        change = new_median / old_median - 1 if old_median else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append({"case": entry["case"], "scale": entry["scale"], "change": change})
+        print(f"{entry['case']:<34} {entry['scale']:>6} {old_median:11.4f}s {new_median:11.4f}s  {change:+7.1%}{flag}")
+    return regressions
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Supplier evaluation benchmark suite")
+    parser.add_argument("--scales", default="1k,10k,100k", help=f"comma-separated, from {', '.join(generators.SCALES)}")
+    parser.add_argument("--pages", default="1,30", help="comma-separated financial PDF page counts (1 to 300)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--format", choices=("xlsx", "csv"), default="xlsx")
+    parser.add_argument("--only", default=",".join(GROUPS), help=f"comma-separated, from {', '.join(GROUPS)}")
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="seconds the stubbed LLM takes to answer")
+    parser.add_argument("--output", help=f"results file (default {RESULTS_DIR}/<commit>-<time>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="RESULTS",
+                        help="baseline results to compare this run with, or baseline and candidate to compare without running")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown counted as a regression (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        return 1 if compare(_load(args.compare[0]), _load(args.compare[1]), args.threshold) else 0
+
+    scales = [scale for scale in args.scales.split(",") if scale]
+    unknown = [scale for scale in scales if scale not in generators.SCALES]
+    if unknown:
+        parser.error(f"unknown scales {unknown}")
+    pages = [int(count) for count in args.pages.split(",") if count]
+    groups = set(args.only.split(","))
+    llm_stub.install(args.llm_delay)
+
+    commit, dirty = git_revision()
+    results = []
+    datasets = []
+    try:
+        for scale in scales:
+            started = time.perf_counter()
+            data = Dataset(scale, args.format)
+            print(f"-- {scale}: {data.po_rows:,} PO lines, {data.inv_rows:,} invoice lines, "
+                  f"{(len(data.po_bytes) + len(data.inv_bytes)) / 1e6:.1f} MB "
+                  f"(generated in {time.perf_counter() - started:.1f} s)", flush=True)
+            datasets.append(data)
+            if groups & {"parse", "scorecard"}:
+                results.extend(bench_tabular(data, groups, args.repeat))
+        if "pdf" in groups:
+            for count in pages:
+                results.append(bench_pdf(count, args.repeat))
+        if "http" in groups and datasets and pages:
+            results.extend(bench_http(datasets, pages[0], args.repeat))
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    run = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        return 1 if compare(_load(args.compare[0]), run, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
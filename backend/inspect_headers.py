@@ -1,16 +1,54 @@
-import pandas as pd
 import sys
 
-try:
-    po_path = r'c:\Users\varun\Documents\ABridge_TakeHome\Case Study Financials (Dataset)\PO and Invoice Files\Case A.xlsx'
-    inv_path = r'c:\Users\varun\Documents\ABridge_TakeHome\Case Study Financials (Dataset)\PO and Invoice Files\Case A INV.xlsx'
-    
-    print("Reading PO...")
-    df_po = pd.read_excel(po_path)
-    print(f"PO Headers: {df_po.columns.tolist()}")
-    
-    print("Reading INV...")
-    df_inv = pd.read_excel(inv_path)
-    print(f"INV Headers: {df_inv.columns.tolist()}")
-except Exception as e:
-    print(e)
+import pandas as pd
+
+from services.ingestion import sniff_csv_header, sniff_xlsx_header
+from utils.normalization import resolve_columns
+
+# Prints the headers of PO / invoice exports and how ingestion maps them:
+#     python inspect_headers.py po "Case A.xlsx" invoice "Case A INV.xlsx"
+# Without arguments, inspects generated "Case A" samples (benchmarks/generators.py).
+
+
+def inspect(file_type: str, path: str):
+    if path.lower().endswith(".csv"):
+        with open(path, "rb") as f:
+            row, headers = sniff_csv_header(f, file_type)
+        print(f"{path}: header row {row}")
+    else:
+        with open(path, "rb") as f:
+            sheet, row = sniff_xlsx_header(f, file_type)
+        headers = pd.read_excel(path, sheet_name=sheet, skiprows=row, nrows=0).columns.tolist()
+        print(f"{path}: sheet {sheet!r}, header row {row}")
+    print(f"{file_type.upper()} Headers: {headers}")
+    resolution = resolve_columns(tuple(str(header) for header in headers), file_type)
+    for column in resolution["columns"]:
+        # Unmapped headers have no field (and no confidence)
+        print(f"    {column['header']!r:40} -> {column['field'] or '-':<20} ({column['confidence'] or 0:.2f})")
+
+
+def main(args: list):
+    if not args:
+        import tempfile
+        from benchmarks import generators
+
+        directory = tempfile.mkdtemp()
+        po = generators.po_frame(20)
+        samples = [("po", po), ("invoice", generators.invoice_frame(po))]
+        args = []
+        for file_type, df in samples:
+            content, extension = generators.export(df)
+            path = f"{directory}/case_a_{file_type}.{extension}"
+            with open(path, "wb") as f:
+                f.write(content)
+            args += [file_type, path]
+
+    for file_type, path in zip(args[::2], args[1::2]):
+        try:
+            inspect(file_type, path)
+        except Exception as e:
+            print(f"{path}: {e}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
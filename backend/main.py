@@ -1,13 +1,52 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from typing import List
-import pandas as pd
-from services.ingestion import parse_po_file, parse_invoice_file
-from services.scorecard import calculate_scorecard
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from typing import List, Optional
+from contextlib import asynccontextmanager
+from services.ingestion import parse_po_file, parse_invoice_file, iter_po_chunks, iter_invoice_chunks, STREAMING_THRESHOLD_BYTES
+from services.scorecard import calculate_scorecard, ScorecardAccumulator
+from services.executor import run_in_process, run_in_thread, gather_limited, executor_stats, shutdown_pools, warm_process_pool
+from services.cache import document_cache, document_key
+from services.llm_cache import llm_cache
+from services.llm_client import async_llm_client
+from services.batch import batch_queue
+from services.policy import policy_store, parse_policy
+from services.supplier_store import supplier_store
+from services.data_lake import data_lake
+from services.metrics import MetricsMiddleware, registry, span, traced_call, replay, record_span, record_upload
+from services.uploads import UploadLimitMiddleware, oversized_file, upload_source
+from services.layout_templates import template_store
+from services.startup import HEAVY_MODULES, PRELOAD, LazyModule, preload, warm_up
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import io
+import json
+import time
+import zipfile
 
-app = FastAPI(title="Supplier Evaluation MVP")
+# pandas and the parsers' other dependencies are imported on first use, or by
+# the warm-up below; with SUPPLIER_EVAL_PRELOAD=1 right here, before a pre-fork
+# server forks its workers.
+pd = LazyModule("pandas")
+if PRELOAD:
+    preload(HEAVY_MODULES)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connections are accepted at once; /ready reports 503 until the warm-up is done
+    warm_up.start([
+        ("process_pool", lambda: warm_process_pool(timeout=warm_up.timeout)),
+        ("imports", lambda: preload(HEAVY_MODULES)),
+    ])
+    yield
+    shutdown_pools()
+    await async_llm_client.aclose()
+
+app = FastAPI(title="Supplier Evaluation MVP", lifespan=lifespan)
+
+# 413 for request bodies over SUPPLIER_EVAL_MAX_REQUEST_BYTES. Added first, so
+# it runs inside CORS and metrics and its 413s carry CORS headers and are counted.
+app.add_middleware(UploadLimitMiddleware)
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -16,39 +55,138 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*", "content-type", "ngrok-skip-browser-warning"],
 )
+# Request timing and per-request traces for /metrics and the JSON request log
+app.add_middleware(MetricsMiddleware)
+
+# Upload kind per parser, for metrics
+UPLOAD_KINDS = {"parse_po_file": "po", "parse_invoice_file": "invoice", "parse_financial_pdf": "financial"}
+
+def _rows(result):
+    return len(result) if isinstance(result, pd.DataFrame) else None
+
+def _check_upload_sizes(*file_lists):
+    """
+    Refuses any single upload over SUPPLIER_EVAL_MAX_FILE_BYTES with a 413
+    before it is hashed or parsed.
+    """
+    message = oversized_file([file for files in file_lists for file in files])
+    if message:
+        raise HTTPException(status_code=413, detail=message)
+
+async def _parse_upload(file: UploadFile, parser, run=run_in_process):
+    """
+    Parses one upload off the event loop, by default in the process pool.
+    Results are cached by file content, so re-uploaded documents are not parsed again.
+    """
+    _, result = await _parse_upload_keyed(file, parser, run)
+    return result
+
+async def _parse_upload_keyed(file: UploadFile, parser, run=run_in_process):
+    """
+    Like _parse_upload, but also returns the upload's content key.
+
+    The upload is never read into memory here: it stays in its spooled temporary
+    file, which is hashed in chunks and which parsers (and pool workers)
+    open by path (see upload_source).
+    """
+    with span("upload_read"):
+        source = await run_in_thread(upload_source, file)
+    size = file.size or 0
+    kind = UPLOAD_KINDS.get(parser.__name__, parser.__name__)
+    key = await run_in_thread(document_key, source, file.filename, parser)
+    cached = await run_in_thread(document_cache.get, key)
+    if cached is not None:
+        record_upload(kind, file.filename, size, _rows(cached), cached=True)
+        return key, cached
+
+    started = time.perf_counter()
+    # Spans recorded inside the pool worker come back with the result
+    result, spans = await run(traced_call, parser, source, file.filename)
+    seconds = time.perf_counter() - started
+    record_span("ingestion", seconds)
+    replay(spans)
+    await run_in_thread(document_cache.put, key, result)
+    record_upload(kind, file.filename, size, _rows(result), seconds=seconds)
+    return key, result
+
+async def _parse_financial_upload(file: UploadFile):
+    # PDF parsing fans its pages out to the process pool itself, so the
+    # per-document coordinator only needs a thread.
+    return await _parse_upload(file, parse_financial_pdf, run=run_in_thread)
+
+def _should_stream(files: List[UploadFile]) -> bool:
+    return sum(file.size or 0 for file in files) > STREAMING_THRESHOLD_BYTES
+
+def _accumulate_upload(file: UploadFile, read_chunks, add_chunk) -> ScorecardAccumulator:
+    """
+    Folds one upload into a scorecard accumulator chunk by chunk, reading
+    straight from the spooled upload file.
+    """
+    accumulator = ScorecardAccumulator()
+    file.file.seek(0)
+    started = time.perf_counter()
+    for chunk in read_chunks(file.file, file.filename):
+        add_chunk(accumulator, chunk)
+    seconds = time.perf_counter() - started
+    record_span("ingestion", seconds)
+    kind = "po" if read_chunks is iter_po_chunks else "invoice"
+    record_upload(kind, file.filename, file.size or 0, accumulator.po_records + accumulator.inv_records, seconds=seconds)
+    return accumulator
+
+async def _stream_scorecard(po_files: List[UploadFile], inv_files: List[UploadFile]) -> ScorecardAccumulator:
+    """
+    Streaming ingestion: no upload is ever held in memory as a whole, and only
+    running counts are kept, so peak memory does not grow with file size.
+    """
+    accumulators = await gather_limited(
+        *(run_in_thread(_accumulate_upload, file, iter_po_chunks, ScorecardAccumulator.add_po_chunk) for file in po_files),
+        *(run_in_thread(_accumulate_upload, file, iter_invoice_chunks, ScorecardAccumulator.add_invoice_chunk) for file in inv_files),
+    )
+    total = ScorecardAccumulator()
+    for accumulator in accumulators:
+        total.merge(accumulator)
+    return total
 
 @app.post("/upload/scorecard")
 async def create_scorecard(
     po_files: List[UploadFile] = File(...),
     inv_files: List[UploadFile] = File(...)
 ):
+    _check_upload_sizes(po_files, inv_files)
     try:
-        # Process PO Files
-        po_dfs = []
-        for file in po_files:
-            content = await file.read()
-            df = parse_po_file(content, file.filename)
-            po_dfs.append(df)
-        
+        if _should_stream(po_files + inv_files):
+            accumulator = await _stream_scorecard(po_files, inv_files)
+            return {
+                "status": "success",
+                "data": accumulator.result(),
+                "details": {
+                    "po_records": accumulator.po_records,
+                    "inv_records": accumulator.inv_records
+                }
+            }
+
+        # Parse PO and Invoice files in parallel
+        parsed = await gather_limited(
+            *(_parse_upload(file, parse_po_file) for file in po_files),
+            *(_parse_upload(file, parse_invoice_file) for file in inv_files),
+        )
+        po_dfs = parsed[:len(po_files)]
+        inv_dfs = parsed[len(po_files):]
+
         if po_dfs:
             full_po_df = pd.concat(po_dfs, ignore_index=True)
         else:
             raise HTTPException(status_code=400, detail="No valid PO files provided")
 
-        # Process Invoice Files
-        inv_dfs = []
-        for file in inv_files:
-            content = await file.read()
-            df = parse_invoice_file(content, file.filename)
-            inv_dfs.append(df)
-            
         if inv_dfs:
             full_inv_df = pd.concat(inv_dfs, ignore_index=True)
         else:
             raise HTTPException(status_code=400, detail="No valid Invoice files provided")
 
         # Calculate Scorecard
-        scorecard = calculate_scorecard(full_po_df, full_inv_df)
+        # Runs in a thread: shipping the frames to another process costs more than
+        # the vectorised pandas work, which releases the GIL anyway.
+        scorecard = await run_in_thread(calculate_scorecard, full_po_df, full_inv_df)
         
         return {
             "status": "success",
@@ -62,105 +200,450 @@ async def create_scorecard(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-from services.financials import parse_financial_pdf, calculate_ratios
+from services.financials import parse_financial_pdf, calculate_ratios, financial_periods, TREND_METRICS
 
 @app.post("/upload/financials")
 async def analyze_financials(files: List[UploadFile] = File(...)):
-    results = []
-    for file in files:
-        if not file.filename.endswith('.pdf'):
-            continue
-            
-        content = await file.read()
+    _check_upload_sizes(files)
+
+    async def _analyze(file: UploadFile):
         try:
-            parsed_data = parse_financial_pdf(content, file.filename)
+            parsed_data = await _parse_financial_upload(file)
             ratios = calculate_ratios(parsed_data)
-            results.append({
+            return {
                 "filename": file.filename,
                 "parsed_data": parsed_data,
                 "ratios": ratios
-            })
+            }
         except Exception as e:
-            results.append({
+            return {
                 "filename": file.filename,
                 "error": str(e)
-            })
-            
-    return {"status": "success", "results": results}
+            }
+
+    pdf_files = [file for file in files if file.filename.endswith('.pdf')]
+    results = await gather_limited(*(_analyze(file) for file in pdf_files))
+    # Ratios per fiscal year and trends over the files that parsed
+    periods = financial_periods([(r["filename"], r["parsed_data"]) for r in results if "parsed_data" in r])
+
+    return {"status": "success", "results": results, "periods": periods["periods"], "trends": periods["trends"]}
 
 from services.synthesis import calculate_overall_score, identify_lender_concerns, generate_rationale
 
+async def _evaluation_scorecard(po_files: List[UploadFile], inv_files: List[UploadFile]) -> dict:
+    if _should_stream(po_files + inv_files):
+        accumulator = await _stream_scorecard(po_files, inv_files)
+        return accumulator.result()
+
+    parsed = await gather_limited(
+        *(_parse_upload(file, parse_po_file) for file in po_files),
+        *(_parse_upload(file, parse_invoice_file) for file in inv_files),
+    )
+    po_dfs = parsed[:len(po_files)]
+    inv_dfs = parsed[len(po_files):]
+
+    full_po_df = pd.concat(po_dfs, ignore_index=True) if po_dfs else pd.DataFrame()
+    full_inv_df = pd.concat(inv_dfs, ignore_index=True) if inv_dfs else pd.DataFrame()
+
+    return await run_in_thread(calculate_scorecard, full_po_df, full_inv_df)
+
+async def _evaluation_financials(financial_files: List[UploadFile]) -> dict:
+    """
+    Parses every financial statement concurrently (each fans its pages out over
+    the process pool), so N statements take about as long as the slowest one,
+    then computes ratios per fiscal year and year-over-year trends. The latest
+    year's ratios are the ones scored.
+    """
+    pdf_files = [file for file in financial_files if file.filename.endswith('.pdf')]
+    parsed_financials = await gather_limited(*(_parse_financial_upload(file) for file in pdf_files))
+    periods = await run_in_thread(
+        financial_periods, [(file.filename, parsed) for file, parsed in zip(pdf_files, parsed_financials)]
+    )
+    return {
+        "financial_ratios": periods["ratios"],
+        "financial_periods": periods["periods"],
+        "financial_trends": periods["trends"],
+    }
+
+async def _full_evaluation_stages(
+    po_files: List[UploadFile],
+    inv_files: List[UploadFile],
+    financial_files: List[UploadFile],
+):
+    """
+    Runs a full evaluation, yielding (stage, result) as each stage finishes:
+    "scorecard" and "financials" in the order they complete (they run in
+    parallel), then "score" (the deterministic score, grade and concerns), and
+    last "analysis", the full response with the LLM rationale.
+    """
+    # 1. Process PO/Invoice files and Financial files in parallel
+    scorecard_task = asyncio.ensure_future(_evaluation_scorecard(po_files, inv_files))
+    financials_task = asyncio.ensure_future(_evaluation_financials(financial_files))
+    pending = {scorecard_task: "scorecard", financials_task: "financials"}
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in (scorecard_task, financials_task):
+                if task in done:
+                    stage = pending.pop(task)
+                    yield stage, {"operational_metrics": task.result()} if stage == "scorecard" else task.result()
+    finally:
+        # A failed stage or a client that went away stops the other one
+        for task in pending:
+            task.cancel()
+
+    scorecard_metrics = scorecard_task.result()
+    # 2. Financial Ratios (of the latest fiscal year) and year-over-year trends
+    financials = financials_task.result()
+    financial_ratios = financials["financial_ratios"]
+    trends = financials["financial_trends"]
+
+    # 3. Synthesis
+    with span("synthesis"):
+        overall = calculate_overall_score(scorecard_metrics, financial_ratios, trends=trends)
+
+        # The deterministic result is ready before the LLM is even asked, and is
+        # what we answer with if the LLM fails or misses its deadline.
+        static_concerns = identify_lender_concerns(scorecard_metrics, financial_ratios, trends=trends)
+        deterministic = {
+            "rationale": generate_rationale(overall["grade"], overall["score"], static_concerns),
+            "risks": static_concerns,
+            "strengths": []
+        }
+    yield "score", {
+        "supplier_grade": overall["grade"],
+        "overall_score": overall["score"],
+        "rationale": deterministic["rationale"],
+        "lender_concerns": static_concerns,
+        "score_breakdown": overall["breakdown"]
+    }
+
+    # Use LLM for analysis
+    from services.llm_analysis import generate_lender_analysis_async
+    analysis = await generate_lender_analysis_async(
+        scorecard_metrics, 
+        # Trends go to the LLM alongside the ratios they were derived from
+        {**financial_ratios, **{metric: trends[metric] for metric in TREND_METRICS if metric in trends}},
+        overall["score"], 
+        overall["grade"],
+        fallback=deterministic
+    )
+    
+    # Fallback to static concerns if LLM fails or returns empty risks
+    final_concerns = analysis.get("risks", [])
+    if not final_concerns or "LLM Error" in final_concerns:
+         final_concerns = static_concerns
+
+    yield "analysis", {
+        "status": "success",
+        "supplier_grade": overall["grade"],
+        "overall_score": overall["score"],
+        "rationale": analysis.get("rationale", "Analysis unavailable."),
+        "lender_concerns": final_concerns,
+        "strengths": analysis.get("strengths", []),
+        "details": {
+            "operational_metrics": scorecard_metrics,
+            "financial_ratios": financial_ratios,
+            "financial_periods": financials["financial_periods"],
+            "financial_trends": trends,
+            "score_breakdown": overall["breakdown"]
+        }
+    }
+
 @app.post("/upload/full_evaluation")
 async def full_evaluation(
     po_files: List[UploadFile] = File(...),
     inv_files: List[UploadFile] = File(...),
     financial_files: List[UploadFile] = File(...)
 ):
+    _check_upload_sizes(po_files, inv_files, financial_files)
     try:
-        # 1. Process PO & Invoice Files
-        po_dfs = []
-        for file in po_files:
-            content = await file.read()
-            df = parse_po_file(content, file.filename)
-            po_dfs.append(df)
-        full_po_df = pd.concat(po_dfs, ignore_index=True) if po_dfs else pd.DataFrame()
-
-        inv_dfs = []
-        for file in inv_files:
-            content = await file.read()
-            df = parse_invoice_file(content, file.filename)
-            inv_dfs.append(df)
-        full_inv_df = pd.concat(inv_dfs, ignore_index=True) if inv_dfs else pd.DataFrame()
-
-        scorecard_metrics = calculate_scorecard(full_po_df, full_inv_df)
-
-        # 2. Process Financial Files
-        # For MVP, we assume one set of financials or aggregate them. 
-        # Let's take the first valid financial file for ratios or average them.
-        # Simplification: Use the first PDF found.
-        financial_ratios = {}
-        for file in financial_files:
-            if file.filename.endswith('.pdf'):
-                content = await file.read()
-                parsed_data = parse_financial_pdf(content, file.filename)
-                financial_ratios = calculate_ratios(parsed_data)
-                break # Just use one for now
-
-        # 3. Synthesis
-        overall = calculate_overall_score(scorecard_metrics, financial_ratios)
-        
-        # Use LLM for analysis
-        from services.llm_analysis import generate_lender_analysis
-        analysis = generate_lender_analysis(
-            scorecard_metrics, 
-            financial_ratios, 
-            overall["score"], 
-            overall["grade"]
-        )
-        
-        # Fallback to static concerns if LLM fails or returns empty risks
-        static_concerns = identify_lender_concerns(scorecard_metrics, financial_ratios)
-        final_concerns = analysis.get("risks", [])
-        if not final_concerns or "LLM Error" in final_concerns:
-             final_concerns = static_concerns
+        async for _, result in _full_evaluation_stages(po_files, inv_files, financial_files):
+            pass
+        return result
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/upload/full_evaluation/stream")
+async def full_evaluation_stream(
+    po_files: List[UploadFile] = File(...),
+    inv_files: List[UploadFile] = File(...),
+    financial_files: List[UploadFile] = File(...)
+):
+    """
+    Streaming variant of /upload/full_evaluation: an NDJSON response with one
+    {"stage": ..., "data": ...} line per stage as soon as it is ready
+    (scorecard, financials, score, analysis; see _full_evaluation_stages). The
+    "analysis" line carries the same body /upload/full_evaluation returns. A
+    failure ends the stream with a {"stage": "error", "detail": ...} line.
+    """
+    _check_upload_sizes(po_files, inv_files, financial_files)
+
+    async def _lines():
+        try:
+            async for stage, result in _full_evaluation_stages(po_files, inv_files, financial_files):
+                yield json.dumps({"stage": stage, "data": jsonable_encoder(result)}) + "\n"
+        except Exception as e:
+            yield json.dumps({"stage": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(
+        _lines(),
+        media_type="application/x-ndjson",
+        # Keep proxies (nginx, ngrok) from buffering the stages into one reply
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/batch/evaluations")
+async def create_batch_evaluation(
+    files: List[UploadFile] = File(...),
+    manifest: Optional[str] = Form(None),
+    candidate_policy: Optional[UploadFile] = File(None)
+):
+    """
+    Queues an evaluation of many suppliers and returns a job ID to poll.
+    Files are grouped by supplier via the manifest (JSON: supplier -> po_files /
+    inv_files / financial_files), else by top-level folder (folder uploads or
+    .zip archives), else by the vendor column of combined ledgers.
+    With a candidate policy (YAML), results are also scored under it for A/B.
+    """
+    _check_upload_sizes(files, [candidate_policy])
+    job = batch_queue.create_job()
+    try:
+        if candidate_policy is not None:
+            job.candidate_policy = parse_policy((await candidate_policy.read()).decode("utf-8"))
+        for file in files:
+            await run_in_thread(batch_queue.save_input, job, file.filename, file.file)
+        await run_in_thread(batch_queue.plan, job, json.loads(manifest) if manifest else None)
+    except (ValueError, UnicodeDecodeError, zipfile.BadZipFile) as e:
+        batch_queue.discard(job)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    batch_queue.enqueue(job)
+    return {"status": "accepted", **job.progress()}
+
+@app.get("/batch/evaluations/{job_id}")
+def read_batch_evaluation(job_id: str):
+    job = batch_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown batch job")
+    return job.progress()
+
+@app.get("/batch/evaluations/{job_id}/result")
+def read_batch_evaluation_result(job_id: str):
+    job = batch_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown batch job")
+    if job.state != "completed":
+        raise HTTPException(status_code=409, detail=f"Batch job is {job.state}")
+    return FileResponse(job.result_path, media_type="application/vnd.apache.parquet", filename=f"evaluations-{job_id}.parquet")
+
+@app.post("/suppliers/{supplier_id}/uploads")
+async def upload_supplier_data(
+    supplier_id: str,
+    po_files: List[UploadFile] = File([]),
+    inv_files: List[UploadFile] = File([])
+):
+    """
+    Folds new PO/invoice rows into the supplier's stored aggregates, and keeps a
+    columnar copy of each upload in the data lake for windowed scorecards. Rows
+    already stored (same PO number + SKU, or invoice number + SKU) are not
+    counted again.
+    """
+    if not po_files and not inv_files:
+        raise HTTPException(status_code=400, detail="Upload at least one PO or invoice file")
+    _check_upload_sizes(po_files, inv_files)
+    try:
+        parsed = await gather_limited(
+            *(_parse_upload_keyed(file, parse_po_file) for file in po_files),
+            *(_parse_upload_keyed(file, parse_invoice_file) for file in inv_files),
+        )
+        kinds = ["po"] * len(po_files) + ["invoice"] * len(inv_files)
+        await gather_limited(*(
+            run_in_thread(data_lake.append, supplier_id, kind, df, key.split("-", 1)[0][:32])
+            for kind, (key, df) in zip(kinds, parsed)
+        ))
+        parsed = [df for _, df in parsed]
+        po_dfs, inv_dfs = parsed[:len(po_files)], parsed[len(po_files):]
+        ingested = await run_in_thread(
+            supplier_store.fold,
+            supplier_id,
+            pd.concat(po_dfs, ignore_index=True) if po_dfs else None,
+            pd.concat(inv_dfs, ignore_index=True) if inv_dfs else None,
+        )
         return {
             "status": "success",
-            "supplier_grade": overall["grade"],
-            "overall_score": overall["score"],
-            "rationale": analysis.get("rationale", "Analysis unavailable."),
-            "lender_concerns": final_concerns,
-            "strengths": analysis.get("strengths", []),
-            "details": {
-                "operational_metrics": scorecard_metrics,
-                "financial_ratios": financial_ratios,
-                "score_breakdown": overall["breakdown"]
-            }
+            "supplier": supplier_id,
+            "ingested": ingested,
+            "data": await run_in_thread(supplier_store.scorecard, supplier_id),
         }
-
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/suppliers")
+def list_suppliers():
+    return {"suppliers": supplier_store.suppliers()}
+
+@app.get("/suppliers/{supplier_id}/scorecard")
+def read_supplier_scorecard(
+    supplier_id: str,
+    months: Optional[int] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    """
+    The supplier's scorecard over all stored data, or over a window: the last
+    `months` months, or lines dated from `start` (inclusive) to `end` (exclusive).
+    Windowed scorecards are computed from the data lake.
+    """
+    if months is None and start is None and end is None:
+        scorecard = supplier_store.scorecard(supplier_id)
+        if scorecard is None:
+            raise HTTPException(status_code=404, detail="Unknown supplier")
+        return {"status": "success", "supplier": supplier_id, "data": scorecard}
+
+    try:
+        if months is not None:
+            end = pd.Timestamp(end) if end else pd.Timestamp.now().normalize() + pd.Timedelta(days=1)
+            start = end - pd.DateOffset(months=months)
+        window = {"start": pd.Timestamp(start) if start else None, "end": pd.Timestamp(end) if end else None}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not supplier_store.known(supplier_id):
+        raise HTTPException(status_code=404, detail="Unknown supplier")
+    return {
+        "status": "success",
+        "supplier": supplier_id,
+        "window": {name: value.isoformat() if value is not None else None for name, value in window.items()},
+        "data": data_lake.scorecard(supplier_id, **window),
+    }
+
+@app.get("/suppliers/{supplier_id}/performance")
+def read_supplier_performance(
+    supplier_id: str,
+    group_by: str = "month",
+    sku: List[str] = Query([]),
+    months: Optional[int] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    rolling: Optional[int] = None
+):
+    """
+    On-time delivery, days late and paid/pending invoices per month and/or SKU
+    (`group_by`: comma-separated, empty for totals), read from the supplier's
+    performance cube. `sku` (repeatable) slices by SKU; the window is the last
+    `months` months, or the months from `start` to `end` (YYYY-MM, both
+    included). `rolling` sums each month's trailing `rolling` months.
+    """
+    try:
+        if months is not None:
+            end = pd.Period(end or pd.Timestamp.now(), freq="M")
+            start = end - months + 1
+        rows = supplier_store.performance(
+            supplier_id,
+            group_by=[dimension.strip() for dimension in group_by.split(",") if dimension.strip()],
+            skus=sku,
+            start=start,
+            end=end,
+            rolling=rolling,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Unknown supplier")
+    return {"status": "success", "supplier": supplier_id, "group_by": group_by, "data": rows}
+
+@app.delete("/suppliers/{supplier_id}")
+def delete_supplier(supplier_id: str):
+    if not supplier_store.delete(supplier_id):
+        raise HTTPException(status_code=404, detail="Unknown supplier")
+    data_lake.delete(supplier_id)
+    return {"status": "deleted", "supplier": supplier_id}
+
 @app.get("/")
 def read_root():
     return {"message": "Supplier Evaluation API is running"}
+
+@app.get("/ready")
+def read_ready():
+    """
+    Readiness for load balancers: 200 once this worker has warmed up, 503
+    while it is warming up or if the warm-up failed.
+    """
+    status = warm_up.status()
+    return JSONResponse(status, status_code=200 if status["state"] == "ready" else 503)
+
+@app.get("/stats/executor")
+def read_executor_stats():
+    return executor_stats()
+
+@app.get("/stats/cache")
+def read_cache_stats():
+    return document_cache.stats()
+
+@app.get("/stats/llm_cache")
+def read_llm_cache_stats():
+    return llm_cache.stats()
+
+@app.get("/stats/layout_templates")
+def read_layout_template_stats():
+    return template_store.stats()
+
+@app.get("/stats/batch")
+def read_batch_stats():
+    return batch_queue.stats()
+
+@app.get("/policy")
+def read_policy():
+    return policy_store.stats()
+
+@app.get("/stats/llm")
+def read_llm_stats():
+    return {
+        "latency_seconds": async_llm_client.latency_percentiles(),
+        "max_concurrency": async_llm_client.max_concurrency
+    }
+
+def _service_metrics() -> list:
+    """
+    Counters and gauges owned by other services, read when /metrics is scraped.
+    """
+    document = document_cache.stats()
+    llm = llm_cache.stats()
+    templates = template_store.stats()
+    startup = warm_up.status()
+    families = [
+        ("supplier_eval_document_cache_events_total", "counter", "Parsed-document cache lookups and evictions, by event.",
+         [({"event": event}, document[event]) for event in ("memory_hits", "disk_hits", "misses", "evictions", "disk_errors")]),
+        ("supplier_eval_document_cache_memory_bytes", "gauge", "Bytes held by the in-memory document cache.",
+         [({}, document["memory_bytes"])]),
+        ("supplier_eval_llm_cache_events_total", "counter", "LLM response cache lookups, by event.",
+         [({"event": event}, value) for event, value in llm.items() if event != "inflight"]),
+        ("supplier_eval_llm_cache_inflight", "gauge", "LLM calls in flight through the response cache.",
+         [({}, llm["inflight"])]),
+        ("supplier_eval_layout_template_events_total", "counter", "Financial PDF layout template lookups and changes, by event.",
+         [({"event": event}, value) for event, value in templates.items() if event != "templates"]),
+        ("supplier_eval_layout_templates", "gauge", "Layout templates stored.", [({}, templates["templates"])]),
+        ("supplier_eval_ready", "gauge", "1 once the worker has warmed up, else 0.", [({}, int(startup["state"] == "ready"))]),
+        ("supplier_eval_warmup_seconds", "gauge", "Seconds each warm-up step took, by step.",
+         [({"step": step}, seconds) for step, seconds in startup["steps"].items()]),
+        ("supplier_eval_executor_queue_depth", "gauge", "Tasks submitted to each worker pool and not finished.",
+         [({"pool": pool}, depth) for pool, depth in executor_stats()["queue_depth"].items()]),
+    ]
+    latencies = async_llm_client.latency_percentiles()
+    families.append((
+        "supplier_eval_llm_latency_seconds", "gauge", "Rolling LLM call latency percentiles, by model.",
+        [({"model": model, "quantile": q}, stats[p]) for model, stats in latencies.items()
+         for q, p in (("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99"))],
+    ))
+    return families
+
+registry.register_collector(_service_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """
+    Stage timings, request durations, upload and LLM counters and cache
+    statistics in the Prometheus text format.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
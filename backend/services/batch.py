@@ -0,0 +1,534 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from services.executor import CPU_WORKERS, submit_to_process_pool
+from services.financials import parse_financial_pdf, financial_periods
+from services.ingestion import parse_po_file, parse_invoice_file
+from services.policy import current_policy
+from services.portfolio import score_portfolio
+from services.scorecard import calculate_scorecard
+from services.startup import LazyModule
+from services.synthesis import calculate_overall_score, identify_lender_concerns, generate_rationale
+
+pd = LazyModule("pandas")
+
+logger = logging.getLogger(__name__)
+
+# Batch evaluation: many suppliers per request, evaluated in the background on the
+# process pool. Each job gets a directory holding its uploaded inputs while it runs,
+# and one Parquet file with a row per supplier once it is done.
+BATCH_DIR = os.getenv(
+    "SUPPLIER_EVAL_BATCH_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "batch"),
+)
+# Supplier evaluations submitted to the pool at once per job: enough to keep every
+# worker busy, few enough that results are collected as they finish.
+MAX_IN_FLIGHT = int(os.getenv("SUPPLIER_EVAL_BATCH_IN_FLIGHT", str(CPU_WORKERS * 2)))
+# Finished jobs (and their result files) are kept this long, and at most this many
+JOB_TTL_SECONDS = float(os.getenv("SUPPLIER_EVAL_BATCH_TTL", str(24 * 3600)))
+MAX_FINISHED_JOBS = int(os.getenv("SUPPLIER_EVAL_BATCH_MAX_JOBS", "100"))
+
+ROLES = ("po_files", "inv_files", "financial_files")
+
+# Columns of the result file, in order. Metrics that are "N/A (...)" for a
+# supplier are stored as nulls so every column has a single type.
+NUMERIC_COLUMNS = [
+    "score", "operational_score", "financial_score",
+    "on_time_delivery_rate", "invoice_paid_rate", "fulfillment_accuracy",
+    "amount_variance", "amount_variance_pct", "matched_pos", "unmatched_pos", "unmatched_invoices",
+    "po_to_invoice_lag_days_median",
+    "current_ratio", "quick_ratio", "net_margin", "debt_to_equity",
+    "trend_score", "revenue_growth", "net_margin_change", "debt_to_equity_change",
+    "po_records", "inv_records",
+]
+RESULT_COLUMNS = ["supplier", "status", "error", "grade"] + NUMERIC_COLUMNS + ["lender_concerns", "rationale"]
+
+
+def classify_file(filename: str):
+    """
+    Guesses a file's role from its name: PDFs are financial statements,
+    spreadsheets mentioning invoices are invoice ledgers, other spreadsheets are
+    PO files. Returns None for anything else.
+    """
+    name = os.path.basename(filename).lower()
+    if name.endswith(".pdf"):
+        return "financial_files"
+    if not name.endswith((".csv", ".xlsx")):
+        return None
+    if re.search(r"invoice|(^|[^a-z])inv([^a-z]|$)", name):
+        return "inv_files"
+    return "po_files"
+
+
+def slugify(name) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", str(name).lower()).strip("-")
+
+
+def _safe_relative_path(filename: str) -> str:
+    # Upload and archive member names may carry folders, but never escape the job directory
+    parts = [part for part in re.split(r"[\\/]+", filename or "") if part not in ("", ".", "..")]
+    if not parts:
+        raise ValueError(f"Invalid file name: {filename!r}")
+    return "/".join(parts)
+
+
+def _expand_archives(input_dir: str) -> list:
+    """
+    Extracts every .zip in `input_dir` in place and returns the relative paths
+    ("/"-separated) of all remaining files. Archives whose members are not in
+    folders are extracted into a folder named after the archive.
+    """
+    for root, _, filenames in os.walk(input_dir):
+        for filename in filenames:
+            if not filename.lower().endswith(".zip"):
+                continue
+            path = os.path.join(root, filename)
+            with zipfile.ZipFile(path) as archive:
+                members = [
+                    member for member in archive.infolist()
+                    if not member.is_dir() and not member.filename.startswith("__MACOSX/")
+                ]
+                flat = all("/" not in _safe_relative_path(member.filename) for member in members)
+                target = os.path.join(root, os.path.splitext(filename)[0]) if flat else root
+                for member in members:
+                    destination = os.path.join(target, _safe_relative_path(member.filename))
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    with archive.open(member) as source, open(destination, "wb") as sink:
+                        shutil.copyfileobj(source, sink)
+            os.remove(path)
+
+    names = []
+    for root, _, filenames in os.walk(input_dir):
+        for filename in filenames:
+            names.append(os.path.relpath(os.path.join(root, filename), input_dir).replace(os.sep, "/"))
+    return sorted(names)
+
+
+def group_by_manifest(names: list, manifest: dict) -> list:
+    """
+    Groups files as listed in a manifest:
+        {"<supplier>": {"po_files": [...], "inv_files": [...], "financial_files": [...]}}
+    File names may be given as uploaded paths or bare file names.
+    """
+    if not isinstance(manifest, dict) or not manifest:
+        raise ValueError("Manifest must map supplier names to their files")
+
+    by_name = {}
+    for name in names:
+        by_name[name] = name
+        by_name.setdefault(name.rsplit("/", 1)[-1], name)
+
+    suppliers = []
+    for supplier, files in manifest.items():
+        if not isinstance(files, dict) or set(files) - set(ROLES):
+            raise ValueError(f"Manifest entry for {supplier!r} must only list {', '.join(ROLES)}")
+        grouped = {role: [] for role in ROLES}
+        for role, role_files in files.items():
+            for filename in role_files:
+                if filename not in by_name:
+                    raise ValueError(f"File {filename!r} listed for {supplier!r} was not uploaded")
+                grouped[role].append(by_name[filename])
+        suppliers.append((str(supplier), grouped))
+    return suppliers
+
+
+def group_by_folder(names: list):
+    """
+    Groups files by their top-level folder, one supplier per folder. Returns the
+    suppliers and the files that could not be assigned.
+    """
+    folders = {}
+    skipped = []
+    for name in names:
+        role = classify_file(name)
+        if "/" not in name or role is None:
+            skipped.append(name)
+            continue
+        supplier = name.split("/", 1)[0]
+        folders.setdefault(supplier, {r: [] for r in ROLES})[role].append(name)
+    return sorted(folders.items()), skipped
+
+
+def vendor_part_id(vendor: str) -> str:
+    """
+    Directory name for one vendor's split rows: its slug for readability plus a
+    hash of the name itself, since vendors such as "Acme Corp" and "ACME CORP."
+    share a slug but are different suppliers.
+    """
+    digest = hashlib.sha1(vendor.encode("utf-8")).hexdigest()[:12]
+    return f"{slugify(vendor) or 'unnamed'}-{digest}"
+
+
+def split_ledger(path: str, file_type: str, output_dir: str) -> dict:
+    """
+    Parses one combined PO or invoice ledger and writes its rows per `vendor`
+    (names compared after trimming whitespace) as Parquet files.
+    Returns {vendor: parquet path}. Runs in a worker process.
+    """
+    parser = parse_po_file if file_type == "po" else parse_invoice_file
+    df = parser(path, path)
+    if "vendor" not in df.columns or df["vendor"].isna().all():
+        raise ValueError(f"{os.path.basename(path)} has no vendor/supplier column to group suppliers by")
+
+    stem = slugify(os.path.basename(path))
+    parts = {}
+    vendors = df["vendor"].astype(str).str.strip().where(df["vendor"].notna())
+    for vendor, frame in df.groupby(vendors, sort=False):
+        directory = os.path.join(output_dir, file_type, vendor_part_id(vendor))
+        os.makedirs(directory, exist_ok=True)
+        parts[vendor] = os.path.join(directory, f"{stem}.parquet")
+        frame.reset_index(drop=True).to_parquet(parts[vendor])
+    return parts
+
+
+def _load_frames(paths: list, parser) -> pd.DataFrame:
+    frames = []
+    for path in paths:
+        if path.endswith(".parquet"):
+            # Already parsed and normalized when the ledger was split by vendor
+            frames.append(pd.read_parquet(path))
+        else:
+            frames.append(parser(path, path))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def empty_row(supplier: str) -> dict:
+    return {column: None for column in RESULT_COLUMNS} | {"supplier": supplier}
+
+
+def evaluate_supplier(supplier: str, files: dict, policy=None) -> dict:
+    """
+    Evaluates one supplier from its files ({role: [paths]}) the same way
+    /upload/full_evaluation does, minus the LLM narrative, and returns a flat
+    result row. Runs in a worker process.
+    """
+    policy = policy or current_policy()
+    po_df = _load_frames(files.get("po_files", []), parse_po_file)
+    inv_df = _load_frames(files.get("inv_files", []), parse_invoice_file)
+    scorecard_metrics = calculate_scorecard(po_df, inv_df, policy)
+
+    # Like full_evaluation: the latest fiscal year's ratios, and trends across years
+    statements = [(os.path.basename(path), parse_financial_pdf(path, os.path.basename(path)))
+                  for path in files.get("financial_files", [])]
+    financials = financial_periods(statements)
+    financial_ratios, trends = financials["ratios"], financials["trends"]
+
+    overall = calculate_overall_score(scorecard_metrics, financial_ratios, policy, trends)
+    concerns = identify_lender_concerns(scorecard_metrics, financial_ratios, policy, trends)
+
+    reconciliation = scorecard_metrics.get("reconciliation", {})
+    lag = reconciliation.get("po_to_invoice_lag_days")
+    row = empty_row(supplier)
+    row.update({
+        "status": "completed",
+        "grade": overall["grade"],
+        "score": overall["score"],
+        "operational_score": overall["breakdown"]["operational_score"],
+        "financial_score": overall["breakdown"]["financial_score"],
+        "trend_score": overall["breakdown"]["trend_score"],
+        "po_to_invoice_lag_days_median": lag.get("median") if isinstance(lag, dict) else None,
+        "po_records": len(po_df),
+        "inv_records": len(inv_df),
+        "lender_concerns": concerns,
+        "rationale": generate_rationale(overall["grade"], overall["score"], concerns),
+    })
+    for source in (scorecard_metrics, reconciliation, financial_ratios, trends):
+        for column, value in source.items():
+            if column in NUMERIC_COLUMNS:
+                row[column] = _number(value)
+    return row
+
+
+def write_results(rows: list, path: str, candidate_policy=None):
+    """
+    Writes the result rows as one Parquet file, atomically. With a candidate
+    policy, the rows are also re-scored under it (A/B) in one vectorized pass,
+    adding candidate_* columns, score_delta and grade_changed.
+    """
+    df = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    for column in NUMERIC_COLUMNS:
+        df[column] = pd.to_numeric(df[column]).astype("float64")
+    df["lender_concerns"] = df["lender_concerns"].map(lambda concerns: list(concerns or []))
+
+    if candidate_policy is not None:
+        candidate = score_portfolio(df, policy=candidate_policy)
+        completed = df["status"] == "completed"
+        for column in ("score", "grade", "operational_score", "financial_score", "trend_score", "lender_concerns"):
+            df[f"candidate_{column}"] = candidate[column].where(completed, None)
+        df["score_delta"] = df["candidate_score"] - df["score"]
+        df["grade_changed"] = completed & (df["candidate_grade"] != df["grade"])
+    temporary = f"{path}.tmp"
+    df.to_parquet(temporary, index=False)
+    os.replace(temporary, path)
+
+
+class BatchJob:
+    """
+    One batch evaluation: its inputs, the suppliers planned from them, and
+    progress counters that the API polls.
+    """
+
+    def __init__(self, job_id: str, directory: str):
+        self.id = job_id
+        self.directory = directory
+        self.input_dir = os.path.join(directory, "inputs")
+        self.result_path = os.path.join(directory, "results.parquet")
+        self.state = "receiving"
+        self.mode = None
+        self.suppliers = []  # [(supplier, {role: [paths]})]
+        self.ledgers = {}  # vendor mode: {role: [paths]} still to be split
+        self.ledger_errors = []  # vendor mode: [(ledger, error)] for ledgers that could not be split
+        self.skipped = []
+        self.policy = None  # pinned when the job starts, so hot reloads never split a job
+        self.candidate_policy = None
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def advance(self, ok: bool):
+        with self._lock:
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def progress(self) -> dict:
+        with self._lock:
+            done = self.completed + self.failed
+            elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+            return {
+                "job_id": self.id,
+                "state": self.state,
+                "mode": self.mode,
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "percent": round(done / self.total * 100, 1) if self.total else 0.0,
+                "elapsed_seconds": round(elapsed, 2),
+                "skipped_files": self.skipped,
+                "policy": self.policy.info() if self.policy else None,
+                "candidate_policy": self.candidate_policy.info() if self.candidate_policy else None,
+                "error": self.error,
+            }
+
+
+class BatchQueue:
+    """
+    Local FIFO job queue. A single background thread takes one job at a time
+    and fans its suppliers out over the shared process pool, so a running job
+    keeps every core busy and later jobs wait their turn.
+    """
+
+    def __init__(self, directory: str = BATCH_DIR, max_in_flight: int = MAX_IN_FLIGHT):
+        self.directory = directory
+        self.max_in_flight = max_in_flight
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def create_job(self) -> BatchJob:
+        self.evict()
+        job_id = uuid.uuid4().hex
+        job = BatchJob(job_id, os.path.join(self.directory, job_id))
+        os.makedirs(job.input_dir, exist_ok=True)
+        with self._lock:
+            self._jobs[job_id] = job
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def discard(self, job: BatchJob):
+        with self._lock:
+            self._jobs.pop(job.id, None)
+        shutil.rmtree(job.directory, ignore_errors=True)
+
+    def evict(self, now: float = None):
+        """
+        Drops finished jobs older than JOB_TTL_SECONDS, and the oldest ones past
+        MAX_FINISHED_JOBS, deleting their directories. Queued and running jobs
+        are never evicted.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            finished = sorted((job for job in self._jobs.values() if job.finished_at is not None),
+                              key=lambda job: job.finished_at)
+            expired = [job for job in finished if now - job.finished_at > JOB_TTL_SECONDS]
+            kept = [job for job in finished if job not in expired]
+            expired += kept[:max(len(kept) - MAX_FINISHED_JOBS, 0)]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.directory, ignore_errors=True)
+
+    def save_input(self, job: BatchJob, filename: str, fileobj):
+        """
+        Copies one upload into the job's input directory, keeping its folders.
+        """
+        path = os.path.join(job.input_dir, _safe_relative_path(filename))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(fileobj, f)
+
+    def plan(self, job: BatchJob, manifest: dict = None):
+        """
+        Works out which files belong to which supplier: from the manifest if
+        given, else from top-level folders (folder uploads or archives), else
+        from the `vendor` column of combined PO and invoice ledgers.
+        Raises ValueError if the inputs cannot be grouped.
+        """
+        names = _expand_archives(job.input_dir)
+        if not names:
+            raise ValueError("No files uploaded")
+        absolute = lambda name: os.path.join(job.input_dir, name)
+
+        if manifest is not None:
+            job.mode = "manifest"
+            suppliers = group_by_manifest(names, manifest)
+        elif any("/" in name for name in names):
+            job.mode = "folder"
+            suppliers, job.skipped = group_by_folder(names)
+        else:
+            job.mode = "vendor"
+            suppliers = []
+            job.ledgers = {role: [] for role in ROLES}
+            for name in names:
+                role = classify_file(name)
+                if role is None:
+                    job.skipped.append(name)
+                else:
+                    job.ledgers[role].append(absolute(name))
+            if not job.ledgers["po_files"] and not job.ledgers["inv_files"]:
+                raise ValueError("No PO or invoice ledgers to group suppliers by")
+
+        job.suppliers = [
+            (supplier, {role: [absolute(name) for name in files.get(role, [])] for role in ROLES})
+            for supplier, files in suppliers
+        ]
+        if job.mode != "vendor" and not job.suppliers:
+            raise ValueError("No supplier files found")
+        job.total = len(job.suppliers)
+
+    def enqueue(self, job: BatchJob):
+        job.state = "queued"
+        self._queue.put(job)
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name="supplier-eval-batch", daemon=True)
+                self._worker.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {"queued": self._queue.qsize(), "jobs": {state: states.count(state) for state in set(states)}}
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.started_at = time.time()
+            job.policy = current_policy()
+            try:
+                self._run(job)
+                job.state = "completed"
+            except Exception as e:
+                logger.exception("Batch job %s failed", job.id)
+                job.error = str(e)
+                job.state = "failed"
+            finally:
+                job.finished_at = time.time()
+                shutil.rmtree(job.input_dir, ignore_errors=True)
+                shutil.rmtree(os.path.join(job.directory, "split"), ignore_errors=True)
+
+    def _run(self, job: BatchJob):
+        if job.mode == "vendor":
+            job.state = "splitting"
+            self._split_ledgers(job)
+
+        job.state = "running"
+        rows = [None] * len(job.suppliers)
+        planned = deque(enumerate(job.suppliers))
+        pending = {}
+        while planned or pending:
+            while planned and len(pending) < self.max_in_flight:
+                index, (supplier, files) = planned.popleft()
+                pending[submit_to_process_pool(evaluate_supplier, supplier, files, job.policy)] = (index, supplier)
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, supplier = pending.pop(future)
+                try:
+                    rows[index] = future.result()
+                    job.advance(ok=True)
+                except Exception as e:
+                    rows[index] = empty_row(supplier) | {"status": "failed", "error": str(e)}
+                    job.advance(ok=False)
+
+        rows += [empty_row(ledger) | {"status": "failed", "error": error} for ledger, error in job.ledger_errors]
+        write_results(rows, job.result_path, job.candidate_policy)
+
+    def _split_ledgers(self, job: BatchJob):
+        """
+        Vendor mode: splits every ledger by vendor in parallel, then plans one
+        supplier per vendor. Financial PDFs are matched to vendors by file name
+        (e.g. "acme_corp_fy2023.pdf" for vendor "Acme Corp"). A ledger that
+        cannot be split (e.g. one without a vendor column) becomes a failed
+        row of its own, and the other ledgers are still evaluated.
+        """
+        output_dir = os.path.join(job.directory, "split")
+        relative = lambda path: os.path.relpath(path, job.input_dir).replace(os.sep, "/")
+        calls = [
+            (role, path, submit_to_process_pool(split_ledger, path, "po" if role == "po_files" else "invoice", output_dir))
+            for role in ("po_files", "inv_files")
+            for path in job.ledgers[role]
+        ]
+        vendors = {}
+        for role, ledger, future in calls:
+            try:
+                parts = future.result()
+            except Exception as e:
+                job.ledger_errors.append((relative(ledger), str(e)))
+                continue
+            for vendor, path in parts.items():
+                vendors.setdefault(vendor, {r: [] for r in ROLES})[role].append(path)
+
+        # Longest vendor slug first, so "acme-corp-uk" wins over "acme-corp"
+        slugs = sorted(((slugify(vendor), vendor) for vendor in vendors), key=lambda item: -len(item[0]))
+        for path in job.ledgers["financial_files"]:
+            stem = slugify(os.path.splitext(os.path.basename(path))[0])
+            match = next((vendor for slug, vendor in slugs if slug and (stem == slug or stem.startswith(slug + "-"))), None)
+            if match is None:
+                job.skipped.append(relative(path))
+            else:
+                vendors[match]["financial_files"].append(path)
+
+        job.suppliers = sorted(vendors.items())
+        job.total = len(job.suppliers) + len(job.ledger_errors)
+        for _ in job.ledger_errors:
+            job.advance(ok=False)
+
+
+batch_queue = BatchQueue()
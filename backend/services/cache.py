@@ -0,0 +1,182 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from services.startup import LazyModule
+
+pd = LazyModule("pandas")
+
+logger = logging.getLogger(__name__)
+
+# Parsed documents are cached by content, so re-uploading the same workbook or PDF
+# skips parsing (and any LLM fallback) entirely. The memory tier is an LRU bounded
+# by bytes; the disk tier survives restarts.
+CACHE_DIR = os.getenv(
+    "SUPPLIER_EVAL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "documents"),
+)
+MEMORY_LIMIT_BYTES = int(os.getenv("SUPPLIER_EVAL_CACHE_MEMORY_BYTES", str(256 * 1024 * 1024)))
+
+
+def file_digest(source) -> str:
+    """
+    SHA-256 hex digest of bytes, a file path or a binary file object. Files are
+    hashed through one reused 1 MB buffer, never loaded into memory whole (nor
+    memory-mapped, whose pages would count towards the server's RSS).
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb", buffering=0) as f:
+            return file_digest(f)
+    digest = hashlib.sha256()
+    buffer = bytearray(1024 * 1024)
+    view = memoryview(buffer)
+    source.seek(0)
+    while True:
+        size = source.readinto(buffer)
+        if not size:
+            break
+        digest.update(view[:size])
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def document_key(source, filename: str, parser) -> str:
+    """
+    Cache key for parsing `source` (bytes, a file path or a binary file object)
+    with `parser`: the SHA-256 of its content, the file extension of `filename`
+    (which selects the reader) and the parser's name and PARSER_VERSION, so
+    bumping the version invalidates old entries.
+    """
+    version = getattr(sys.modules[parser.__module__], "PARSER_VERSION", 0)
+    extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    digest = file_digest(source)
+    return f"{digest}-{parser.__name__}-{extension}-v{version}"
+
+
+def _size_of(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    return len(json.dumps(value, default=str))
+
+
+class DocumentCache:
+    """
+    Two-tier cache of parsed documents: DataFrames (PO / invoice files) and
+    dicts (financial PDFs). DataFrames are stored on disk as Parquet, dicts as JSON.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, memory_limit_bytes: int = MEMORY_LIMIT_BYTES):
+        self.directory = directory
+        self.memory_limit_bytes = memory_limit_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_errors": 0}
+
+    def get(self, key: str):
+        """
+        Returns the cached value for `key`, or None on a miss.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return self._copy(self._entries[key][0])
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._remember(key, value)
+        return self._copy(value)
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+                "memory_limit_bytes": self.memory_limit_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+    @staticmethod
+    def _copy(value):
+        # Callers may add columns or keys; never hand out the cached object itself.
+        if isinstance(value, pd.DataFrame):
+            return value.copy(deep=False)
+        return copy.deepcopy(value)
+
+    def _remember(self, key: str, value):
+        size = _size_of(value)
+        if size > self.memory_limit_bytes:
+            return
+        if key in self._entries:
+            self._memory_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_limit_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self._counters["evictions"] += 1
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{extension}")
+
+    def _read_disk(self, key: str):
+        try:
+            path = self._path(key, "parquet")
+            if os.path.exists(path):
+                return pd.read_parquet(path)
+            path = self._path(key, "json")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning("Document cache read failed for %s: %s", key, e)
+            with self._lock:
+                self._counters["disk_errors"] += 1
+        return None
+
+    def _write_disk(self, key: str, value):
+        is_frame = isinstance(value, pd.DataFrame)
+        path = self._path(key, "parquet" if is_frame else "json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if is_frame:
+                value.to_parquet(tmp_path, index=False)
+            else:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(value, f)
+            # Atomic rename, so concurrent readers never see a partial file
+            os.replace(tmp_path, path)
+        except Exception as e:
+            # e.g. object columns mixing numbers and text cannot be written as Parquet;
+            # the entry then only lives in the memory tier.
+            logger.warning("Document cache write failed for %s: %s", key, e)
+            with self._lock:
+                self._counters["disk_errors"] += 1
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+document_cache = DocumentCache()
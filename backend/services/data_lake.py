@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import functools
+import os
+import shutil
+import threading
+import time
+from urllib.parse import quote
+
+from services.reconciliation import normalize_key
+from services.scorecard import calculate_scorecard
+from services.startup import LazyModule
+
+pd = LazyModule("pandas")
+pa = LazyModule("pyarrow")
+ds = LazyModule("pyarrow.dataset")
+fs = LazyModule("pyarrow.fs")
+
+# Columnar copy of every accepted PO/invoice upload, so queries never go back to
+# the spreadsheets. Each upload is normalized once and written as Parquet under
+#   <LAKE_DIR>/<kind>/supplier=<supplier>/month=<YYYY-MM>/<upload id>-<n>.parquet
+# Reads open one supplier's directory only, prune month partitions and row
+# groups with the date filter, and load just the columns a query needs through
+# memory-mapped files.
+LAKE_DIR = os.getenv(
+    "SUPPLIER_EVAL_LAKE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "lake"),
+)
+
+# Always present in parsed frames (the parsers add them), so kept even when empty
+REQUIRED_COLUMNS = {
+    "po": ["po_number", "date", "sku", "quantity", "delivery_date"],
+    "invoice": ["invoice_number", "po_number", "amount", "date", "status"],
+}
+# Columns the scorecard and reconciliation read
+SCORECARD_COLUMNS = {
+    "po": ["po_number", "sku", "quantity", "amount", "date", "promised_date", "delivery_date"],
+    "invoice": ["invoice_number", "po_number", "sku", "quantity", "amount", "date", "status"],
+}
+# A line is identified as in the supplier store; the latest upload of a line wins
+LINE_KEYS = {"po": ["po_number", "sku"], "invoice": ["invoice_number", "sku"]}
+
+KEY_COLUMNS = {"po_number", "invoice_number", "sku"}
+CATEGORY_COLUMNS = ["po_number", "invoice_number", "sku", "status", "vendor"]
+
+
+@functools.lru_cache(maxsize=None)
+def schemas() -> dict:
+    """
+    Canonical columns and types per kind (the normalized names from
+    utils/normalization.py). Other columns are not kept. Built on first use,
+    so importing this module does not import pyarrow.
+    """
+    return {
+        "po": pa.schema([
+            ("po_number", pa.string()),
+            ("sku", pa.string()),
+            ("quantity", pa.float64()),
+            ("amount", pa.float64()),
+            ("date", pa.timestamp("ns")),
+            ("promised_date", pa.timestamp("ns")),
+            ("delivery_date", pa.timestamp("ns")),
+            ("vendor", pa.string()),
+        ]),
+        "invoice": pa.schema([
+            ("invoice_number", pa.string()),
+            ("po_number", pa.string()),
+            ("sku", pa.string()),
+            ("quantity", pa.float64()),
+            ("amount", pa.float64()),
+            ("date", pa.timestamp("ns")),
+            ("status", pa.string()),
+            ("vendor", pa.string()),
+            ("amount_paid", pa.float64()),
+            ("date_paid", pa.timestamp("ns")),
+        ]),
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _month_partitioning():
+    return ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+
+
+def _column(df: pd.DataFrame, name: str, field: pa.Field) -> pa.Array:
+    values = df[name]
+    if name in KEY_COLUMNS:
+        # Stored normalized, so 123 / 123.0 / "123 " are one PO across uploads
+        return pa.array(normalize_key(values).astype(object), type=pa.string(), from_pandas=True)
+    if pa.types.is_timestamp(field.type):
+        return pa.array(pd.to_datetime(values, errors="coerce"), type=field.type, from_pandas=True)
+    if pa.types.is_floating(field.type):
+        return pa.array(pd.to_numeric(values, errors="coerce").astype("float64"), type=field.type, from_pandas=True)
+    return pa.array(values.astype(str).where(values.notna(), None), type=field.type, from_pandas=True)
+
+
+def _timestamp(value: pd.Timestamp) -> pa.Scalar:
+    return pa.scalar(value.as_unit("ns").value, type=pa.timestamp("ns"))
+
+
+def to_table(df: pd.DataFrame, kind: str) -> pa.Table:
+    """
+    A parsed PO or invoice frame as an Arrow table in the canonical schema,
+    keeping only the canonical columns the frame has, plus the month partition
+    column derived from `date`.
+    """
+    schema = schemas()[kind]
+    fields = [field for field in schema if field.name in df.columns]
+    columns = [_column(df, field.name, field) for field in fields]
+    dates = pd.to_datetime(df["date"], errors="coerce") if "date" in df.columns else pd.Series(pd.NaT, index=df.index)
+    month = pa.array(dates.dt.strftime("%Y-%m").where(dates.notna(), None), type=pa.string(), from_pandas=True)
+    return pa.Table.from_arrays(columns + [month], schema=pa.schema(fields + [pa.field("month", pa.string())]))
+
+
+class DataLake:
+    """
+    Partitioned Parquet store of normalized uploads, per supplier and month.
+    """
+
+    def __init__(self, path: str = LAKE_DIR):
+        self.path = path
+        self._filesystem = None
+        self._lock = threading.Lock()
+
+    @property
+    def filesystem(self):
+        if self._filesystem is None:
+            self._filesystem = fs.LocalFileSystem(use_mmap=True)
+        return self._filesystem
+
+    def _directory(self, kind: str, supplier: str) -> str:
+        return os.path.join(self.path, kind, "supplier=" + quote(str(supplier), safe=""))
+
+    def append(self, supplier: str, kind: str, df: pd.DataFrame, upload_id: str) -> int:
+        """
+        Writes one parsed upload. Files are named after `upload_id` (e.g. the
+        content hash), so writing the same upload again replaces its files
+        instead of duplicating its rows. Returns the number of rows written.
+        """
+        table = to_table(df, kind)
+        table = table.append_column("ingested_at", pa.array([time.time_ns()] * len(table), type=pa.int64()))
+        with self._lock:
+            ds.write_dataset(
+                table,
+                self._directory(kind, supplier),
+                format="parquet",
+                partitioning=_month_partitioning(),
+                basename_template=f"{upload_id}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+                max_rows_per_group=256 * 1024,
+            )
+        return len(table)
+
+    def read(self, supplier: str, kind: str, columns: list = None, start=None, end=None) -> pd.DataFrame:
+        """
+        The supplier's lines of one kind with `date` in [start, end) (either
+        bound optional; rows without a date only match an unbounded window),
+        deduplicated like the supplier store. Only `columns` are read.
+        """
+        directory = self._directory(kind, supplier)
+        schema = schemas()[kind]
+        columns = [name for name in (columns or schema.names) if name in schema.names]
+        if not os.path.isdir(directory):
+            return pd.DataFrame(columns=columns)
+
+        dataset = ds.dataset(
+            directory,
+            schema=pa.schema(list(schema) + [pa.field("ingested_at", pa.int64()), pa.field("month", pa.string())]),
+            format="parquet",
+            partitioning=_month_partitioning(),
+            filesystem=self.filesystem,
+        )
+        # The month predicates prune whole partitions, the date ones row groups and rows
+        condition = ds.scalar(True)
+        if start is not None:
+            start = pd.Timestamp(start)
+            condition &= (ds.field("month") >= start.strftime("%Y-%m")) & (ds.field("date") >= _timestamp(start))
+        if end is not None:
+            end = pd.Timestamp(end)
+            condition &= (ds.field("month") <= end.strftime("%Y-%m")) & (ds.field("date") < _timestamp(end))
+
+        keys = LINE_KEYS[kind]
+        table = dataset.to_table(
+            columns=list(dict.fromkeys(columns + keys)) + ["ingested_at"], filter=condition
+        )
+        df = table.to_pandas(categories=[name for name in CATEGORY_COLUMNS if name in table.column_names])
+
+        # Latest upload of a line wins. Repeats of a key within one upload are
+        # distinct lines, numbered in file order as in the supplier store.
+        df = df[df[keys[0]].notna()]
+        df["line"] = df.groupby(["ingested_at"] + keys, sort=False, observed=True, dropna=False).cumcount()
+        df = df.sort_values("ingested_at", kind="stable").drop_duplicates(subset=keys + ["line"], keep="last")
+        df = df[columns].reset_index(drop=True)
+        # Optional columns none of the uploads had are left out, as after a concat
+        empty = [name for name in df.columns if name not in REQUIRED_COLUMNS[kind] and df[name].isna().all()]
+        return df.drop(columns=empty)
+
+    def scorecard(self, supplier: str, start=None, end=None, policy=None) -> dict:
+        """
+        calculate_scorecard over the supplier's lines dated in [start, end).
+        """
+        po_df = self.read(supplier, "po", SCORECARD_COLUMNS["po"], start, end)
+        inv_df = self.read(supplier, "invoice", SCORECARD_COLUMNS["invoice"], start, end)
+        return calculate_scorecard(po_df, inv_df, policy)
+
+    def delete(self, supplier: str):
+        with self._lock:
+            for kind in schemas():
+                shutil.rmtree(self._directory(kind, supplier), ignore_errors=True)
+
+
+data_lake = DataLake()
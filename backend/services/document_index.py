@@ -0,0 +1,154 @@
+import math
+import os
+import re
+
+from services.line_items import IGNORED_LABELS, LINE_ITEM_PATTERNS
+
+# Prompt budget for the document excerpt sent to the LLM extraction fallback, in
+# (estimated) tokens.
+CONTEXT_TOKENS = int(os.getenv("SUPPLIER_EVAL_LLM_CONTEXT_TOKENS", "1000"))
+# Chunks are runs of whole lines of about this many characters (~150 tokens), small
+# enough that a statement table is not diluted by the narrative around it.
+CHUNK_CHARS = int(os.getenv("SUPPLIER_EVAL_LLM_CHUNK_CHARS", "600"))
+
+# What each line item is called across reports: the labels the regex matcher knows
+# plus common variants it deliberately does not match (those are why the fallback
+# runs at all).
+FINANCIAL_TERMS = {
+    "revenue": ["turnover", "net revenues", "total revenues", "sales revenue", "operating revenue"],
+    "net_income": ["net earnings", "net loss", "profit after tax", "profit for the period",
+                   "profit attributable", "net profit after tax"],
+    "total_assets": ["total assets"],
+    "total_liabilities": ["total liabilities", "total debts"],
+    "current_assets": ["current assets"],
+    "current_liabilities": ["current liabilities", "creditors due within one year"],
+    "inventory": ["inventories", "stock in trade", "stocks"],
+    "equity": ["stockholders' equity", "shareholders' funds", "total net assets", "members' equity"],
+}
+for _key, _labels in LINE_ITEM_PATTERNS.items():
+    FINANCIAL_TERMS[_key] = sorted({label.lower() for label in _labels} | set(FINANCIAL_TERMS[_key]))
+
+# Headings of the primary statements and scale headers ("in thousands")
+_HEADING_RE = re.compile(
+    r"balance sheet|financial position|income statement|statement of operations|profit and loss|"
+    r"comprehensive income|in (?:thousands|millions|billions)|'?000s?\b",
+    re.IGNORECASE,
+)
+_AMOUNT_RE = re.compile(r"\(?[-−]?[$€£]?\s*\d{1,3}(?:,\d{3})+(?:\.\d+)?\)?|\b\d{4,}(?:\.\d+)?\b")
+
+# term (lower-cased) -> key, longest terms first so "total current assets" is not
+# read as "current assets" inside it. Ignored labels ("cost of sales") map to None.
+_TERM_KEYS = {label.lower(): None for label in IGNORED_LABELS}
+_TERM_KEYS.update({term: key for key, terms in FINANCIAL_TERMS.items() for term in terms})
+_TERM_RE = re.compile(
+    r"(?<![a-z])(" + "|".join(re.escape(term) for term in sorted(_TERM_KEYS, key=len, reverse=True)) + r")(?![a-z])"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Prompt tokens for `text`, estimated at four characters per token (OpenAI's
+    rule of thumb for English; no tokenizer is needed).
+    """
+    return math.ceil(len(text) / 4)
+
+
+class Chunk:
+    """
+    A run of lines from one page, with the line-item keys it mentions next to an
+    amount and its relevance score.
+    """
+
+    def __init__(self, page: int, text: str):
+        self.page = page
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.keys = {}  # key -> lines mentioning it with an amount
+        self.headings = 0
+        self.amounts = 0
+        for line in text.lower().replace("\u2019", "'").splitlines():
+            has_amount = _AMOUNT_RE.search(line) is not None
+            self.amounts += has_amount
+            if _HEADING_RE.search(line):
+                self.headings += 1
+            if has_amount:
+                for term in _TERM_RE.findall(line):
+                    key = _TERM_KEYS[term]
+                    if key is not None:
+                        self.keys[key] = self.keys.get(key, 0) + 1
+
+    def score(self, keys) -> float:
+        """
+        Relevance per token: line items still wanted (next to an amount) count
+        most, then other line items, statement headings and bare amounts.
+        """
+        wanted = sum(count for key, count in self.keys.items() if key in keys)
+        other = sum(self.keys.values()) - wanted
+        points = 4 * wanted + other + 2 * self.headings + 0.25 * self.amounts
+        return points / max(self.tokens, 1)
+
+
+class DocumentIndex:
+    """
+    Page/section index of an extracted document. `context()` packs the chunks
+    most likely to hold the requested line items into a token budget, rather
+    than sending the start of the document (typically a cover page and the
+    auditor's letter).
+    """
+
+    def __init__(self, pages: dict, chunk_chars: int = None):
+        chunk_chars = chunk_chars or CHUNK_CHARS
+        self.chunks = []
+        for page in sorted(pages):
+            lines, size = [], 0
+            for line in (pages[page] or "").splitlines():
+                if lines and size + len(line) > chunk_chars:
+                    self.chunks.append(Chunk(page, "\n".join(lines)))
+                    lines, size = [], 0
+                lines.append(line)
+                size += len(line) + 1
+            if any(line.strip() for line in lines):
+                self.chunks.append(Chunk(page, "\n".join(lines)))
+
+    @classmethod
+    def from_text(cls, text: str, chunk_chars: int = None):
+        return cls({0: text}, chunk_chars=chunk_chars)
+
+    def select(self, keys, token_budget: int = None) -> list:
+        """
+        The highest scoring chunks that fit in `token_budget`, in document order.
+        Only chunks mentioning one of `keys` next to an amount are picked; failing
+        that, chunks with any line item or statement heading, and failing that
+        the document is read from the start.
+        """
+        token_budget = token_budget or CONTEXT_TOKENS
+        keys = set(keys)
+        candidates = ([chunk for chunk in self.chunks if keys.intersection(chunk.keys)]
+                      or [chunk for chunk in self.chunks if chunk.keys or chunk.headings])
+        ranked = sorted(candidates, key=lambda chunk: -chunk.score(keys)) or self.chunks
+
+        selected, used = [], 0
+        for chunk in ranked:
+            if used + chunk.tokens <= token_budget:
+                selected.append(chunk)
+                used += chunk.tokens
+        # The first chunk alone can be over budget; it is cut rather than dropped
+        if not selected and ranked:
+            chunk = ranked[0]
+            selected.append(Chunk(chunk.page, chunk.text[:token_budget * 4]))
+
+        order = {id(chunk): position for position, chunk in enumerate(self.chunks)}
+        return sorted(selected, key=lambda chunk: (chunk.page, order.get(id(chunk), 0)))
+
+    def context(self, keys, token_budget: int = None) -> str:
+        """
+        The selected chunks as prompt text, each page's excerpts under a
+        "[Page N]" marker.
+        """
+        parts, page = [], None
+        for chunk in self.select(keys, token_budget):
+            if chunk.page != page:
+                parts.append(f"[Page {chunk.page + 1}]")
+                page = chunk.page
+            parts.append(chunk.text)
+        return "\n".join(parts)
@@ -0,0 +1,212 @@
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from services.startup import preload
+
+logger = logging.getLogger(__name__)
+
+# Pool sizes and limits are read once from the environment so they can be tuned
+# per deployment without code changes.
+CPU_WORKERS = int(os.getenv("SUPPLIER_EVAL_CPU_WORKERS", os.cpu_count() or 1))
+IO_WORKERS = int(os.getenv("SUPPLIER_EVAL_IO_WORKERS", "16"))
+REQUEST_CONCURRENCY = int(os.getenv("SUPPLIER_EVAL_REQUEST_CONCURRENCY", "4"))
+# "spawn" keeps worker processes independent of the event loop and threads of
+# the API process; "fork" starts faster but is unsafe once threads are running.
+START_METHOD = os.getenv("SUPPLIER_EVAL_MP_START", "spawn")
+# Modules every worker process imports as it starts, before taking tasks: the
+# parsers' dependencies (openpyxl reads XLSX), which spawned workers would
+# otherwise import during their first task. Comma-separated; empty to import
+# them on first use.
+WORKER_PRELOAD = [name for name in os.getenv("SUPPLIER_EVAL_WORKER_PRELOAD", "pandas,openpyxl,pypdfium2").split(",") if name]
+
+_cpu_pool = None
+_io_pool = None
+_pool_lock = threading.Lock()
+
+# Tasks submitted to each pool that have not finished yet (queued + running).
+_pending = {"process": 0, "thread": 0}
+_pending_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Returns the shared process pool used for CPU-bound parsing.
+    """
+    global _cpu_pool
+    with _pool_lock:
+        if _cpu_pool is None:
+            _cpu_pool = ProcessPoolExecutor(
+                max_workers=CPU_WORKERS,
+                mp_context=multiprocessing.get_context(START_METHOD),
+                initializer=_preload_worker,
+                initargs=(WORKER_PRELOAD,),
+            )
+        return _cpu_pool
+
+
+def _preload_worker(names: list):
+    # An exception here would break the pool; a module that fails to import is
+    # left to fail in the task that needs it
+    try:
+        preload(names)
+    except Exception as error:
+        logger.warning("Worker preload failed: %s", error)
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+def warm_process_pool(timeout: float = None) -> dict:
+    """
+    Starts the process pool's workers, which import WORKER_PRELOAD as they
+    start, and waits until they take tasks. Returns how many workers answered.
+    """
+    pool = get_process_pool()
+    futures = [_submit("process", pool, _worker_pid) for _ in range(CPU_WORKERS)]
+    done, _ = wait(futures, timeout=timeout)
+    if not done:
+        raise TimeoutError(f"no process pool worker started within {timeout:g} seconds")
+    return {"workers": CPU_WORKERS, "answered": len({future.result() for future in done})}
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """
+    Returns the shared thread pool used for I/O-bound work.
+    """
+    global _io_pool
+    with _pool_lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="supplier-eval-io")
+        return _io_pool
+
+
+def in_worker_process() -> bool:
+    """
+    True when running inside a pool worker, where nested pools must not be created.
+    """
+    return multiprocessing.parent_process() is not None
+
+
+def _release(kind: str):
+    with _pending_lock:
+        _pending[kind] -= 1
+
+
+def _submit(kind: str, pool, func, *args):
+    with _pending_lock:
+        _pending[kind] += 1
+    try:
+        future = pool.submit(func, *args)
+    except Exception:
+        _release(kind)
+        raise
+    future.add_done_callback(lambda _: _release(kind))
+    return future
+
+
+async def run_in_process(func, *args):
+    """
+    Runs a picklable CPU-bound function in the process pool without blocking the event loop.
+    """
+    return await asyncio.wrap_future(_submit("process", get_process_pool(), func, *args))
+
+
+async def run_in_thread(func, *args):
+    """
+    Runs an I/O-bound (or GIL-releasing) function in the thread pool, in a copy
+    of the caller's context (so the request's metrics trace follows it).
+    """
+    context = contextvars.copy_context()
+    return await asyncio.wrap_future(_submit("thread", get_thread_pool(), context.run, func, *args))
+
+
+def submit_to_process_pool(func, *args):
+    """
+    Submits a picklable function to the process pool from synchronous code and
+    returns its concurrent.futures.Future.
+    """
+    return _submit("process", get_process_pool(), func, *args)
+
+
+def map_in_processes(func, calls: list, timeout: float = None) -> list:
+    """
+    Runs func(*args) for every args tuple in `calls` on the process pool from
+    synchronous code and returns the results in order. Calls that have not
+    finished within `timeout` seconds are cancelled and return None.
+    Inside a pool worker the calls run inline, since pools cannot be nested.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    if in_worker_process():
+        results = []
+        for args in calls:
+            if deadline is not None and time.monotonic() >= deadline:
+                results.append(None)
+                continue
+            results.append(func(*args))
+        return results
+
+    pool = get_process_pool()
+    futures = [_submit("process", pool, func, *args) for args in calls]
+    wait(futures, timeout=timeout)
+
+    results = []
+    for future in futures:
+        if future.done() and not future.cancelled():
+            results.append(future.result())
+        else:
+            future.cancel()
+            results.append(None)
+    return results
+
+
+async def gather_limited(*aws, limit: int = None):
+    """
+    Awaits the given coroutines concurrently, with at most `limit` in flight at once.
+    Results are returned in the order the coroutines were passed in.
+    """
+    semaphore = asyncio.Semaphore(limit or REQUEST_CONCURRENCY)
+
+    async def _limited(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(_limited(aw) for aw in aws))
+
+
+def queue_depth() -> dict:
+    """
+    Number of tasks submitted to each pool that have not completed yet.
+    """
+    with _pending_lock:
+        return dict(_pending)
+
+
+def executor_stats() -> dict:
+    return {
+        "queue_depth": queue_depth(),
+        "process_workers": CPU_WORKERS,
+        "thread_workers": IO_WORKERS,
+        "request_concurrency": REQUEST_CONCURRENCY,
+    }
+
+
+def shutdown_pools():
+    """
+    Shuts down both pools. Called when the application stops.
+    """
+    global _cpu_pool, _io_pool
+    with _pool_lock:
+        if _cpu_pool is not None:
+            _cpu_pool.shutdown(wait=False, cancel_futures=True)
+            _cpu_pool = None
+        if _io_pool is not None:
+            _io_pool.shutdown(wait=False, cancel_futures=True)
+            _io_pool = None
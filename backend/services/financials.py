@@ -1,48 +1,193 @@
-import pdfplumber
+from __future__ import annotations
+
+import logging
 import re
-import io
+import os
+import time
+from services import layout_templates, pdf_text
+from services.executor import map_in_processes
+from services.metrics import registry, span, timed
+from services.pdf_text import PDF_BACKEND, extract_page_range
+from services.line_items import LINE_ITEM_PATTERNS, match_line_items, row_shape
+from services.document_index import DocumentIndex
+from services.startup import LazyModule
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+pypdfium2 = LazyModule("pypdfium2")
+
+# Bump whenever parsing output changes; cached parse results keyed on an older
+# version are ignored (see services/cache.py).
+PARSER_VERSION = 4
+
+logger = logging.getLogger(__name__)
+
+# Per-document extraction budget. Pages beyond MAX_PAGES are never read, and pages
+# not extracted within TIME_BUDGET seconds are skipped.
+MAX_PAGES = int(os.getenv("SUPPLIER_EVAL_PDF_MAX_PAGES", "300"))
+TIME_BUDGET = float(os.getenv("SUPPLIER_EVAL_PDF_TIME_BUDGET", "30"))
+# Pages handed to one worker process at a time; each task re-opens the PDF.
+PAGES_PER_TASK = int(os.getenv("SUPPLIER_EVAL_PDF_PAGES_PER_TASK", "8"))
+
+# Cheap signals that a page belongs to the primary statements
+STATEMENT_PAGE_HINTS = re.compile(
+    r"balance sheet|financial position|income statement|statement of operations|"
+    r"profit and loss|total assets|total liabilities|net income|revenue|net sales",
+    re.IGNORECASE,
+)
+
+# Fiscal year in statement headings, most explicit first: "for the year ended
+# December 31, 2023", "fiscal year 2023" / "FY2023" / "FY 23", "2023 annual
+# report", "as of December 31, 2023"
+FISCAL_YEAR_PATTERNS = [
+    re.compile(r"\b(?:year|period)s?\s+end(?:ed|ing)\s+(?:[a-z]+\s+\d{1,2},?\s+)?((?:19|20)\d{2})\b", re.IGNORECASE),
+    re.compile(r"\b(?:fiscal(?:\s+year)?|FY)\s*'?((?:19|20)\d{2}|\d{2})\b", re.IGNORECASE),
+    re.compile(r"\b((?:19|20)\d{2})\s+annual\s+report\b", re.IGNORECASE),
+    re.compile(r"\bas\s+(?:of|at)\s+(?:[a-z]+\s+\d{1,2},?\s+)?((?:19|20)\d{2})\b", re.IGNORECASE),
+]
+# A year in a file name: "acme_2023.pdf", "FY23 statements.pdf"
+FILENAME_YEAR_RE = re.compile(r"(?<![0-9])(?:((?:19|20)\d{2})|FY[ _-]?(\d{2}))(?![0-9])", re.IGNORECASE)
+
+def _full_year(digits: str) -> int:
+    return int(digits) if len(digits) == 4 else 2000 + int(digits)
+
+def detect_fiscal_year(text: str):
+    """
+    The fiscal year a statement reports on, from its headings, or None.
+    """
+    for pattern in FISCAL_YEAR_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return _full_year(match.group(1))
+    return None
+
+def fiscal_year_from_filename(filename: str):
+    match = FILENAME_YEAR_RE.search(os.path.basename(filename or ""))
+    if match is None:
+        return None
+    return _full_year(match.group(1) or match.group(2))
+
+def _extract_pages(source, page_numbers: list, backend: str, deadline: float) -> dict:
+    """
+    Fans page extraction with the named backend (see services/pdf_text.py) out
+    over the process pool. Returns {page_number: text} for the pages that
+    finished before the deadline.
+    """
+    batches = [page_numbers[i:i + PAGES_PER_TASK] for i in range(0, len(page_numbers), PAGES_PER_TASK)]
+    results = map_in_processes(
+        extract_page_range,
+        [(source, batch, backend) for batch in batches],
+        timeout=max(deadline - time.monotonic(), 0),
+    )
+
+    pages = {}
+    for batch, texts in zip(batches, results):
+        if texts is not None:
+            pages.update(zip(batch, texts))
+    registry.inc("supplier_eval_pdf_pages_total", len(pages), backend=backend)
+    return pages
+
+def _needs_layout(text: str) -> bool:
+    """
+    Whether the plain text of a statement page needs layout analysis: it is
+    empty, or it has lines holding only an amount while no line items are found
+    or fewer than half of the lines naming one also hold a number. Narrative
+    pages (no bare amounts) would read the same either way.
+    """
+    if not text.strip():
+        return True
+    labelled, with_amount, amounts_only = row_shape(text)
+    return amounts_only > 0 and (not match_line_items(text) or with_amount * 2 < labelled)
+
+@timed("pdf_extraction")
+def extract_pdf_pages(source, max_pages: int = None, time_budget: float = None, two_phase: bool = True,
+                      backend: str = None) -> tuple:
+    """
+    Extracts the pages of a financial PDF (bytes or a file path) within a page and
+    time budget. Returns ({page_number: text}, statement page numbers).
+
+    With `two_phase`, every page is first scanned with cheap text extraction and only
+    pages that look like financial statements get a closer look; the other pages keep
+    their scanned text. If no page looks like a statement, all pages count as
+    statement pages.
+
+    `backend` (default SUPPLIER_EVAL_PDF_BACKEND) is "pdfplumber", whose closer look
+    is layout extraction; "pdfium", whose scan is already its best text; or "auto":
+    PDFium text, and pdfplumber layout extraction for the statement pages whose
+    rows PDFium breaks up (typically tables written column by column, whose labels
+    and amounts it puts on different lines; see _needs_layout).
+    """
+    max_pages = max_pages or MAX_PAGES
+    deadline = time.monotonic() + (time_budget or TIME_BUDGET)
+    backend = backend or PDF_BACKEND
+
+    if backend != "pdfplumber":
+        try:
+            page_count = pdf_text.page_count(source, "pdfium")
+        except pypdfium2.PdfiumError as e:
+            if backend == "pdfium":
+                raise
+            logger.warning("PDFium could not open the PDF (%s). Using pdfplumber.", e)
+            backend = "pdfplumber"
+    if backend == "pdfplumber":
+        page_count = pdf_text.page_count(source, "pdfplumber")
+    page_count = min(page_count, max_pages)
+    page_numbers = list(range(page_count))
+
+    if backend == "pdfplumber" and not two_phase:
+        pages = scanned = _extract_pages(source, page_numbers, "pdfplumber", deadline)
+        statement_pages = sorted(pages)
+    elif backend == "pdfplumber":
+        scanned = _extract_pages(source, page_numbers, "pdfplumber_simple", deadline)
+        candidates = [n for n in page_numbers if n in scanned and STATEMENT_PAGE_HINTS.search(scanned[n])]
+        layout = _extract_pages(source, candidates, "pdfplumber", deadline) if candidates else {}
+        pages = {**scanned, **layout}
+        statement_pages = sorted(layout) if layout else sorted(scanned)
+    else:
+        pages = scanned = _extract_pages(source, page_numbers, "pdfium", deadline)
+        candidates = [n for n in page_numbers if n in scanned and (not two_phase or STATEMENT_PAGE_HINTS.search(scanned[n]))]
+        if backend == "auto":
+            retry = [n for n in candidates if _needs_layout(scanned[n])]
+            if retry:
+                pages = {**scanned, **_extract_pages(source, retry, "pdfplumber", deadline)}
+        statement_pages = candidates or sorted(scanned)
+
+    if len(scanned) < page_count:
+        logger.warning("Read %d of %d pages within the time budget.", len(scanned), page_count)
+
+    return pages, statement_pages
+
+def extract_pdf_text(source, max_pages: int = None, time_budget: float = None, two_phase: bool = True,
+                     backend: str = None) -> str:
+    """
+    The text of the statement pages of a financial PDF (see extract_pdf_pages).
+    """
+    pages, statement_pages = extract_pdf_pages(source, max_pages=max_pages, time_budget=time_budget,
+                                               two_phase=two_phase, backend=backend)
+    return "\n".join(pages[n] for n in statement_pages)
 
-def parse_financial_pdf(file_content: bytes, filename: str):
+def parse_financial_pdf(source, filename: str, max_pages: int = None, time_budget: float = None, two_phase: bool = True,
+                        backend: str = None):
     """
-    Parses financial data from a PDF file.
+    Parses financial data from a PDF file (bytes or a file path). The result
+    holds the line items found and, if the headings name it, the "fiscal_year".
     """
-    text = ""
-    with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() + "\n"
-            
-    # Extract key values using regex
-    # We look for patterns like "Revenue ... 1,000,000" or "Total Assets ... 500,000"
+    # Statements in a layout seen before are read from the rows its template
+    # remembers, a handful of crops instead of a full parse
+    with span("layout_template"):
+        data = layout_templates.extract(source, detect_fiscal_year)
+    if data is not None:
+        return data
+
+    pages, statement_pages = extract_pdf_pages(source, max_pages=max_pages, time_budget=time_budget,
+                                               two_phase=two_phase, backend=backend)
+    text = "\n".join(pages[n] for n in statement_pages)
+
+    # Extract key values in a single pass with the precompiled line-item matcher
+    # We look for patterns like "Revenue ... 1,000,000" or "Total Assets ... (500,000)"
     # This is a heuristic approach.
-    
-    data = {}
-    
-    # Define patterns for key metrics
-    patterns = {
-        "revenue": [r"Revenue", r"Sales", r"Total Revenue", r"Net Sales"],
-        "net_income": [r"Net Income", r"Net Profit", r"Profit for the year"],
-        "total_assets": [r"Total Assets"],
-        "total_liabilities": [r"Total Liabilities"],
-        "current_assets": [r"Total Current Assets", r"Current Assets"],
-        "current_liabilities": [r"Total Current Liabilities", r"Current Liabilities"],
-        "inventory": [r"Inventory", r"Inventories"],
-        "equity": [r"Total Equity", r"Shareholders' Equity", r"Total Shareholders' Equity"]
-    }
-    
-    for key, keywords in patterns.items():
-        for keyword in keywords:
-            # Regex to find the keyword followed by numbers at the end of the line (or near it)
-            # We handle currency symbols, commas, and parentheses for negatives
-            # Example: "Total Assets $ 1,234,567"
-            regex = rf"{keyword}.*?([\d,]+(?:\.\d+)?)"
-            match = re.search(regex, text, re.IGNORECASE)
-            if match:
-                value_str = match.group(1).replace(",", "")
-                try:
-                    data[key] = float(value_str)
-                    break # Found a match for this key, stop looking
-                except ValueError:
-                    continue
+    with span("regex_matching"):
+        data = match_line_items(text)
     
     # Fallback: If critical data is missing, try LLM
     # Critical keys: revenue, net_income, total_assets, total_liabilities
@@ -51,13 +196,26 @@ def parse_financial_pdf(file_content: bytes, filename: str):
     
     if missing_critical:
         from services.llm_analysis import extract_financials_with_llm
-        print(f"Missing critical keys {missing_critical}. Attempting LLM extraction...")
-        llm_data = extract_financials_with_llm(text)
+        logger.warning("Missing critical keys %s. Attempting LLM extraction...", missing_critical)
+        with span("llm_fallback"):
+            # Only the keys still missing are asked for, from the excerpts of the
+            # whole document (not just the statement pages) most likely to hold them
+            missing = [k for k in LINE_ITEM_PATTERNS if k not in data]
+            llm_data = extract_financials_with_llm(DocumentIndex(pages), keys=missing)
         
         # Merge LLM data if not already present
         for k, v in llm_data.items():
             if k not in data and v is not None:
                 data[k] = float(v) if isinstance(v, (int, float, str)) else v
+
+    fiscal_year = detect_fiscal_year(text)
+    if fiscal_year is not None:
+        data["fiscal_year"] = fiscal_year
+
+    # Layouts are only learned from what the regex alone reads
+    if not missing_critical:
+        with span("layout_template"):
+            layout_templates.learn(source, data, pages, statement_pages, detect_fiscal_year)
                     
     return data
 
@@ -90,3 +248,108 @@ def calculate_ratios(data: dict):
         ratios["debt_to_equity"] = "N/A"
         
     return ratios
+
+# Year-over-year trends scored by the policy's `trends` section
+TREND_METRICS = ["revenue_growth", "net_margin_change", "debt_to_equity_change"]
+RATIO_ITEMS = ["current_assets", "current_liabilities", "inventory", "net_income", "revenue", "total_liabilities", "equity"]
+
+def _ratio_frame(items: pd.DataFrame) -> pd.DataFrame:
+    """
+    calculate_ratios over every row of `items` (one row of line items per
+    period) at once: the same conditions, with NaN where a ratio is "N/A".
+    """
+    from services.portfolio import round_like_python
+
+    # Like the `data.get(...)` truth tests: missing and zero do not count
+    present = items.notna() & (items != 0)
+
+    def ratio(numerator, denominator, condition, scale=1):
+        # Zero denominators give inf here, but are masked out by `condition`
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = round_like_python((numerator / denominator * scale).to_numpy(dtype="float64"), 2)
+        return np.where(condition, values, np.nan)
+
+    liquid = present["current_assets"] & present["current_liabilities"]
+    profitable = present["net_income"] & present["revenue"]
+    levered = present["total_liabilities"] & present["equity"]
+    return pd.DataFrame({
+        "current_ratio": ratio(items["current_assets"], items["current_liabilities"], liquid),
+        "quick_ratio": ratio(items["current_assets"] - items["inventory"].fillna(0), items["current_liabilities"], liquid),
+        "net_margin": ratio(items["net_income"], items["revenue"], profitable, 100),
+        "debt_to_equity": ratio(items["total_liabilities"], items["equity"], levered),
+    }, index=items.index)
+
+def _trend_frame(items: pd.DataFrame, ratios: pd.DataFrame) -> pd.DataFrame:
+    """
+    Changes from each period to the next (rows sorted by fiscal year): revenue
+    growth in %, net margin change in percentage points, debt to equity change.
+    The first period has no trends (NaN).
+    """
+    from services.portfolio import round_like_python
+
+    revenue = items["revenue"].where(items["revenue"] != 0)
+    previous = revenue.shift()
+    growth = ((revenue - previous) / previous.abs() * 100).to_numpy(dtype="float64")
+    with np.errstate(invalid="ignore"):
+        return pd.DataFrame({
+            "revenue_growth": round_like_python(growth, 2),
+            "net_margin_change": round_like_python(ratios["net_margin"].diff().to_numpy(dtype="float64"), 2),
+            "debt_to_equity_change": round_like_python(ratios["debt_to_equity"].diff().to_numpy(dtype="float64"), 2),
+        }, index=items.index)
+
+def _with_na(values: dict) -> dict:
+    return {key: "N/A" if pd.isna(value) else float(value) for key, value in values.items()}
+
+def financial_periods(statements: list) -> dict:
+    """
+    Ratios per fiscal year and year-over-year trends from several parsed
+    statements ([(filename, parse_financial_pdf result)]), computed for all
+    periods in one vectorized pass with the rules of calculate_ratios.
+
+    A statement's year comes from its headings, else from its file name.
+    Statements of the same year (e.g. balance sheet and income statement sent
+    as separate files) are merged, the first file's figure winning. Statements
+    without a year are kept as periods of their own after the dated ones, but
+    are not part of any trend.
+
+    Returns {"ratios": ratios of the latest dated period (else of the first
+    statement), "fiscal_year": that period's year, "periods": [{"fiscal_year",
+    "files", "ratios", "trends"}, ...] in fiscal year order, "trends": the
+    latest period's trends, or {} with fewer than two dated periods}.
+    """
+    dated, undated = {}, []
+    for filename, data in statements:
+        year = data.get("fiscal_year") or fiscal_year_from_filename(filename)
+        if year is None:
+            undated.append(([filename], data))
+            continue
+        files, merged = dated.setdefault(int(year), ([], {}))
+        files.append(filename)
+        for key, value in data.items():
+            merged.setdefault(key, value)
+    years = sorted(dated)
+    periods = [(year,) + dated[year] for year in years] + [(None,) + period for period in undated]
+    if not periods:
+        return {"ratios": {}, "fiscal_year": None, "periods": [], "trends": {}}
+
+    items = pd.DataFrame(
+        [{key: data.get(key) for key in RATIO_ITEMS} for _, _, data in periods],
+        columns=RATIO_ITEMS, dtype="float64",
+    )
+    ratios = _ratio_frame(items)
+    trends = pd.DataFrame(np.nan, index=items.index, columns=TREND_METRICS)
+    if len(years) > 1:
+        trends.iloc[:len(years)] = _trend_frame(items.iloc[:len(years)], ratios.iloc[:len(years)])
+
+    ratio_records = [_with_na(record) for record in ratios.to_dict("records")]
+    trend_records = [_with_na(record) for record in trends.to_dict("records")]
+    latest = len(years) - 1 if years else 0
+    return {
+        "ratios": ratio_records[latest],
+        "fiscal_year": periods[latest][0],
+        "periods": [
+            {"fiscal_year": year, "files": files, "ratios": ratio_records[i], "trends": trend_records[i] if year is not None and i else {}}
+            for i, (year, files, _) in enumerate(periods)
+        ],
+        "trends": {"from_year": years[-2], "to_year": years[-1], **trend_records[latest]} if len(years) > 1 else {},
+    }
@@ -1,49 +1,393 @@
-import pandas as pd
+from __future__ import annotations
+
+import csv
+import os
+import threading
+import warnings
 from io import BytesIO
-from utils.normalization import normalize_columns
+from utils.normalization import normalize_columns, header_row_score, mapped_columns, header_signature
+from services.metrics import span
+from services.startup import LazyModule
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# Bump whenever parsing output changes; cached parse results keyed on an older
+# version are ignored (see services/cache.py).
+PARSER_VERSION = 6
+
+# The header row is looked for in this many leading rows of each sheet (or of a
+# CSV), so exports with a title block or a summary sheet first still parse.
+HEADER_SNIFF_ROWS = int(os.getenv("SUPPLIER_EVAL_HEADER_SNIFF_ROWS", "20"))
+# A row must score at least this (roughly: resolve this many columns) to be
+# taken as the header; otherwise the first row of the first sheet is used.
+MIN_HEADER_SCORE = 2.0
+# Bytes of a CSV read to sniff its header row
+CSV_SNIFF_BYTES = 64 * 1024
+
+# Rows per chunk in streaming mode
+CHUNK_ROWS = int(os.getenv("SUPPLIER_EVAL_CHUNK_ROWS", "100000"))
+# Requests whose PO + invoice uploads exceed this many bytes are ingested in
+# streaming mode instead of being parsed into full DataFrames.
+STREAMING_THRESHOLD_BYTES = int(os.getenv("SUPPLIER_EVAL_STREAMING_THRESHOLD_BYTES", str(64 * 1024 * 1024)))
+
+# Compact dtypes for normalized columns, applied once at ingestion.
+# Amounts stay float64: float32 cannot hold cents exactly beyond ~100k.
+CATEGORY_COLUMNS = ["status", "vendor", "sku"]
+DATE_COLUMNS = ["date", "delivery_date", "promised_date", "date_paid"]
+AMOUNT_COLUMNS = ["amount", "amount_paid"]
+QUANTITY_COLUMNS = ["quantity"]
+
+# Formats tried when inferring how a date column is written, after ISO 8601 and
+# the formats pandas guesses from the column's own values. Month-first before day-first, as
+# pandas reads ambiguous dates; a column is read day-first only if that covers
+# more of its values.
+DATE_FORMATS = [
+    "%m/%d/%Y", "%d/%m/%Y", "%m/%d/%y", "%d/%m/%y", "%m-%d-%Y", "%d-%m-%Y", "%d.%m.%Y",
+    "%Y/%m/%d", "%Y%m%d", "%d %b %Y", "%d-%b-%Y", "%b %d, %Y", "%d %B %Y", "%B %d, %Y",
+    "%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S",
+]
+# Distinct values of a column that format inference looks at, spread over the column
+DATE_SAMPLE_VALUES = 200
+# Values the formats are guessed from (pandas' guess_datetime_format)
+DATE_GUESSES = 5
+# Inferred formats are kept per (header signature, column) for this many columns
+DATE_FORMAT_CACHE_SIZE = int(os.getenv("SUPPLIER_EVAL_DATE_FORMAT_CACHE_SIZE", "512"))
+
+# (header signature, column) -> formats, in the order they are applied. Repeat
+# uploads of an export format parse their dates with a handful of vectorized
+# strptime passes instead of pandas' per-column inference, which falls back to
+# parsing element by element as soon as a column mixes formats. Per process:
+# each pool worker learns the formats of the exports it parses.
+_date_formats = {}
+_date_formats_lock = threading.Lock()
+_date_format_stats = {"hits": 0, "misses": 0, "extended": 0}
+
+def _to_datetime(series: pd.Series) -> pd.Series:
+    try:
+        return pd.to_datetime(series)
+    except (ValueError, TypeError):
+        # Mixed formats within one column: parse element-wise, unparseable -> NaT
+        return pd.to_datetime(series, format="mixed", errors="coerce")
+
+def _with_format(values: np.ndarray, date_format: str) -> np.ndarray:
+    parsed = pd.to_datetime(values, format=date_format, errors="coerce")
+    if getattr(parsed, "tz", None) is not None:
+        raise TypeError("timezone-aware dates")
+    return parsed.to_numpy(dtype="datetime64[ns]")
+
+def _sample(values: np.ndarray) -> np.ndarray:
+    step = max(1, len(values) // (DATE_SAMPLE_VALUES * 10))
+    distinct = pd.unique(values[::step])
+    return np.asarray([value for value in distinct if isinstance(value, str)][:DATE_SAMPLE_VALUES], dtype=object)
+
+def infer_date_formats(values: np.ndarray, exclude=()) -> tuple:
+    """
+    Formats that read a sample of the given date strings, greedily: the format
+    reading the most sampled values first, then the one reading the most of
+    the rest, until no candidate reads any more of them.
+    """
+    sample = _sample(values)
+    with warnings.catch_warnings():
+        # guess_datetime_format warns when it can only read a value day-first
+        warnings.simplefilter("ignore")
+        guesses = [pd.tseries.api.guess_datetime_format(value) for value in sample[:DATE_GUESSES]]
+    # ISO8601 first: it reads every ISO layout, fastest, so it wins ties with
+    # the exact ISO formats guessed
+    candidates = list(dict.fromkeys(
+        date_format for date_format in ["ISO8601"] + guesses + DATE_FORMATS
+        if date_format and date_format not in exclude
+    ))
+
+    formats = []
+    while len(sample) and candidates:
+        parsed = {date_format: ~np.isnat(_with_format(sample, date_format)) for date_format in candidates}
+        best = max(candidates, key=lambda date_format: parsed[date_format].sum())
+        if not parsed[best].any():
+            break
+        formats.append(best)
+        candidates.remove(best)
+        sample = sample[~parsed[best]]
+    return tuple(formats)
+
+def parse_dates(series: pd.Series, signature: str = None) -> pd.Series:
+    """
+    Parses a column of date strings (or datetime objects) to datetime64 with
+    the formats cached for the column of that header signature, inferring and
+    caching them on the first upload of an export format and extending them
+    when a later upload writes dates another way. Values no format reads are
+    parsed one by one, and left NaT if unparseable.
+    """
+    values = series.to_numpy()
+    # Columns without strings (numbers, or datetime objects from openpyxl) need no formats
+    if signature is None or pd.api.types.infer_dtype(values, skipna=True) not in ("string", "mixed"):
+        return _to_datetime(series)
+    pending = np.flatnonzero(pd.notna(values) & (values != ""))
+    key = (signature, series.name)
+    with _date_formats_lock:
+        formats = _date_formats.get(key, ())
+        _date_format_stats["hits" if formats else "misses"] += 1
+
+    try:
+        out = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[ns]")
+
+        def apply(date_format):
+            nonlocal pending
+            parsed = _with_format(values[pending], date_format)
+            ok = ~np.isnat(parsed)
+            out[pending[ok]] = parsed[ok]
+            pending = pending[~ok]
+
+        for date_format in formats:
+            if not len(pending):
+                break
+            apply(date_format)
+        if len(pending):
+            learned = infer_date_formats(values[pending], exclude=formats)
+            for date_format in learned:
+                apply(date_format)
+            if learned:
+                with _date_formats_lock:
+                    _date_formats.pop(key, None)
+                    _date_formats[key] = formats + learned
+                    while len(_date_formats) > DATE_FORMAT_CACHE_SIZE:
+                        _date_formats.pop(next(iter(_date_formats)))
+                    _date_format_stats["extended"] += bool(formats)
+    except (ValueError, TypeError):
+        return _to_datetime(series)
+
+    result = pd.Series(out, index=series.index, name=series.name)
+    if len(pending):
+        result.iloc[pending] = pd.to_datetime(values[pending], format="mixed", errors="coerce")
+    return result
+
+def date_format_stats() -> dict:
+    """
+    Formats cached per (header signature, column) in this process, and cache use.
+    """
+    with _date_formats_lock:
+        return {**_date_format_stats, "columns": len(_date_formats)}
+
+def apply_ingestion_schema(df: pd.DataFrame, signature: str = None) -> pd.DataFrame:
+    """
+    Casts normalized columns to compact dtypes: categoricals for low-cardinality
+    labels, datetime64 for dates, Int32 for integral quantities. `signature`
+    (of the raw header row) keys the cached date formats; see parse_dates.
+    """
+    for col in DATE_COLUMNS:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = parse_dates(df[col], signature)
+
+    for col in AMOUNT_COLUMNS:
+        if col in df.columns and df[col].dtype == object:
+            numeric = pd.to_numeric(df[col], errors="coerce")
+            # Keep the raw values if any of them are not plain numbers
+            if numeric.isna().sum() == df[col].isna().sum():
+                df[col] = numeric
+
+    for col in QUANTITY_COLUMNS:
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
+            finite = df[col].dropna()
+            if finite.empty or ((finite % 1 == 0).all() and finite.abs().max() < 2**31):
+                df[col] = df[col].astype("Int32")
+
+    for col in CATEGORY_COLUMNS:
+        # Only worth it when labels repeat; unique-per-row categories cost more
+        if col in df.columns and df[col].dtype == object and df[col].nunique() <= len(df) // 2:
+            df[col] = df[col].astype("category")
+
+    return df
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+def _best_header(rows, file_type: str) -> tuple:
+    """
+    (index, score, cells) of the row that looks most like a `file_type`
+    header; the earliest wins ties.
+    """
+    best = (0, 0.0, ())
+    for index, cells in enumerate(rows):
+        score = header_row_score(cells, file_type)
+        if score > best[1]:
+            best = (index, score, tuple(cells))
+    return best
+
+def sniff_xlsx_header(source, file_type: str) -> tuple:
+    """
+    (sheet name, header row index) of the table to read from a workbook: the
+    sheet and row, among the first HEADER_SNIFF_ROWS rows of every sheet, whose
+    cells resolve best to canonical `file_type` columns. Only those rows are
+    read (openpyxl read-only mode streams each sheet), never whole sheets.
+    Falls back to the first row of the first sheet.
+    """
+    from openpyxl import load_workbook
 
-def parse_po_file(file_content: bytes, filename: str) -> pd.DataFrame:
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheets = workbook.sheetnames
+        best = (sheets[0], 0, 0.0)
+        for sheet in sheets:
+            rows = workbook[sheet].iter_rows(max_row=HEADER_SNIFF_ROWS, values_only=True)
+            index, score, _ = _best_header(rows, file_type)
+            if score > best[2]:
+                best = (sheet, index, score)
+    finally:
+        workbook.close()
+        _rewind(source)
+    if best[2] < MIN_HEADER_SCORE:
+        return sheets[0], 0
+    return best[0], best[1]
+
+def _csv_head(source) -> str:
+    if isinstance(source, (bytes, bytearray)):
+        head = bytes(source[:CSV_SNIFF_BYTES])
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            head = f.read(CSV_SNIFF_BYTES)
+    else:
+        head = source.read(CSV_SNIFF_BYTES)
+        _rewind(source)
+    return head.decode("utf-8-sig", errors="replace")
+
+def sniff_csv_header(source, file_type: str) -> tuple:
+    """
+    (header row index, header cells) of a CSV from its first HEADER_SNIFF_ROWS
+    lines; see sniff_xlsx_header.
+    """
+    lines = _csv_head(source).splitlines()[:HEADER_SNIFF_ROWS + 1]
+    rows = list(csv.reader(lines[:HEADER_SNIFF_ROWS]))
+    index, score, cells = _best_header(rows, file_type)
+    if score < MIN_HEADER_SCORE:
+        return 0, tuple(rows[0]) if rows else ()
+    return index, cells
+
+def _readable(source):
+    # Bytes are wrapped without a copy (BytesIO shares the buffer until written)
+    return BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+def _read_file(source, filename: str, file_type: str = "po") -> pd.DataFrame:
+    """
+    Reads an upload from bytes, a file path or a binary file object; `filename`
+    selects the reader.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        # openpyxl goes by the path's extension, which spooled uploads lack
+        with open(source, "rb") as f:
+            return _read_file(f, filename, file_type)
+    source = _readable(source)
     if filename.endswith('.xlsx'):
-        df = pd.read_excel(BytesIO(file_content))
+        sheet, header_row = sniff_xlsx_header(source, file_type)
+        return pd.read_excel(source, sheet_name=sheet, skiprows=header_row)
     elif filename.endswith('.csv'):
-        df = pd.read_csv(BytesIO(file_content))
+        header_row, _ = sniff_csv_header(source, file_type)
+        return pd.read_csv(source, skiprows=header_row)
     else:
         raise ValueError("Unsupported file format")
-        
-    df = normalize_columns(df, file_type="po")
-    
+
+def _finish_po_frame(df: pd.DataFrame) -> pd.DataFrame:
+    with span("normalization"):
+        signature = header_signature(df.columns)
+        df = normalize_columns(df, file_type="po")
+        df = apply_ingestion_schema(df, signature)
+
     # Ensure required columns exist, fill missing with defaults if needed
     required_cols = ["po_number", "date", "sku", "quantity", "delivery_date"]
     for col in required_cols:
         if col not in df.columns:
             df[col] = None # Or handle error
-            
+
     return df
 
-def parse_invoice_file(file_content: bytes, filename: str) -> pd.DataFrame:
-    if filename.endswith('.xlsx'):
-        df = pd.read_excel(BytesIO(file_content))
-    elif filename.endswith('.csv'):
-        df = pd.read_csv(BytesIO(file_content))
-    else:
-        raise ValueError("Unsupported file format")
-        
-    df = normalize_columns(df, file_type="invoice")
-    
+def _finish_invoice_frame(df: pd.DataFrame) -> pd.DataFrame:
+    with span("normalization"):
+        signature = header_signature(df.columns)
+        df = normalize_columns(df, file_type="invoice")
+        df = apply_ingestion_schema(df, signature)
+
     # Derive status if missing but payment info exists
     if "status" not in df.columns:
         if "amount_paid" in df.columns and "amount" in df.columns:
-            # If amount_paid >= amount (allowing for small float diffs), it's Paid
-            df["status"] = df.apply(
-                lambda x: "Paid" if pd.notnull(x["amount_paid"]) and pd.notnull(x["amount"]) and x["amount_paid"] >= x["amount"] - 0.01 else "Pending", 
-                axis=1
-            )
+            # If amount_paid >= amount (allowing for small float diffs), it's Paid.
+            # Comparisons with missing values are False, so those rows are Pending.
+            paid = df["amount_paid"] >= df["amount"] - 0.01
+            df["status"] = pd.Categorical(np.where(paid, "Paid", "Pending"), categories=["Paid", "Pending"])
         elif "date_paid" in df.columns:
-            df["status"] = df["date_paid"].apply(lambda x: "Paid" if pd.notnull(x) else "Pending")
-    
+            df["status"] = pd.Categorical(np.where(df["date_paid"].notna(), "Paid", "Pending"), categories=["Paid", "Pending"])
+
     required_cols = ["invoice_number", "po_number", "amount", "date", "status"]
     for col in required_cols:
         if col not in df.columns:
             df[col] = None
-            
+
     return df
+
+def parse_po_file(source, filename: str) -> pd.DataFrame:
+    return _finish_po_frame(_read_file(source, filename, "po"))
+
+def parse_invoice_file(source, filename: str) -> pd.DataFrame:
+    return _finish_invoice_frame(_read_file(source, filename, "invoice"))
+
+def _iter_xlsx_chunks(source, file_type: str, chunk_rows: int):
+    """
+    Reads the sniffed sheet row by row with openpyxl's read-only mode, from its
+    header row on, keeping only mapped columns, and yields DataFrames of at
+    most `chunk_rows` rows.
+    """
+    from openpyxl import load_workbook
+
+    sheet, header_row = sniff_xlsx_header(source, file_type)
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet].iter_rows(min_row=header_row + 1, values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = ["" if name is None else str(name) for name in header]
+        mapped = set(mapped_columns(header, file_type))
+        keep = [i for i, name in enumerate(header) if name in mapped]
+        # Raw headers: normalize_columns resolves them (camelCase included)
+        columns = [header[i] for i in keep]
+
+        buffer = []
+        for row in rows:
+            buffer.append([row[i] if i < len(row) else None for i in keep])
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+def _iter_raw_chunks(source, filename: str, file_type: str, chunk_rows: int):
+    if filename.endswith('.xlsx'):
+        yield from _iter_xlsx_chunks(source, file_type, chunk_rows)
+    elif filename.endswith('.csv'):
+        header_row, header = sniff_csv_header(source, file_type)
+        mapped = set(mapped_columns(header, file_type))
+        yield from pd.read_csv(
+            source,
+            chunksize=chunk_rows,
+            skiprows=header_row,
+            usecols=lambda name: name in mapped,
+        )
+    else:
+        raise ValueError("Unsupported file format")
+
+def iter_po_chunks(source, filename: str, chunk_rows: int = CHUNK_ROWS):
+    """
+    Streaming counterpart of parse_po_file: yields normalized PO chunks from a
+    file path or binary file object (e.g. the spooled upload) without loading
+    the whole file. Columns that normalization does not map are dropped.
+    """
+    for chunk in _iter_raw_chunks(source, filename, "po", chunk_rows):
+        yield _finish_po_frame(chunk)
+
+def iter_invoice_chunks(source, filename: str, chunk_rows: int = CHUNK_ROWS):
+    """
+    Streaming counterpart of parse_invoice_file; see iter_po_chunks.
+    """
+    for chunk in _iter_raw_chunks(source, filename, "invoice", chunk_rows):
+        yield _finish_invoice_frame(chunk)
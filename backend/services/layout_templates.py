@@ -0,0 +1,369 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from services.line_items import amount_offsets, detect_scale, match_line_items
+from services.pdf_text import open_pdfplumber, open_pdfium, pdfium_lock
+
+logger = logging.getLogger(__name__)
+
+# Statements prepared by the same firm share a layout: the same pages, headings
+# and rows, with different numbers. Once a layout has been fully parsed
+# LEARN_AFTER times, the row of every line item is remembered, and later
+# documents with that layout are read from those rows alone.
+ENABLED = os.getenv("SUPPLIER_EVAL_LAYOUT_TEMPLATES", "1") != "0"
+TEMPLATE_PATH = os.getenv(
+    "SUPPLIER_EVAL_TEMPLATE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "layout_templates.sqlite3"),
+)
+LEARN_AFTER = int(os.getenv("SUPPLIER_EVAL_TEMPLATE_LEARN_AFTER", "2"))
+MAX_TEMPLATES = int(os.getenv("SUPPLIER_EVAL_TEMPLATE_MAX_ENTRIES", "1000"))
+# Layouts with line items spread over more pages are not templated
+MAX_TEMPLATE_PAGES = 6
+# Lines at the top of a page that identify it (digits masked)
+HEADER_LINES = 3
+# Vertical slack around a row, in points
+ROW_PADDING = 2.0
+# Largest relative gap allowed between total assets and liabilities + equity
+BALANCE_TOLERANCE = 0.005
+
+_DIGITS_RE = re.compile(r"\d[\d,.]*")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _label(text: str) -> str:
+    # Extractors differ in where they infer spaces, so labels are compared without
+    return "".join(text.lower().split())
+
+
+def _header_lines(text: str) -> str:
+    return "\n".join([line for line in text.splitlines() if line.strip()][:HEADER_LINES])
+
+
+def page_header(text: str) -> str:
+    """
+    The first HEADER_LINES non-empty lines of a page, numbers masked, so the
+    same heading matches from one year's statements to the next.
+    """
+    return _DIGITS_RE.sub("#", _normalize(_header_lines(text)))
+
+
+def _layout_key(sizes: list) -> str:
+    """
+    Cheap first-stage fingerprint: page count and page sizes.
+    """
+    payload = json.dumps([len(sizes)] + [[round(width), round(height)] for width, height in sizes])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def _signature(layout_key: str, headers: dict) -> str:
+    """
+    Full fingerprint: the layout key and the headers of the pages holding line items.
+    """
+    payload = json.dumps([layout_key, sorted(headers.items())])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def consistent(data: dict) -> bool:
+    """
+    Whether parsed line items hang together: current items within totals and,
+    if all three are present, total assets = total liabilities + equity.
+    """
+    for part, total in (("current_assets", "total_assets"), ("current_liabilities", "total_liabilities")):
+        if part in data and total in data and abs(data[part]) > abs(data[total]):
+            return False
+    if all(key in data for key in ("total_assets", "total_liabilities", "equity")):
+        gap = abs(data["total_assets"] - data["total_liabilities"] - data["equity"])
+        return gap <= BALANCE_TOLERANCE * abs(data["total_assets"])
+    return True
+
+
+def _balanced(data: dict) -> bool:
+    return all(key in data for key in ("total_assets", "total_liabilities", "equity")) and consistent(data)
+
+
+def _crop(textpage, left: float, bottom: float, right: float, top: float) -> str:
+    return " ".join(textpage.get_text_bounded(left, bottom, right, top).split())
+
+
+class LayoutTemplateStore:
+    """
+    SQLite store of layout templates (by signature, looked up by layout key)
+    and of how often each signature has been fully parsed.
+    """
+
+    def __init__(self, path: str = TEMPLATE_PATH, learn_after: int = LEARN_AFTER, max_entries: int = MAX_TEMPLATES):
+        self.path = path
+        self.learn_after = learn_after
+        self.max_entries = max_entries
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "learned": 0, "invalidated": 0, "errors": 0}
+        self._counters_lock = threading.Lock()  # counted from the PDF parsing threads
+
+    def _connection(self):
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS templates ("
+                " signature TEXT PRIMARY KEY, layout_key TEXT, template TEXT, created_at REAL, used_at REAL, hits INTEGER)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS templates_layout ON templates (layout_key)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sightings (signature TEXT PRIMARY KEY, count INTEGER, seen_at REAL)"
+            )
+        return self._db
+
+    def count(self, counter: str, amount: int = 1):
+        with self._counters_lock:
+            self._counters[counter] += amount
+
+    def candidates(self, layout_key: str) -> list:
+        with self._db_lock:
+            rows = self._connection().execute(
+                "SELECT template FROM templates WHERE layout_key = ? ORDER BY used_at DESC", (layout_key,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def used(self, signature: str):
+        with self._db_lock:
+            db = self._connection()
+            db.execute("UPDATE templates SET used_at = ?, hits = hits + 1 WHERE signature = ?", (time.time(), signature))
+            db.commit()
+
+    def sighted(self, signature: str) -> bool:
+        """
+        Records a full parse of a layout. True if it is now due a template.
+        """
+        with self._db_lock:
+            db = self._connection()
+            db.execute(
+                "INSERT INTO sightings VALUES (?, 1, ?) ON CONFLICT (signature) DO UPDATE"
+                " SET count = count + 1, seen_at = excluded.seen_at",
+                (signature, time.time()),
+            )
+            count = db.execute("SELECT count FROM sightings WHERE signature = ?", (signature,)).fetchone()[0]
+            known = db.execute("SELECT 1 FROM templates WHERE signature = ?", (signature,)).fetchone()
+            db.commit()
+        return count >= self.learn_after and known is None
+
+    def save(self, template: dict):
+        now = time.time()
+        with self._db_lock:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO templates VALUES (?, ?, ?, ?, ?, 0)",
+                (template["signature"], template["layout_key"], json.dumps(template), now, now),
+            )
+            db.execute(
+                "DELETE FROM templates WHERE signature IN ("
+                " SELECT signature FROM templates ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            db.commit()
+        self.count("learned")
+
+    def invalidate(self, signature: str):
+        """
+        Drops a template that no longer reads its layout correctly. The layout is
+        learned again after LEARN_AFTER more full parses.
+        """
+        with self._db_lock:
+            db = self._connection()
+            db.execute("DELETE FROM templates WHERE signature = ?", (signature,))
+            db.execute("DELETE FROM sightings WHERE signature = ?", (signature,))
+            db.commit()
+        self.count("invalidated")
+
+    def stats(self) -> dict:
+        with self._db_lock:
+            templates = self._connection().execute("SELECT COUNT(*) FROM templates").fetchone()[0]
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {**counters, "templates": templates}
+
+
+template_store = LayoutTemplateStore()
+
+
+def _read(pdf, template: dict):
+    """
+    Reads the line items of `template` from an open PDFium document. Returns
+    (data, header lines, None), or (None, None, reason) when the document does
+    not fit the template.
+    """
+    textpages, headers = {}, []
+    try:
+        for page_number, header in template["headers"].items():
+            textpage = pdf[int(page_number)].get_textpage()
+            textpages[page_number] = textpage
+            text = textpage.get_text_range()
+            if page_header(text) != header:
+                return None, None, "header"
+            headers.append(_header_lines(text))
+
+        data = {}
+        for key, row in template["rows"].items():
+            textpage = textpages[str(row["page"])]
+            height = row["height"]
+            bottom, top = height - row["bottom"] - ROW_PADDING, height - row["top"] + ROW_PADDING
+            label = _crop(textpage, 0, bottom, row["split"], top)
+            if _label(label) != row["label"]:
+                return None, None, f"label of {key}"
+            value = _crop(textpage, row["split"], bottom, row["width"], top)
+            found = match_line_items(f"{label} {value}", scale=template["scale"])
+            if key not in found:
+                return None, None, f"value of {key}"
+            data[key] = found[key]
+        return data, "\n".join(headers), None
+    finally:
+        for textpage in textpages.values():
+            textpage.close()
+
+
+def extract(source, detect_year):
+    """
+    The line items of a financial PDF read through a matching layout template,
+    with the "fiscal_year" `detect_year` finds in the header lines of its pages,
+    or None: no template matches (or templates are off), or the matching one
+    fails validation, in which case it is invalidated.
+    """
+    if not ENABLED:
+        return None
+    try:
+        with pdfium_lock:
+            pdf = open_pdfium(source)
+            try:
+                sizes = [pdf.get_page_size(number) for number in range(len(pdf))]
+                candidates = template_store.candidates(_layout_key(sizes))
+                for template in candidates:
+                    data, headers, reason = _read(pdf, template)
+                    if reason == "header":
+                        continue
+                    if data is None or not consistent(data) or (template["balanced"] and not _balanced(data)):
+                        logger.warning("Layout template %s failed validation (%s). Parsing in full.",
+                                       template["signature"], reason or "line items do not add up")
+                        template_store.invalidate(template["signature"])
+                        continue
+                    template_store.used(template["signature"])
+                    template_store.count("hits")
+                    fiscal_year = detect_year(headers)
+                    if fiscal_year is not None:
+                        data["fiscal_year"] = fiscal_year
+                    return data
+            finally:
+                pdf.close()
+    except Exception as e:
+        logger.warning("Layout template lookup failed: %s", e)
+        template_store.count("errors")
+        return None
+    template_store.count("misses")
+    return None
+
+
+def _row(line: dict, key: str, scale: float, value: float, width: float, height: float):
+    """
+    The template row of `key` if pdfplumber `line` holds its label and `value`:
+    the line's vertical extent, its label, and an x between the end of the
+    label and the start of the amount.
+    """
+    if match_line_items(line["text"], scale=scale).get(key) != value:
+        return None
+    # The amount is the first number after the label, which may hold digits or
+    # parentheses itself ("Note 4 Total assets"). The line's text is its chars
+    # with spaces inserted, so the amount's first char is found by counting the
+    # non-space text before it.
+    offset = amount_offsets(line["text"])[key]
+    label = line["text"][:offset]
+    chars = [char for char in line["chars"] if char["text"].strip()]
+    start, seen, label_length = 0, 0, len("".join(label.split()))
+    while start < len(chars) and seen < label_length:
+        seen += len(chars[start]["text"])
+        start += 1
+    if not start or start == len(chars):
+        return None
+    return {
+        "label": _label(label),
+        "top": line["top"], "bottom": line["bottom"],
+        "split": (max(char["x1"] for char in chars[:start]) + chars[start]["x0"]) / 2,
+        "width": width, "height": height,
+    }
+
+
+def learn(source, data: dict, pages: dict, statement_pages: list, detect_year):
+    """
+    Records a full parse of `source` (its line items and fiscal year, and its
+    extracted pages) and, once its layout has been seen LEARN_AFTER times,
+    learns a template from pdfplumber's text lines on the pages holding line
+    items. Line items that do not add up, or a fiscal year `detect_year` does
+    not find in the header lines of those pages, are not learned from.
+    """
+    fiscal_year = data.get("fiscal_year")
+    data = {key: value for key, value in data.items() if key != "fiscal_year"}
+    if not ENABLED or not data or not consistent(data):
+        return
+    item_pages = [n for n in statement_pages if match_line_items(pages[n])]
+    if not item_pages or len(item_pages) > MAX_TEMPLATE_PAGES:
+        return
+    try:
+        # Headers come from PDFium's text, as when the template is applied
+        with pdfium_lock:
+            pdf = open_pdfium(source)
+            try:
+                sizes = [pdf.get_page_size(number) for number in range(len(pdf))]
+                texts = {}
+                for n in item_pages:
+                    textpage = pdf[n].get_textpage()
+                    texts[n] = textpage.get_text_range()
+                    textpage.close()
+            finally:
+                pdf.close()
+        if detect_year("\n".join(_header_lines(texts[n]) for n in item_pages)) != fiscal_year:
+            return
+        layout_key = _layout_key(sizes)
+        headers = {str(n): page_header(texts[n]) for n in item_pages}
+        signature = _signature(layout_key, headers)
+        if not template_store.sighted(signature):
+            return
+
+        scale = detect_scale("\n".join(pages[n] for n in statement_pages))
+        rows = {}
+        with open_pdfplumber(source) as pdf:
+            for n in item_pages:
+                page = pdf.pages[n]
+                for line in page.extract_text_lines():
+                    for key in data.keys() - rows.keys():
+                        row = _row(line, key, scale, data[key], float(page.width), float(page.height))
+                        if row is not None:
+                            rows[key] = dict(row, page=n)
+                page.close()
+        if rows.keys() != data.keys():
+            return
+
+        template = {
+            "signature": signature, "layout_key": layout_key, "headers": headers, "rows": rows,
+            "scale": scale, "balanced": _balanced(data),
+        }
+        # Only kept if it reads this very document back
+        with pdfium_lock:
+            pdf = open_pdfium(source)
+            try:
+                read, _, _ = _read(pdf, template)
+            finally:
+                pdf.close()
+        if read != data:
+            return
+        template_store.save(template)
+    except Exception as e:
+        logger.warning("Learning a layout template failed: %s", e)
+        template_store.count("errors")
@@ -0,0 +1,161 @@
+import re
+
+# Line-item labels per key, most specific first. When several labels for the same
+# key occur in a document, the earliest label in this list wins; ties between two
+# occurrences of the same label go to the one that appears first in the text.
+LINE_ITEM_PATTERNS = {
+    "revenue": ["Total Revenue", "Net Sales", "Revenue", "Sales"],
+    "net_income": ["Net Income", "Net Profit", "Profit for the year"],
+    "total_assets": ["Total Assets"],
+    "total_liabilities": ["Total Liabilities"],
+    "current_assets": ["Total Current Assets", "Current Assets"],
+    "current_liabilities": ["Total Current Liabilities", "Current Liabilities"],
+    "inventory": ["Inventory", "Inventories"],
+    "equity": ["Total Shareholders' Equity", "Total Equity", "Shareholders' Equity"],
+}
+
+# Labels that contain one of the labels above but describe a different line.
+# They are matched (and discarded) so the shorter label inside them never fires.
+IGNORED_LABELS = [
+    "Cost of Sales",
+    "Cost of Revenue",
+    "Deferred Revenue",
+    "Total Liabilities and Equity",
+    "Total Liabilities and Shareholders' Equity",
+    "Non-Current Assets",
+    "Noncurrent Assets",
+    "Total Non-Current Assets",
+    "Non-Current Liabilities",
+    "Noncurrent Liabilities",
+    "Total Non-Current Liabilities",
+]
+
+# label (lower-cased) -> (key, priority); ignored labels map to (None, 0)
+_LABELS = {label.lower(): (None, 0) for label in IGNORED_LABELS}
+for _key, _labels in LINE_ITEM_PATTERNS.items():
+    for _priority, _label in enumerate(_labels):
+        _LABELS[_label.lower()] = (_key, _priority)
+
+
+def _trie_pattern(words) -> str:
+    """
+    Builds a regex alternation shaped like a trie of the words, so shared prefixes
+    ("total current ...", "total liabilities ...") are only tested once per position.
+    Longer words are tried before their prefixes.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+# Built once at import time and run over lower-cased text, which lets the regex
+# engine skip quickly to positions that can start a label. The atomic group stops
+# a longer label (e.g. an ignored one) from backtracking into a shorter one.
+# The value is the first number on the same line, optionally signed, in
+# parentheses, or with a currency symbol.
+_LINE_ITEM_RE = re.compile(
+    r"(?<![a-z0-9])(?P<label>(?>" + _trie_pattern(_LABELS) + r"))\b"
+    r"[^\n\d]*?"
+    r"(?P<amount>(?P<open>\()?(?P<minus>[-−])?[$€£]?\s*(?P<number>\d[\d,]*(?:\.\d+)?)(?(open)\)))"
+)
+
+# Any label (ignored ones too), and a line with nothing but an amount, for
+# checking the shape of rows without reading their values
+_LABEL_RE = re.compile(r"(?<![a-z0-9])(?>" + _trie_pattern(_LABELS) + r")\b")
+_BARE_AMOUNT_RE = re.compile(r"\s*\(?[-−]?[$€£]?\s*\d[\d,]*(?:\.\d+)?\)?\s*$")
+
+# Statement headers such as "(in thousands)", "in millions of USD" or "($000s)".
+# Scale words are located with str.find and only the few characters before each
+# hit are checked, which is much cheaper than a regex anchored on "in".
+_SCALES = {"thousands": 1e3, "millions": 1e6, "billions": 1e9}
+_SCALE_PREFIX_RE = re.compile(r"(?<![a-z])in\s+(?:[$€£]\s*|us\s*\$\s*)?$")
+_SCALE_ZEROS_RE = re.compile(r"\(\s*[$€£]?\s*'?000s?\s*\)")
+
+
+def detect_scale(text: str) -> float:
+    """
+    Returns the multiplier declared by the first scale header in the text, or 1.
+    """
+    text = text.lower()
+    found = []  # (position, multiplier)
+    for word, multiplier in _SCALES.items():
+        position = text.find(word)
+        while position != -1:
+            if _SCALE_PREFIX_RE.search(text, max(position - 12, 0), position):
+                found.append((position, multiplier))
+                break
+            position = text.find(word, position + 1)
+
+    match = _SCALE_ZEROS_RE.search(text)
+    if match:
+        found.append((match.start(), 1e3))
+
+    return min(found)[1] if found else 1.0
+
+
+def parse_amount(match) -> float:
+    value = float(match.group("number").replace(",", ""))
+    if match.group("open") or match.group("minus"):
+        value = -value
+    return value
+
+
+def _best_matches(text: str) -> dict:
+    # key -> (priority, match) of the highest priority label found for each key
+    best = {}
+    for match in _LINE_ITEM_RE.finditer(text):
+        key, priority = _LABELS[match.group("label")]
+        if key is None:
+            continue
+        if key not in best or priority < best[key][0]:
+            best[key] = (priority, match)
+    return best
+
+
+def match_line_items(text: str, scale: float = None) -> dict:
+    """
+    Finds every line-item label in a single pass over the text and returns
+    {key: value} using the highest priority label found for each key.
+    Values are multiplied by the document scale ("in thousands" etc.).
+    """
+    text = text.lower()
+    if scale is None:
+        scale = detect_scale(text)
+    return {key: parse_amount(match) * scale for key, (priority, match) in _best_matches(text).items()}
+
+
+def amount_offsets(text: str) -> dict:
+    """
+    {key: offset in `text` where the amount read by match_line_items starts},
+    its sign, parenthesis or currency symbol included.
+    """
+    return {key: match.start("amount") for key, (priority, match) in _best_matches(text.lower()).items()}
+
+
+def row_shape(text: str) -> tuple:
+    """
+    (lines naming a line item, those of them with a number on the same line,
+    lines holding nothing but an amount). Text extracted from a table written
+    column by column has its labels and amounts on separate lines, so few
+    labelled lines carry a number and many lines are bare amounts.
+    """
+    labelled = with_amount = amounts_only = 0
+    for line in text.lower().splitlines():
+        if _LABEL_RE.search(line):
+            labelled += 1
+            with_amount += any(char.isdigit() for char in line)
+        elif _BARE_AMOUNT_RE.match(line):
+            amounts_only += 1
+    return labelled, with_amount, amounts_only
@@ -1,23 +1,63 @@
+import asyncio
+import logging
 import os
 import json
-from openai import OpenAI
 from dotenv import load_dotenv
+from services.document_index import DocumentIndex, estimate_tokens
+from services.llm_cache import llm_cache
+from services.llm_client import async_llm_client, ATTEMPT_TIMEOUT, MAX_RETRIES
+from services.metrics import registry, timed
+from services.startup import LazyModule
+
+openai = LazyModule("openai")
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
 
-def generate_lender_analysis(scorecard_metrics: dict, financial_ratios: dict, overall_score: float, grade: str):
+# How long full_evaluation waits for the LLM analysis before answering with the
+# deterministic synthesis result instead.
+ANALYSIS_DEADLINE = float(os.getenv("SUPPLIER_EVAL_LLM_DEADLINE", "25"))
+
+_client = None
+
+def get_client():
     """
-    Generates a professional lender analysis using OpenAI.
+    Returns the OpenAI client, creating it on first use.
     """
-    if not os.getenv("OPENAI_API_KEY"):
-        return {
-            "rationale": "OpenAI API Key not found. Using default rationale.",
-            "risks": ["API Key missing"],
-            "strengths": ["N/A"]
-        }
+    global _client
+    if _client is None:
+        _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=ATTEMPT_TIMEOUT, max_retries=MAX_RETRIES)
+    return _client
+
+def set_client(client):
+    """
+    Replaces the OpenAI client, e.g. with a local fake exposing
+    `chat.completions.create(...)` so the analysis runs without network.
+    """
+    global _client
+    _client = client
+
+def _llm_available() -> bool:
+    return _client is not None or bool(os.getenv("OPENAI_API_KEY"))
 
+def _chat_json(model: str, messages: list) -> dict:
+    """
+    Runs a JSON-mode chat completion through the response cache. Identical
+    prompts are served from the cache, and concurrent identical prompts share
+    one API call.
+    """
+    def _call():
+        response = get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format={"type": "json_object"}
+        )
+        return json.loads(response.choices[0].message.content)
+
+    return llm_cache.get_or_call(model, messages, _call, response_format="json_object")
+
+def _lender_analysis_messages(scorecard_metrics: dict, financial_ratios: dict, overall_score: float, grade: str) -> list:
     prompt = f"""
     You are a Senior Credit Officer at a commercial bank. Analyze the following supplier data and provide a professional credit assessment.
     
@@ -36,20 +76,30 @@ def generate_lender_analysis(scorecard_metrics: dict, financial_ratios: dict, ov
     
     Return the output as a JSON object with keys: "rationale", "risks" (list of strings), "strengths" (list of strings).
     """
-    
+    return [
+        {"role": "system", "content": "You are a helpful financial analyst assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+_MISSING_KEY_ANALYSIS = {
+    "rationale": "OpenAI API Key not found. Using default rationale.",
+    "risks": ["API Key missing"],
+    "strengths": ["N/A"]
+}
+
+def generate_lender_analysis(scorecard_metrics: dict, financial_ratios: dict, overall_score: float, grade: str):
+    """
+    Generates a professional lender analysis using OpenAI.
+    """
+    if not _llm_available():
+        return dict(_MISSING_KEY_ANALYSIS)
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o", # Or gpt-3.5-turbo
-            messages=[
-                {"role": "system", "content": "You are a helpful financial analyst assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
+        return _chat_json(
+            "gpt-4o", # Or gpt-3.5-turbo
+            _lender_analysis_messages(scorecard_metrics, financial_ratios, overall_score, grade)
         )
         
-        content = response.choices[0].message.content
-        return json.loads(content)
-        
     except Exception as e:
         return {
             "rationale": f"Error generating analysis: {str(e)}",
@@ -57,35 +107,77 @@ def generate_lender_analysis(scorecard_metrics: dict, financial_ratios: dict, ov
             "strengths": ["N/A"]
         }
 
-def extract_financials_with_llm(text: str):
+@timed("llm_analysis")
+async def generate_lender_analysis_async(scorecard_metrics: dict, financial_ratios: dict, overall_score: float, grade: str,
+                                         fallback: dict = None, deadline: float = None):
     """
-    Uses LLM to extract financial data from raw text when regex fails.
+    Non-blocking variant of generate_lender_analysis for use from request handlers.
+    If the LLM fails or misses its deadline, `fallback` (typically the deterministic
+    synthesis result) is returned as soon as the deadline passes.
     """
-    if not os.getenv("OPENAI_API_KEY"):
-        return {}
-        
+    if not async_llm_client.configured:
+        registry.inc("supplier_eval_llm_analysis_total", outcome="unconfigured")
+        return dict(_MISSING_KEY_ANALYSIS)
+
+    try:
+        analysis = await async_llm_client.chat_json(
+            "gpt-4o",
+            _lender_analysis_messages(scorecard_metrics, financial_ratios, overall_score, grade),
+            deadline=deadline or ANALYSIS_DEADLINE,
+        )
+        registry.inc("supplier_eval_llm_analysis_total", outcome="ok")
+        return analysis
+    except asyncio.TimeoutError:
+        logger.warning("LLM analysis missed its %ss deadline. Using deterministic result.", deadline or ANALYSIS_DEADLINE)
+        registry.inc("supplier_eval_llm_analysis_total", outcome="timeout")
+        error = "LLM analysis timed out."
+    except Exception as e:
+        logger.warning("LLM analysis failed: %s", e)
+        registry.inc("supplier_eval_llm_analysis_total", outcome="error")
+        error = f"Error generating analysis: {str(e)}"
+
+    if fallback is not None:
+        return fallback
+    return {"rationale": error, "risks": ["LLM Error"], "strengths": ["N/A"]}
+
+FINANCIAL_KEYS = ["revenue", "net_income", "total_assets", "total_liabilities",
+                  "current_assets", "current_liabilities", "inventory", "equity"]
+
+def _extraction_messages(context: str, keys: list) -> list:
     prompt = f"""
-    Extract the following financial metrics from the text below. Return a JSON object with keys: 
-    "revenue", "net_income", "total_assets", "total_liabilities", "current_assets", "current_liabilities", "inventory", "equity".
+    Extract the following financial metrics from the excerpts of a financial report below. Return a JSON object with keys: 
+    {", ".join(f'"{key}"' for key in keys)}.
     
-    If a value is not found, use null. Return ONLY the JSON.
+    Report amounts in full units, applying any scale header such as "(in thousands)". If a value is not found, use null. Return ONLY the JSON.
     
-    **Text**:
-    {text[:4000]} # Truncate to avoid token limits if needed
+    **Excerpts**:
+    {context}
     """
-    
+    return [
+        {"role": "system", "content": "You are a data extraction assistant. Extract financial numbers accurately."},
+        {"role": "user", "content": prompt}
+    ]
+
+def extract_financials_with_llm(document, keys: list = None, token_budget: int = None):
+    """
+    Uses LLM to extract financial data from raw text when regex fails.
+    `document` is a DocumentIndex (or plain text): only its chunks most likely to
+    hold the line items are sent, within `token_budget` estimated tokens
+    (SUPPLIER_EVAL_LLM_CONTEXT_TOKENS), and only `keys` (default: all) are asked for.
+    """
+    if not _llm_available():
+        return {}
+
+    keys = keys or FINANCIAL_KEYS
+    if isinstance(document, str):
+        document = DocumentIndex.from_text(document)
+    context = document.context(keys, token_budget)
+    messages = _extraction_messages(context, keys)
+    registry.inc("supplier_eval_llm_extraction_prompt_tokens_total", estimate_tokens(messages[-1]["content"]))
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a data extraction assistant. Extract financial numbers accurately."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        
-        content = response.choices[0].message.content
-        return json.loads(content)
+        result = _chat_json("gpt-3.5-turbo", messages)
+        return {key: value for key, value in result.items() if key in keys}
     except Exception as e:
-        print(f"LLM Extraction Error: {e}")
+        logger.warning("LLM Extraction Error: %s", e)
         return {}
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Completed LLM responses are persisted in SQLite so identical prompts are answered
+# from disk across requests, workers and restarts.
+CACHE_PATH = os.getenv(
+    "SUPPLIER_EVAL_LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "llm_responses.sqlite3"),
+)
+TTL_SECONDS = float(os.getenv("SUPPLIER_EVAL_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("SUPPLIER_EVAL_LLM_CACHE_MAX_ENTRIES", "10000"))
+
+
+def prompt_key(model: str, messages: list, **options) -> str:
+    """
+    Hash of the model, the messages and any request options. Whitespace inside
+    message contents is collapsed, so prompts that differ only in indentation or
+    line breaks share an entry.
+    """
+    normalized = [
+        {"role": message["role"], "content": " ".join(str(message["content"]).split())}
+        for message in messages
+    ]
+    payload = json.dumps({"model": model, "messages": normalized, "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent, TTL- and size-bounded cache of JSON-serialisable LLM responses,
+    with single-flight coalescing: concurrent callers asking for the same key
+    share one in-flight call instead of each hitting the API.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl_seconds: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._inflight = {}  # key -> Future
+        self._inflight_lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "errors": 0}
+        self._counters_lock = threading.Lock()  # counted from pool threads
+
+    def _connection(self):
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, response TEXT, created_at REAL, accessed_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        return self._db
+
+    def get(self, key: str):
+        """
+        Returns the cached response for `key`, or None if missing or expired.
+        """
+        now = time.time()
+        with self._db_lock:
+            db = self._connection()
+            row = db.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            db.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, response):
+        now = time.time()
+        with self._db_lock:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, model, json.dumps(response), now, now),
+            )
+            # Drop expired entries, then the least recently used beyond the size bound
+            expired = db.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl_seconds,)).rowcount
+            overflow = db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            db.commit()
+        self.count("evictions", expired + overflow)
+
+    def key(self, model: str, messages: list, **options) -> str:
+        return prompt_key(model, messages, **options)
+
+    def count(self, counter: str, amount: int = 1):
+        with self._counters_lock:
+            self._counters[counter] += amount
+
+    def lookup(self, key: str):
+        """
+        Like get(), but counts hits and treats a storage failure as a miss.
+        """
+        try:
+            cached = self.get(key)
+        except sqlite3.Error as e:
+            logger.warning("LLM cache read failed: %s", e)
+            self.count("errors")
+            return None
+        if cached is not None:
+            self.count("hits")
+        return cached
+
+    def store(self, key: str, model: str, response):
+        """
+        Like put(), but a storage failure only loses the cache entry.
+        """
+        try:
+            self.put(key, model, response)
+        except sqlite3.Error as e:
+            logger.warning("LLM cache write failed: %s", e)
+            self.count("errors")
+
+    def get_or_call(self, model: str, messages: list, call, **options):
+        """
+        Returns the cached response for this prompt, or runs `call()` once and
+        caches its result. Exceptions from `call()` are propagated to every
+        waiting caller and never cached.
+        """
+        key = self.key(model, messages, **options)
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            self.count("coalesced")
+            return future.result()
+
+        self.count("misses")
+        try:
+            response = call()
+            future.set_result(response)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+        self.store(key, model, response)
+        return response
+
+    def stats(self) -> dict:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {**counters, "inflight": len(self._inflight)}
+
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+
+from services.llm_cache import llm_cache
+from services.startup import LazyModule
+
+# Imported with the first client or the first failed call
+httpx = LazyModule("httpx")
+openai = LazyModule("openai")
+
+MAX_CONCURRENCY = int(os.getenv("SUPPLIER_EVAL_LLM_CONCURRENCY", "8"))
+MAX_CONNECTIONS = int(os.getenv("SUPPLIER_EVAL_LLM_MAX_CONNECTIONS", "20"))
+# Timeout of a single HTTP attempt; the caller's deadline bounds all retries together
+ATTEMPT_TIMEOUT = float(os.getenv("SUPPLIER_EVAL_LLM_TIMEOUT", "20"))
+MAX_RETRIES = int(os.getenv("SUPPLIER_EVAL_LLM_RETRIES", "2"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+LATENCY_WINDOW = 1000
+
+# Errors worth another attempt; anything else (bad request, auth) fails immediately
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError")
+
+
+def _retryable(error: Exception) -> bool:
+    return isinstance(error, tuple(getattr(openai, name) for name in RETRYABLE_ERRORS))
+
+
+class AsyncLLMClient:
+    """
+    AsyncOpenAI wrapper for use from the event loop: pooled connections, a cap on
+    concurrent completions, retries with jittered exponential backoff, an overall
+    deadline per call and rolling latency percentiles per model.
+    """
+
+    def __init__(self, client=None, max_concurrency: int = MAX_CONCURRENCY, max_retries: int = MAX_RETRIES):
+        self._client = client
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._semaphore = None
+        self._latencies = {}  # model -> deque of seconds
+        self._inflight = {}  # prompt key -> asyncio.Task
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = openai.AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                timeout=ATTEMPT_TIMEOUT,
+                max_retries=0,  # retries are handled here, within the caller's deadline
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+                ),
+            )
+        return self._client
+
+    def set_client(self, client):
+        """
+        Replaces the underlying AsyncOpenAI client, e.g. with a local fake whose
+        `chat.completions.create(...)` is a coroutine.
+        """
+        self._client = client
+
+    @property
+    def configured(self) -> bool:
+        return self._client is not None or bool(os.getenv("OPENAI_API_KEY"))
+
+    async def chat_json(self, model: str, messages: list, deadline: float) -> dict:
+        """
+        JSON-mode chat completion that gives up after `deadline` seconds
+        (raising asyncio.TimeoutError). Served from the LLM response cache when
+        possible; identical concurrent prompts share one call.
+        """
+        return await asyncio.wait_for(self._cached(model, messages), timeout=deadline)
+
+    async def _cached(self, model: str, messages: list) -> dict:
+        key = llm_cache.key(model, messages, response_format="json_object")
+        cached = await asyncio.to_thread(llm_cache.lookup, key)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            llm_cache.count("misses")
+            task = asyncio.get_running_loop().create_task(self._fetch(key, model, messages))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            llm_cache.count("coalesced")
+
+        # Shielded so a caller hitting its deadline does not cancel the shared call;
+        # a late response is still cached for the next request.
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str, model: str, messages: list) -> dict:
+        response = await self._with_retries(model, messages)
+        await asyncio.to_thread(llm_cache.store, key, model, response)
+        return response
+
+    def _finished(self, key: str, task):
+        self._inflight.pop(key, None)
+        # Retrieve the exception so a call nobody waited for does not log a warning
+        if not task.cancelled():
+            task.exception()
+
+    async def _with_retries(self, model: str, messages: list) -> dict:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    started = time.perf_counter()
+                    response = await self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        response_format={"type": "json_object"}
+                    )
+                    self._record_latency(model, time.perf_counter() - started)
+                return json.loads(response.choices[0].message.content)
+            except Exception as error:
+                if not _retryable(error) or attempt == self.max_retries:
+                    raise
+                # Full jitter keeps concurrent retries from synchronising
+                await asyncio.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+
+    def _record_latency(self, model: str, seconds: float):
+        self._latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def latency_percentiles(self) -> dict:
+        """
+        p50/p90/p99 latency in seconds per model over the last LATENCY_WINDOW calls.
+        """
+        result = {}
+        for model, samples in self._latencies.items():
+            ordered = sorted(samples)
+            pick = lambda q: round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 4)
+            result[model] = {"count": len(ordered), "p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99)}
+        return result
+
+    async def aclose(self):
+        if self._client is not None and hasattr(self._client, "close"):
+            await self._client.close()
+
+
+async_llm_client = AsyncLLMClient()
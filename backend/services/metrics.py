@@ -0,0 +1,313 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Per-stage timing spans, counters and a Prometheus text endpoint (/metrics).
+# A span is two perf_counter() calls and one dict update under a lock, so
+# instrumentation stays well under 1% of any stage it wraps. With
+# SUPPLIER_EVAL_METRICS=0 spans and counters are no-ops.
+ENABLED = os.getenv("SUPPLIER_EVAL_METRICS", "1") != "0"
+# One structured JSON log line per request (logger "supplier_eval.requests")
+REQUEST_LOG = os.getenv("SUPPLIER_EVAL_REQUEST_LOG", "0") == "1"
+
+# Histogram buckets, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+request_logger = logging.getLogger("supplier_eval.requests")
+if REQUEST_LOG and not request_logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    request_logger.addHandler(_handler)
+    request_logger.setLevel(logging.INFO)
+    request_logger.propagate = False
+
+HELP = {
+    "supplier_eval_stage_seconds": "Time spent per pipeline stage.",
+    "supplier_eval_request_seconds": "HTTP request duration, until the last body byte is sent.",
+    "supplier_eval_uploads_total": "Uploaded files, by kind and document cache outcome.",
+    "supplier_eval_upload_bytes_total": "Bytes of uploaded files, by kind.",
+    "supplier_eval_upload_rows_total": "Rows parsed from uploaded files, by kind.",
+    "supplier_eval_llm_analysis_total": "Lender analysis LLM calls, by outcome.",
+    "supplier_eval_pdf_pages_total": "Financial PDF pages extracted, by text backend.",
+    "supplier_eval_llm_extraction_prompt_tokens_total": "Estimated prompt tokens sent by the financial extraction fallback.",
+}
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms keyed by (name, labels), rendered in the Prometheus
+    text format. Values owned by other services (cache hit counts, LLM
+    latencies) are read at scrape time through registered collectors.
+    """
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self._counters = {}  # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: [bucket counts..., sum, count]}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not ENABLED:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        if not ENABLED:
+            return
+        key = _labels(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            counts = series.get(key)
+            if counts is None:
+                # One count per bucket, one for +Inf, then the sum and the count
+                counts = series[key] = [0] * (len(self.buckets) + 3)
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def register_collector(self, collector):
+        """
+        `collector()` returns [(name, type, help, [(labels dict, value), ...])]
+        for metrics read at scrape time.
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: list(counts) for key, counts in series.items()} for name, series in self._histograms.items()}
+        return {"counters": counters, "histograms": histograms}
+
+    def render(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in sorted(snapshot["counters"].items()):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{_format_labels(key)} {value}" for key, value in sorted(series.items()))
+        for name, series in sorted(snapshot["histograms"].items()):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, counts in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {counts[-2]}")
+                lines.append(f"{name}_count{_format_labels(key)} {counts[-1]}")
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                request_logger.warning("Metrics collector %s failed: %s", collector, e)
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_format_labels(_labels(labels))} {value}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+registry = MetricsRegistry()
+
+
+class Trace:
+    """
+    Spans and uploaded files of one request (or of one call in a worker, see
+    traced_call).
+    """
+
+    def __init__(self, collect_only: bool = False):
+        self.started = time.perf_counter()
+        self.spans = []  # (stage, seconds)
+        self.files = []
+        # Worker-side traces only collect; the caller records them (see replay)
+        self.collect_only = collect_only
+
+    def stages(self) -> dict:
+        """
+        stage -> {"count", "seconds"} over the trace's spans.
+        """
+        stages = {}
+        for stage, seconds in self.spans:
+            entry = stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+        return {stage: {"count": e["count"], "seconds": round(e["seconds"], 6)} for stage, e in stages.items()}
+
+
+_current_trace = contextvars.ContextVar("supplier_eval_trace", default=None)
+
+
+def record_span(stage: str, seconds: float):
+    if not ENABLED:
+        return
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append((stage, seconds))
+        if trace.collect_only:
+            return
+    registry.observe("supplier_eval_stage_seconds", seconds, stage=stage)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Times the block as one `stage` span.
+    """
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - started)
+
+
+def timed(stage: str):
+    """
+    Decorator timing every call of a function (or coroutine function) as a
+    `stage` span.
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_call(func, *args):
+    """
+    Calls func(*args) and returns (result, spans). For work handed to the
+    process pool, whose spans would otherwise stay in the worker: pass the
+    spans to replay() in the caller.
+    """
+    if not ENABLED:
+        return func(*args), []
+    trace = Trace(collect_only=True)
+    token = _current_trace.set(trace)
+    try:
+        return func(*args), trace.spans
+    finally:
+        _current_trace.reset(token)
+
+
+def replay(spans: list):
+    for stage, seconds in spans:
+        record_span(stage, seconds)
+
+
+def record_upload(kind: str, filename: str, size: int, rows: int = None, cached: bool = False, seconds: float = None):
+    """
+    Counts one uploaded file's bytes (and parsed rows, for tabular uploads);
+    `seconds` is its ingestion time, for the request log.
+    """
+    if not ENABLED:
+        return
+    registry.inc("supplier_eval_uploads_total", kind=kind, cache="hit" if cached else "miss")
+    registry.inc("supplier_eval_upload_bytes_total", size, kind=kind)
+    if rows is not None:
+        registry.inc("supplier_eval_upload_rows_total", rows, kind=kind)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.files.append({
+            "file": filename, "kind": kind, "bytes": size, "rows": rows, "cached": cached,
+            "seconds": round(seconds, 6) if seconds is not None else None,
+        })
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request until its last body chunk is sent
+    (so streamed responses are timed in full), with a trace that spans and
+    uploads of the request are recorded into. Emits the request's JSON log line
+    when SUPPLIER_EVAL_REQUEST_LOG=1.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _current_trace.set(trace)
+        status = {"code": 500}
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            seconds = time.perf_counter() - trace.started
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            registry.observe(
+                "supplier_eval_request_seconds", seconds,
+                method=scope["method"], path=path, status=str(status["code"]),
+            )
+            if REQUEST_LOG:
+                request_logger.info(json.dumps({
+                    "method": scope["method"],
+                    "path": path,
+                    "status": status["code"],
+                    "seconds": round(seconds, 6),
+                    "stages": trace.stages(),
+                    "files": trace.files,
+                }))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            _current_trace.reset(token)
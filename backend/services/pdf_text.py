@@ -0,0 +1,100 @@
+import io
+import os
+import threading
+
+from services.startup import LazyModule
+
+pdfplumber = LazyModule("pdfplumber")
+pypdfium2 = LazyModule("pypdfium2")
+
+# Text extraction backends for financial PDFs, by name. Workers are handed the
+# name rather than the backend, so tasks pickle cheaply.
+#   "pdfium"             PDFium's text layer: plain text in content order, fast
+#   "pdfplumber_simple"  pdfplumber without line clustering
+#   "pdfplumber"         pdfplumber with layout analysis, for tables whose labels
+#                        and amounts are laid out as separate columns
+# SUPPLIER_EVAL_PDF_BACKEND picks "pdfium" or "pdfplumber" for every page, or
+# "auto" (the default): pdfium first, pdfplumber for pages it gets wrong
+# (see services/financials.py).
+PDF_BACKEND = os.getenv("SUPPLIER_EVAL_PDF_BACKEND", "auto")
+
+# PDFium is not thread-safe; calls from the threads of one process take turns
+pdfium_lock = threading.Lock()
+
+
+def open_pdfplumber(source):
+    return pdfplumber.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+
+
+def open_pdfium(source):
+    # pypdfium2 resolves paths itself, which breaks /proc/<pid>/fd/<n> paths of
+    # spooled uploads (see services/uploads.py), so it is given the open file
+    if isinstance(source, (str, os.PathLike)):
+        return pypdfium2.PdfDocument(open(source, "rb"), autoclose=True)
+    return pypdfium2.PdfDocument(source)
+
+
+class PdfiumBackend:
+    name = "pdfium"
+
+    def page_count(self, source) -> int:
+        with pdfium_lock:
+            pdf = open_pdfium(source)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+
+    def extract(self, source, page_numbers: list) -> list:
+        texts = []
+        with pdfium_lock:
+            pdf = open_pdfium(source)
+            try:
+                for number in page_numbers:
+                    page = pdf[number]
+                    textpage = page.get_textpage()
+                    text = textpage.get_text_range()
+                    textpage.close()
+                    page.close()
+                    # PDFium ends lines with \r\n and marks soft hyphens with \x02
+                    texts.append(text.replace("\r\n", "\n").replace("\r", "\n").replace("\x02", ""))
+            finally:
+                pdf.close()
+        return texts
+
+
+class PdfplumberBackend:
+    def __init__(self, layout: bool):
+        self.layout = layout
+        self.name = "pdfplumber" if layout else "pdfplumber_simple"
+
+    def page_count(self, source) -> int:
+        with open_pdfplumber(source) as pdf:
+            return len(pdf.pages)
+
+    def extract(self, source, page_numbers: list) -> list:
+        # Without layout, pdfplumber's simple extraction skips line clustering
+        texts = []
+        with open_pdfplumber(source) as pdf:
+            for number in page_numbers:
+                page = pdf.pages[number]
+                text = page.extract_text() if self.layout else page.extract_text_simple()
+                texts.append(text or "")
+                page.close()
+        return texts
+
+
+BACKENDS = {backend.name: backend for backend in (PdfiumBackend(), PdfplumberBackend(True), PdfplumberBackend(False))}
+
+
+def page_count(source, backend: str) -> int:
+    return BACKENDS[backend].page_count(source)
+
+
+def extract_page_range(source, page_numbers: list, backend: str) -> list:
+    """
+    Extracts the text of the given pages with the named backend. Runs in a
+    worker process, so `source` is best a file path: bytes are pickled into
+    every task.
+    """
+    return BACKENDS[backend].extract(source, page_numbers)
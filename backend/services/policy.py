@@ -0,0 +1,249 @@
+import hashlib
+import logging
+import operator
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# The scoring policy (thresholds, points, grade cutoffs, concern limits and
+# commentary) lives in a YAML file. It is parsed and compiled once into plain
+# tuples and dicts; evaluations only read those. Edits to the file are picked
+# up without a restart, in the API process and in every pool worker.
+POLICY_PATH = os.getenv(
+    "SUPPLIER_EVAL_POLICY_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "policies", "default.yaml"),
+)
+# How often (seconds) the policy file's mtime is checked; 0 checks on every use
+RELOAD_INTERVAL = float(os.getenv("SUPPLIER_EVAL_POLICY_RELOAD_SECONDS", "2"))
+
+OPERATORS = {">=": operator.ge, ">": operator.gt, "<=": operator.le, "<": operator.lt}
+
+_CONDITION_RE = re.compile(r"\s*(>=|<=|>|<)\s*(-?\d+(?:\.\d+)?)\s*")
+
+
+class Ladder:
+    """
+    A compiled if/elif/else chain over one value: the outcome of the first rule
+    whose condition holds, else the fallback. Rules are
+    (operator symbol, comparison function, threshold, outcome) tuples.
+    """
+
+    __slots__ = ("rules", "otherwise")
+
+    def __init__(self, rules: tuple, otherwise):
+        self.rules = rules
+        self.otherwise = otherwise
+
+    def __call__(self, value):
+        for _, compare, threshold, outcome in self.rules:
+            if compare(value, threshold):
+                return outcome
+        return self.otherwise
+
+
+class ScoringPolicy:
+    """
+    A compiled scoring policy. `digest` identifies the source text, so two
+    policies with the same digest score identically.
+    """
+
+    def __init__(self, name: str, version, digest: str, operational: dict, financial: dict,
+                 grades: Ladder, concerns: tuple, commentary: dict, trends: dict = None):
+        self.name = name
+        self.version = version
+        self.digest = digest
+        self.operational = operational  # metric -> points for 100%
+        self.financial = financial  # ratio -> Ladder of points
+        self.trends = trends or {}  # year-over-year trend -> Ladder of points
+        self.grades = grades  # Ladder over the total score
+        self.concerns = concerns  # (flag, metric, symbol, compare, threshold, message template)
+        self.commentary = commentary  # metric -> Ladder of text
+        self.metric_columns = list(dict.fromkeys(
+            list(operational) + list(financial) + list(self.trends) + [concern[1] for concern in concerns]
+        ))
+
+    def info(self) -> dict:
+        return {"name": self.name, "version": self.version, "digest": self.digest}
+
+
+def _condition(text, where: str):
+    match = _CONDITION_RE.fullmatch(str(text))
+    if match is None:
+        raise ValueError(f"{where}: condition must look like '>= 1.5', got {text!r}")
+    symbol, number = match.groups()
+    return symbol, OPERATORS[symbol], float(number) if "." in number else int(number)
+
+
+_REQUIRED = object()
+
+
+def _ladder(rules, outcome_key: str, where: str, otherwise=_REQUIRED) -> Ladder:
+    """
+    Compiles a list of {when, <outcome_key>} rules. Without a fallback rule the
+    ladder falls back to `otherwise`, or the policy is rejected if none is given.
+    """
+    if not isinstance(rules, list) or not rules:
+        raise ValueError(f"{where}: expected a list of rules")
+    compiled = []
+    for i, rule in enumerate(rules):
+        if not isinstance(rule, dict) or outcome_key not in rule:
+            raise ValueError(f"{where}[{i}]: every rule needs '{outcome_key}'")
+        if "when" not in rule:
+            if i != len(rules) - 1:
+                raise ValueError(f"{where}[{i}]: the fallback rule (no 'when') must come last")
+            otherwise = rule[outcome_key]
+        else:
+            compiled.append(_condition(rule["when"], f"{where}[{i}]") + (rule[outcome_key],))
+    if otherwise is _REQUIRED:
+        raise ValueError(f"{where}: needs a fallback rule without 'when'")
+    return Ladder(tuple(compiled), otherwise)
+
+
+def compile_policy(document: dict, digest: str = "") -> ScoringPolicy:
+    """
+    Compiles a parsed policy document. Raises ValueError if it is malformed.
+    """
+    if not isinstance(document, dict):
+        raise ValueError("Policy must be a mapping")
+    for section, kind in (("operational", dict), ("financial", dict), ("grades", list),
+                          ("concerns", list), ("commentary", dict)):
+        if not isinstance(document.get(section), kind):
+            raise ValueError(f"Policy section '{section}' is missing or not a {kind.__name__}")
+    # Optional, so policies written before multi-period scoring still load
+    if not isinstance(document.get("trends", {}), dict):
+        raise ValueError("Policy section 'trends' is not a dict")
+
+    operational = {}
+    for metric, weight in document["operational"].items():
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+            raise ValueError(f"operational.{metric}: weight must be a number")
+        operational[metric] = weight
+
+    concerns = []
+    for i, concern in enumerate(document["concerns"]):
+        missing = {"flag", "metric", "when", "message"} - set(concern if isinstance(concern, dict) else ())
+        if missing:
+            raise ValueError(f"concerns[{i}]: missing {', '.join(sorted(missing))}")
+        concerns.append(
+            (concern["flag"], concern["metric"]) + _condition(concern["when"], f"concerns[{i}]") + (concern["message"],)
+        )
+
+    financial = {
+        metric: _ladder(rules, "points", f"financial.{metric}", otherwise=0)
+        for metric, rules in document["financial"].items()
+    }
+    trends = {
+        metric: _ladder(rules, "points", f"trends.{metric}", otherwise=0)
+        for metric, rules in document.get("trends", {}).items()
+    }
+    commentary = {
+        metric: _ladder(rules, "text", f"commentary.{metric}", otherwise="")
+        for metric, rules in document["commentary"].items()
+    }
+    return ScoringPolicy(
+        name=str(document.get("name", "unnamed")),
+        version=document.get("version"),
+        digest=digest,
+        operational=operational,
+        financial=financial,
+        grades=_ladder(document["grades"], "grade", "grades"),
+        concerns=tuple(concerns),
+        commentary=commentary,
+        trends=trends,
+    )
+
+
+@lru_cache(maxsize=32)
+def parse_policy(text: str) -> ScoringPolicy:
+    """
+    Parses and compiles policy YAML. Cached by content, so evaluating against the
+    same candidate policy again costs nothing.
+    """
+    try:
+        document = yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        raise ValueError(f"Policy is not valid YAML: {e}")
+    return compile_policy(document, hashlib.sha256(text.encode("utf-8")).hexdigest()[:16])
+
+
+def load_policy(path: str) -> ScoringPolicy:
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_policy(f.read())
+
+
+class PolicyStore:
+    """
+    Holds the active policy and reloads it when the file changes. A reload
+    compiles the new policy completely before swapping it in, so callers see
+    either the old or the new policy, never a mix; a broken file is reported
+    and the previous policy stays active.
+    """
+
+    def __init__(self, path: str = POLICY_PATH, reload_interval: float = RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._policy = None
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._counters = {"reloads": 0, "reload_errors": 0}
+        self._loaded_at = None
+
+    def current(self) -> ScoringPolicy:
+        """
+        The active policy. Take it once per evaluation so that one evaluation
+        never mixes two policies.
+        """
+        now = time.monotonic()
+        if self._policy is None or now >= self._next_check:
+            with self._lock:
+                if self._policy is None or now >= self._next_check:
+                    self._refresh()
+                    self._next_check = now + self.reload_interval
+        return self._policy
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            if self._policy is None:
+                raise
+            logger.warning("Scoring policy file unavailable, keeping %s: %s", self._policy.name, e)
+            return
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return
+        try:
+            policy = load_policy(self.path)
+        except (OSError, ValueError) as e:
+            if self._policy is None:
+                raise
+            logger.warning("Scoring policy reload failed, keeping %s: %s", self._policy.name, e)
+            self._counters["reload_errors"] += 1
+            self._signature = signature  # retry only once the file changes again
+            return
+
+        if self._policy is not None:
+            self._counters["reloads"] += 1
+            logger.info("Scoring policy reloaded: %s v%s (%s)", policy.name, policy.version, policy.digest)
+        self._policy = policy
+        self._signature = signature
+        self._loaded_at = time.time()
+
+    def stats(self) -> dict:
+        policy = self.current()
+        return {**policy.info(), "path": self.path, "loaded_at": self._loaded_at, **self._counters}
+
+
+policy_store = PolicyStore()
+
+
+def current_policy() -> ScoringPolicy:
+    return policy_store.current()
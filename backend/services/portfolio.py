@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import operator
+
+from services.policy import current_policy
+from services.startup import LazyModule
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# Columnar counterpart of services/synthesis.py: scores, grades, breakdowns and
+# lender concerns for N suppliers at once, from the same compiled scoring policy.
+# Every ladder is evaluated with np.select, and results are bit-identical to
+# calling calculate_overall_score / identify_lender_concerns once per supplier.
+
+OPERATIONAL_METRICS = ["on_time_delivery_rate", "invoice_paid_rate"]
+FINANCIAL_METRICS = ["current_ratio", "net_margin", "debt_to_equity"]
+TREND_METRICS = ["revenue_growth", "net_margin_change", "debt_to_equity_change"]
+METRIC_COLUMNS = OPERATIONAL_METRICS + FINANCIAL_METRICS + TREND_METRICS
+
+_COMPARE = {">=": operator.ge, ">": operator.gt, "<=": operator.le, "<": operator.lt}
+
+
+def portfolio_frame(evaluations: list) -> pd.DataFrame:
+    """
+    Builds the input frame from (scorecard_metrics, financial_ratios) dict pairs,
+    or (scorecard_metrics, financial_ratios, trends) triples, keeping the values
+    as they are ("N/A (...)" strings included).
+    """
+    return pd.DataFrame(
+        [{**{c: scorecard.get(c) for c in OPERATIONAL_METRICS},
+          **{c: ratios.get(c) for c in FINANCIAL_METRICS},
+          **{c: (trends[0] if trends else {}).get(c) for c in TREND_METRICS}}
+         for scorecard, ratios, *trends in evaluations],
+        columns=METRIC_COLUMNS,
+    )
+
+
+def _metric(df: pd.DataFrame, column: str):
+    """
+    Returns (values as float64, present mask). Like the scalar _is_number check,
+    only numbers count; strings such as "N/A (Missing dates)", numeric strings,
+    None and NaN are missing.
+    """
+    if column not in df.columns:
+        return np.full(len(df), np.nan), np.zeros(len(df), dtype=bool)
+
+    series = df[column]
+    if series.dtype == object:
+        raw = series.to_numpy()
+        is_number = np.fromiter((isinstance(v, (int, float)) for v in raw), dtype=bool, count=len(raw))
+        values = np.where(is_number, raw, np.nan).astype("float64")
+    else:
+        values = series.to_numpy(dtype="float64", na_value=np.nan)
+    return values, ~np.isnan(values)
+
+
+def _ladder(values: np.ndarray, present: np.ndarray, ladder, missing=0) -> np.ndarray:
+    conditions = [present & _COMPARE[symbol](values, threshold) for symbol, _, threshold, _ in ladder.rules]
+    choices = [outcome for _, _, _, outcome in ladder.rules]
+    return np.select(conditions + [present], choices + [ladder.otherwise], missing)
+
+
+def round_like_python(values: np.ndarray, digits: int = 1) -> np.ndarray:
+    """
+    np.round that matches Python's round() exactly. np.round scales, rounds and
+    unscales, which can land on the other side of a decimal tie (e.g. 0.15 ->
+    0.2 where round() gives 0.1). Values close to a tie are re-rounded with
+    round() itself; everywhere else the two agree.
+    """
+    rounded = np.round(values, digits)
+    scaled = values * 10 ** digits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(values[i]), digits)
+    return rounded
+
+
+def score_portfolio(df: pd.DataFrame, with_concerns: bool = True, policy=None) -> pd.DataFrame:
+    """
+    Scores every row of `df` (columns named like the metrics, e.g. a batch
+    evaluation result file) and returns a frame with the same index holding
+    score, grade, operational_score, financial_score, one boolean column per
+    concern and, if `with_concerns`, the lender_concerns lists.
+    """
+    policy = policy or current_policy()
+    return _score(df, _metrics(df, policy.metric_columns), policy, with_concerns)
+
+
+def compare_policies(df: pd.DataFrame, policy_a, policy_b, with_concerns: bool = True,
+                     labels: tuple = ("a", "b")) -> pd.DataFrame:
+    """
+    A/B evaluation: scores `df` under two policies in one pass over the inputs
+    (metric columns are extracted once) and returns both results side by side,
+    suffixed with `labels`, plus score_delta and grade_changed.
+    """
+    metrics = _metrics(df, list(dict.fromkeys(policy_a.metric_columns + policy_b.metric_columns)))
+    a = _score(df, metrics, policy_a, with_concerns)
+    b = _score(df, metrics, policy_b, with_concerns)
+    result = pd.concat([a.add_suffix(f"_{labels[0]}"), b.add_suffix(f"_{labels[1]}")], axis=1)
+    result["score_delta"] = b["score"] - a["score"]
+    result["grade_changed"] = a["grade"] != b["grade"]
+    return result
+
+
+def _metrics(df: pd.DataFrame, columns: list) -> dict:
+    return {column: _metric(df, column) for column in columns}
+
+
+def _score(df: pd.DataFrame, metrics: dict, policy, with_concerns: bool) -> pd.DataFrame:
+    # Accumulated in the scalar order so float rounding is identical
+    op_score = np.zeros(len(df))
+    for column, weight in policy.operational.items():
+        values, present = metrics[column]
+        op_score = op_score + np.where(present, values / 100 * weight, 0.0)
+
+    fin_score = np.zeros(len(df), dtype="int64")
+    for column, ladder in policy.financial.items():
+        fin_score = fin_score + _ladder(*metrics[column], ladder)
+
+    trend_score = np.zeros(len(df), dtype="int64")
+    for column, ladder in policy.trends.items():
+        trend_score = trend_score + _ladder(*metrics[column], ladder)
+
+    base_score = op_score + fin_score
+    total_score = np.maximum(base_score + trend_score, np.minimum(base_score, 0))
+    grades = _ladder(total_score, np.ones(len(df), dtype=bool), policy.grades, policy.grades.otherwise)
+
+    result = pd.DataFrame({
+        "score": round_like_python(total_score),
+        "grade": grades,
+        "operational_score": round_like_python(op_score),
+        "financial_score": round_like_python(fin_score.astype("float64")),
+        "trend_score": round_like_python(trend_score.astype("float64")),
+    }, index=df.index)
+
+    for flag, column, symbol, _, threshold, _ in policy.concerns:
+        values, present = metrics[column]
+        result[flag] = present & _COMPARE[symbol](values, threshold)
+
+    if with_concerns:
+        result["lender_concerns"] = _concern_messages(df, result, policy)
+    return result
+
+
+def _concern_messages(df: pd.DataFrame, flags: pd.DataFrame, policy) -> list:
+    """
+    Concern texts per row, in the scalar order, formatted from the original
+    values so that e.g. an int 65 reads "65%" exactly as in the scalar path.
+    """
+    columns = []
+    for flag, column, _, _, _, template in policy.concerns:
+        flagged = np.flatnonzero(flags[flag].to_numpy())
+        messages = np.full(len(df), None, dtype=object)
+        if len(flagged):
+            messages[flagged] = _format_each(template, df[column].to_numpy()[flagged])
+        columns.append(messages)
+    return [[message for message in row if message is not None] for row in zip(*columns)]
+
+
+def _format_each(template: str, values: np.ndarray) -> np.ndarray:
+    """
+    template.format(value=value) for every value, formatting each distinct value once.
+    Values are grouped by type (65 == 65.0, but they print differently) and
+    floats are told apart by their bits (0.0 == -0.0).
+    """
+    formatted = np.empty(len(values), dtype=object)
+    if values.dtype == object:
+        type_codes = {}
+        kinds = np.fromiter(
+            (type_codes.setdefault(type(value), len(type_codes)) for value in values), dtype="int64", count=len(values)
+        )
+        kind_types = list(type_codes)
+    else:
+        kinds, kind_types = np.zeros(len(values), dtype="int64"), [values.dtype.type]
+    for kind, kind_type in enumerate(kind_types):
+        at = np.flatnonzero(kinds == kind)
+        if issubclass(kind_type, float):
+            codes, bits = pd.factorize(values[at].astype("float64").view("int64"))
+            distinct = [kind_type(value) for value in bits.view("float64")]
+        else:
+            codes, distinct = pd.factorize(values[at])
+        formatted[at] = np.array([template.format(value=value) for value in distinct], dtype=object)[codes]
+    return formatted
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+from services.startup import LazyModule
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# PO <-> invoice reconciliation.
+#
+# Both sides are first pre-aggregated to one row per (po_number, sku), then joined
+# on that unique key. The join can never fan out into a Cartesian product, and
+# memory is bounded by the number of distinct POs, not by the number of lines.
+# Aggregates are additive, so partial aggregates from chunks or files can be
+# combined before reconciling.
+
+KEY_COLUMNS = ["po_number", "sku"]
+
+PO_AGGREGATES = {"ordered_qty": "sum", "po_amount": "sum", "po_date": "min", "po_lines": "sum"}
+INVOICE_AGGREGATES = {"invoiced_qty": "sum", "invoiced_amount": "sum", "invoice_date": "min", "invoice_lines": "sum"}
+
+
+def _aggregate(df: pd.DataFrame, columns: dict, aggregates: dict) -> pd.DataFrame:
+    """
+    Groups `df` by po_number/sku and aggregates the mapped source columns
+    ({output: source}). Missing source columns become all-NaN outputs.
+    """
+    if df.empty or "po_number" not in df.columns:
+        return empty_aggregate(aggregates)
+
+    frame = pd.DataFrame({
+        "po_number": df["po_number"].to_numpy(),
+        "sku": df["sku"].to_numpy() if "sku" in df.columns else None,
+    })
+    for output, source in columns.items():
+        if source is None:
+            frame[output] = 1
+        elif source in df.columns:
+            values = df[source]
+            if output.endswith("_date"):
+                frame[output] = pd.to_datetime(values, errors="coerce").to_numpy()
+            else:
+                frame[output] = pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        else:
+            frame[output] = pd.NaT if output.endswith("_date") else np.nan
+
+    # Keys are normalized per distinct value, so 123 and "123 " reconcile with
+    # each other, and the lines are grouped once on the resulting categoricals.
+    frame["po_number"] = normalize_key(frame["po_number"])
+    frame["sku"] = normalize_key(frame["sku"])
+    return _group(frame, aggregates, sort=False)
+
+
+def _group(frame: pd.DataFrame, aggregates: dict, sort: bool) -> pd.DataFrame:
+    # min_count=1 keeps a sum over only-missing values as NaN instead of 0
+    grouped = frame.groupby(KEY_COLUMNS, dropna=False, sort=sort, observed=True)
+    sums = [column for column, how in aggregates.items() if how == "sum"]
+    mins = [column for column, how in aggregates.items() if how == "min"]
+    result = grouped[sums].sum(min_count=1)
+    # Both reductions come out in the same group order, so no realignment is needed
+    for column, values in grouped[mins].min().items():
+        result[column] = values.to_numpy()
+    return result[list(aggregates)]
+
+
+def combine_aggregates(parts: list, aggregates: dict) -> pd.DataFrame:
+    """
+    Combines partial aggregates (from chunks or files) into one row per key.
+    """
+    frames = [part.reset_index() for part in parts if not part.empty]
+    if not frames:
+        return parts[0]
+    if len(frames) == 1:
+        return _group(frames[0], aggregates, sort=False)
+
+    # Concatenating the keys as categoricals avoids pandas unioning (and sorting)
+    # the string levels of every part's MultiIndex.
+    frame = pd.concat([part.drop(columns=KEY_COLUMNS) for part in frames], ignore_index=True)
+    for column in KEY_COLUMNS:
+        frame[column] = pd.api.types.union_categoricals([_as_categorical(part[column]) for part in frames])
+    return _group(frame, aggregates, sort=False)
+
+
+def _as_categorical(values) -> pd.Categorical:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.array
+    # String categories even when every value is missing, so parts can be unioned
+    return pd.Categorical(values.astype(object), categories=pd.Index(values.dropna().unique(), dtype=object))
+
+
+def _key_label(value) -> str:
+    # Excel often turns numeric PO numbers into floats (123.0 / "123.0")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    label = str(value).strip()
+    if label.endswith(".0") and label[:-2].isdigit():
+        label = label[:-2]
+    return label
+
+
+def normalize_key(values) -> pd.Categorical:
+    """
+    Normalizes key values to stripped strings. Only the distinct values are
+    converted, and the result is a categorical over the normalized labels.
+    """
+    codes, uniques = pd.factorize(values)
+    if pd.api.types.is_integer_dtype(uniques.dtype):
+        labels = uniques.astype(str)
+    else:
+        labels = np.array([_key_label(value) for value in uniques], dtype=object)
+    labels, categories = pd.factorize(labels)
+    codes = np.where(codes >= 0, labels[codes] if len(labels) else codes, -1)
+    return pd.Categorical.from_codes(codes, categories)
+
+
+def aggregate_po_lines(po_df: pd.DataFrame) -> pd.DataFrame:
+    return _aggregate(
+        po_df,
+        {"ordered_qty": "quantity", "po_amount": "amount", "po_date": "date", "po_lines": None},
+        PO_AGGREGATES,
+    )
+
+
+def aggregate_invoice_lines(inv_df: pd.DataFrame) -> pd.DataFrame:
+    return _aggregate(
+        inv_df,
+        {"invoiced_qty": "quantity", "invoiced_amount": "amount", "invoice_date": "date", "invoice_lines": None},
+        INVOICE_AGGREGATES,
+    )
+
+
+def _rollup_to_po(frame: pd.DataFrame, aggregates: dict) -> pd.DataFrame:
+    """
+    Drops the SKU level, for when the other side has no SKUs to match on.
+    """
+    rolled = frame.reset_index()
+    rolled["sku"] = None
+    return combine_aggregates([rolled.set_index(KEY_COLUMNS)], aggregates)
+
+
+def _joint_codes(left: pd.DataFrame, right: pd.DataFrame, level: str):
+    """
+    Integer codes for one key level, consistent across both aggregates.
+    Missing keys get -1.
+    """
+    # Factorize the (small) level values, then map each side's level codes
+    position = left.index.names.index(level)
+    left_values, right_values = left.index.levels[position], right.index.levels[position]
+    codes, _ = pd.factorize(np.concatenate([left_values.astype(object), right_values.astype(object)]))
+    # A trailing -1 so that missing level codes (-1) map to -1
+    left_map = np.append(codes[:len(left_values)], -1)
+    right_map = np.append(codes[len(left_values):], -1)
+    return left_map[left.index.codes[position]].astype("int64"), right_map[right.index.codes[position]].astype("int64")
+
+
+def empty_aggregate(aggregates: dict) -> pd.DataFrame:
+    return pd.DataFrame(columns=KEY_COLUMNS + list(aggregates)).set_index(KEY_COLUMNS)
+
+
+def reconcile(po_agg: pd.DataFrame, inv_agg: pd.DataFrame) -> dict:
+    """
+    Reconciles aggregated PO lines against aggregated invoice lines. Matches on
+    po_number and sku when both sides carry SKUs, otherwise on po_number alone.
+    """
+    if po_agg.empty or inv_agg.empty:
+        return {
+            "matched_pos": 0,
+            "matched_on": "N/A",
+            "unmatched_pos": int(po_agg.index.get_level_values("po_number").nunique()) if not po_agg.empty else 0,
+            "unmatched_invoices": int(inv_agg["invoice_lines"].sum()) if not inv_agg.empty else 0,
+            "quantity_match_rate": "N/A (No matching records)",
+            "amount_variance": "N/A (No matching records)",
+            "amount_variance_pct": "N/A (No matching records)",
+            "po_to_invoice_lag_days": "N/A (No matching records)",
+        }
+
+    by_sku = inv_agg.index.get_level_values("sku").notna().any() and po_agg.index.get_level_values("sku").notna().any()
+    if not by_sku:
+        po_agg = _rollup_to_po(po_agg, PO_AGGREGATES)
+        inv_agg = _rollup_to_po(inv_agg, INVOICE_AGGREGATES)
+
+    # One-to-one join on unique keys. The keys are re-coded as integers shared by
+    # both sides and matched with a sort-based intersection, which is much
+    # faster than joining on (po_number, sku) pairs.
+    po_codes, inv_codes = _joint_codes(po_agg, inv_agg, "po_number")
+    po_skus, inv_skus = _joint_codes(po_agg, inv_agg, "sku")
+    width = int(max(po_skus.max(), inv_skus.max())) + 2  # +1 for the missing-SKU code -1
+    _, po_at, inv_at = np.intersect1d(
+        po_codes * width + po_skus + 1, inv_codes * width + inv_skus + 1, assume_unique=True, return_indices=True
+    )
+    # Lines without a PO number cannot be matched to anything
+    valid = po_codes[po_at] >= 0
+    po_at, inv_at = po_at[valid], inv_at[valid]
+    matched = pd.concat(
+        [po_agg.iloc[po_at].reset_index(drop=True), inv_agg.iloc[inv_at].reset_index(drop=True)], axis=1
+    )
+    matched_pos = np.unique(po_codes[po_at])
+    ordered_pos = np.unique(po_codes[po_codes >= 0])
+    unmatched_invoices = np.ones(len(inv_agg), dtype=bool)
+    unmatched_invoices[inv_at] = False
+
+    metrics = {
+        "matched_pos": int(matched_pos.size),
+        "unmatched_pos": int(np.setdiff1d(ordered_pos, matched_pos, assume_unique=True).size),
+        "unmatched_invoices": int(inv_agg["invoice_lines"].to_numpy()[unmatched_invoices].sum()),
+        "matched_on": "po_number+sku" if by_sku else "po_number",
+    }
+
+    # Quantity match rate: matched keys where invoiced quantity equals ordered quantity
+    qty = matched[["ordered_qty", "invoiced_qty"]].dropna()
+    if len(qty):
+        matches = np.isclose(qty["invoiced_qty"].to_numpy(), qty["ordered_qty"].to_numpy())
+        metrics["quantity_match_rate"] = round(float(matches.mean()) * 100, 2)
+    else:
+        metrics["quantity_match_rate"] = "N/A (Missing quantities)"
+
+    # Amount variance: invoiced minus ordered amount on matched keys
+    amounts = matched[["po_amount", "invoiced_amount"]].dropna()
+    if len(amounts):
+        variance = float(amounts["invoiced_amount"].sum() - amounts["po_amount"].sum())
+        ordered = float(amounts["po_amount"].sum())
+        metrics["amount_variance"] = round(variance, 2)
+        metrics["amount_variance_pct"] = round(variance / ordered * 100, 2) if ordered else "N/A (Zero PO amount)"
+    else:
+        metrics["amount_variance"] = "N/A (Missing PO amounts)"
+        metrics["amount_variance_pct"] = "N/A (Missing PO amounts)"
+
+    # PO-to-invoice lag: first invoice date minus PO date, in days
+    lag = (matched["invoice_date"] - matched["po_date"]).dropna().dt.days
+    if len(lag):
+        metrics["po_to_invoice_lag_days"] = {
+            "mean": round(float(lag.mean()), 2),
+            "median": float(lag.median()),
+            "p90": float(lag.quantile(0.9)),
+        }
+    else:
+        metrics["po_to_invoice_lag_days"] = "N/A (Missing dates)"
+
+    return metrics
@@ -1,6 +1,23 @@
-import pandas as pd
+from __future__ import annotations
 
-def calculate_scorecard(po_df: pd.DataFrame, inv_df: pd.DataFrame):
+from services.metrics import timed
+from services.policy import current_policy
+from services.reconciliation import (
+    aggregate_po_lines, aggregate_invoice_lines, combine_aggregates, empty_aggregate, reconcile,
+    PO_AGGREGATES, INVOICE_AGGREGATES
+)
+from services.startup import LazyModule
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# Partial reconciliation aggregates are compacted once this many pile up
+MAX_PENDING_AGGREGATES = 16
+
+PAID_STATUSES = ["paid", "cleared", "settled"]
+
+@timed("scorecard")
+def calculate_scorecard(po_df: pd.DataFrame, inv_df: pd.DataFrame, policy=None):
     """
     Calculates scorecard metrics from PO and Invoice dataframes.
     """
@@ -31,12 +48,63 @@ def calculate_scorecard(po_df: pd.DataFrame, inv_df: pd.DataFrame):
     # On-Time = (Count of POs with Status 'Delivered' and Delivery Date <= Promised Date) / Total POs
     # If we lack columns, we will return "N/A".
     
-    metrics = {}
+    accumulator = ScorecardAccumulator()
+    accumulator.add_po_chunk(po_df)
+    accumulator.add_invoice_chunk(inv_df)
+    metrics = accumulator.operational_metrics()
+        
+    metrics["commentary"] = scorecard_commentary(metrics, policy)
     
-    # On-Time Delivery
+    return metrics
+
+def on_time_mask(po_df: pd.DataFrame):
+    """
+    Per PO line: delivered on or before the promised date. Lines with missing
+    dates count as late. None if the file has no delivery/promised dates.
+    """
     if "delivery_date" in po_df.columns and "promised_date" in po_df.columns:
-        on_time_mask = pd.to_datetime(po_df["delivery_date"]) <= pd.to_datetime(po_df["promised_date"])
-        on_time_rate = on_time_mask.mean() * 100
+        return _dates(po_df["delivery_date"]) <= _dates(po_df["promised_date"])
+    return None
+
+def _dates(series: pd.Series) -> pd.Series:
+    # Ingestion parses date columns once (services/ingestion.py); only frames
+    # built some other way are converted here
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series)
+
+def lateness_days(po_df: pd.DataFrame):
+    """
+    Per PO line: whole days delivered after the promised date, rounded up, so a
+    line is on time exactly when this is 0 or less (negative: early). Missing
+    where either date is. None if the file has no delivery/promised dates.
+    """
+    if "delivery_date" in po_df.columns and "promised_date" in po_df.columns:
+        late = _dates(po_df["delivery_date"]) - _dates(po_df["promised_date"])
+        return np.ceil(late / pd.Timedelta(days=1))
+    return None
+
+def paid_mask(inv_df: pd.DataFrame):
+    """
+    Per invoice line: status is paid/cleared/settled. None if there is no status column.
+    """
+    if "status" in inv_df.columns:
+        return inv_df["status"].str.lower().isin(PAID_STATUSES)
+    return None
+
+def rate_metrics(po_records: int, on_time: int, has_delivery_dates: bool,
+                 inv_records: int, paid: int, has_status: bool) -> dict:
+    """
+    On-time delivery and invoice paid rates from running counts. A rate with no
+    lines behind it (e.g. a date window the supplier had no orders in) is
+    "N/A (No data in window)", like a rate whose columns are missing.
+    """
+    metrics = {}
+
+    if not po_records:
+        metrics["on_time_delivery_rate"] = "N/A (No data in window)"
+    elif has_delivery_dates:
+        on_time_rate = (on_time / po_records) * 100
         metrics["on_time_delivery_rate"] = round(on_time_rate, 2)
     else:
         # Fallback: If we only have "Date" (PO Date) and "Delivery Date", maybe we assume Delivery Date is Actual?
@@ -44,46 +112,115 @@ def calculate_scorecard(po_df: pd.DataFrame, inv_df: pd.DataFrame):
         # Let's just return a placeholder if we can't calculate.
         metrics["on_time_delivery_rate"] = "N/A (Missing dates)"
 
-    # Invoice Paid Rate
-    # Logic: Count of Invoices with Status 'Paid' / Total Invoices
-    if "status" in inv_df.columns:
-        paid_mask = inv_df["status"].str.lower().isin(["paid", "cleared", "settled"])
-        paid_rate = paid_mask.mean() * 100
+    if not inv_records:
+        metrics["invoice_paid_rate"] = "N/A (No data in window)"
+    elif has_status:
+        paid_rate = (paid / inv_records) * 100
         metrics["invoice_paid_rate"] = round(paid_rate, 2)
     else:
         metrics["invoice_paid_rate"] = "N/A (Missing status)"
-        
-    # Fulfillment Accuracy (Quantity Received vs Ordered)
-    # We need to merge PO and Invoice (assuming Invoice has quantity? Or PO has "Qty Received"?)
-    # If Invoice has quantity, we compare PO Qty vs Inv Qty.
-    
-    # Merge attempt
-    try:
-        merged = pd.merge(po_df, inv_df, on="po_number", how="inner", suffixes=("_po", "_inv"))
-        # If merged is empty, we can't calc.
-        if not merged.empty:
-             # Check for quantity columns
-             # We need to handle column naming after merge
-             pass
-    except Exception as e:
-        pass
 
+    return metrics
+
+def scorecard_commentary(metrics: dict, policy=None) -> str:
     # Generate Commentary
+    # Thresholds and wording come from the commentary section of the scoring policy
+    policy = policy or current_policy()
     commentary = "Supplier performance is "
-    if isinstance(metrics["on_time_delivery_rate"], (int, float)):
-        if metrics["on_time_delivery_rate"] > 90:
-            commentary += "excellent regarding delivery times. "
-        elif metrics["on_time_delivery_rate"] > 75:
-            commentary += "acceptable regarding delivery times. "
-        else:
-            commentary += "poor regarding delivery times. "
-            
-    if isinstance(metrics["invoice_paid_rate"], (int, float)):
-        if metrics["invoice_paid_rate"] > 90:
-            commentary += "Invoices are consistently paid. "
-        else:
-            commentary += "There are issues with invoice payments. "
+    for metric, ladder in policy.commentary.items():
+        value = metrics.get(metric)
+        # NaN (value != value) is as good as missing
+        if isinstance(value, (int, float)) and value == value:
+            commentary += ladder(value)
             
-    metrics["commentary"] = commentary
-    
-    return metrics
+    return commentary
+
+class ScorecardAccumulator:
+    """
+    Running counts behind the scorecard rates, plus per-PO reconciliation
+    aggregates. Chunks of PO and invoice rows are folded in one at a time, so peak
+    memory is one chunk plus one row per distinct PO regardless of file size, and
+    accumulators built from different files can be merged.
+    """
+
+    def __init__(self):
+        self.po_records = 0
+        self.inv_records = 0
+        self.on_time = 0
+        self.has_delivery_dates = False
+        self.paid = 0
+        self.has_status = False
+        self._po_aggregates = []
+        self._inv_aggregates = []
+
+    def add_po_chunk(self, po_df: pd.DataFrame):
+        self.po_records += len(po_df)
+
+        # On-Time Delivery
+        # Logic: delivery_date <= promised_date; rows with missing dates count as late
+        on_time = on_time_mask(po_df)
+        if on_time is not None:
+            self.on_time += int(on_time.sum())
+            self.has_delivery_dates = True
+
+        self._po_aggregates.append(aggregate_po_lines(po_df))
+        self._po_aggregates = self._compact(self._po_aggregates, PO_AGGREGATES)
+
+    def add_invoice_chunk(self, inv_df: pd.DataFrame):
+        self.inv_records += len(inv_df)
+
+        # Invoice Paid Rate
+        # Logic: Count of Invoices with Status 'Paid' / Total Invoices
+        paid = paid_mask(inv_df)
+        if paid is not None:
+            self.paid += int(paid.sum())
+            self.has_status = True
+
+        self._inv_aggregates.append(aggregate_invoice_lines(inv_df))
+        self._inv_aggregates = self._compact(self._inv_aggregates, INVOICE_AGGREGATES)
+
+    @staticmethod
+    def _compact(parts: list, aggregates: dict, force: bool = False) -> list:
+        parts = [part for part in parts if not part.empty]
+        if len(parts) > MAX_PENDING_AGGREGATES or (force and len(parts) > 1):
+            return [combine_aggregates(parts, aggregates)]
+        return parts
+
+    def merge(self, other: "ScorecardAccumulator") -> "ScorecardAccumulator":
+        self.po_records += other.po_records
+        self.inv_records += other.inv_records
+        self.on_time += other.on_time
+        self.has_delivery_dates = self.has_delivery_dates or other.has_delivery_dates
+        self.paid += other.paid
+        self.has_status = self.has_status or other.has_status
+        self._po_aggregates = self._compact(self._po_aggregates + other._po_aggregates, PO_AGGREGATES)
+        self._inv_aggregates = self._compact(self._inv_aggregates + other._inv_aggregates, INVOICE_AGGREGATES)
+        return self
+
+    def reconciliation(self) -> dict:
+        po_parts = self._compact(self._po_aggregates, PO_AGGREGATES, force=True)
+        inv_parts = self._compact(self._inv_aggregates, INVOICE_AGGREGATES, force=True)
+        return reconcile(
+            po_parts[0] if po_parts else empty_aggregate(PO_AGGREGATES),
+            inv_parts[0] if inv_parts else empty_aggregate(INVOICE_AGGREGATES),
+        )
+
+    def operational_metrics(self) -> dict:
+        metrics = rate_metrics(
+            self.po_records, self.on_time, self.has_delivery_dates, self.inv_records, self.paid, self.has_status
+        )
+
+        # Fulfillment Accuracy (Quantity Invoiced vs Ordered), from the reconciliation
+        reconciliation = self.reconciliation()
+        metrics["fulfillment_accuracy"] = reconciliation["quantity_match_rate"]
+        metrics["reconciliation"] = reconciliation
+
+        return metrics
+
+    def result(self, policy=None) -> dict:
+        """
+        Scorecard metrics, as calculate_scorecard would return them for all rows seen.
+        """
+        metrics = self.operational_metrics()
+        metrics["commentary"] = scorecard_commentary(metrics, policy)
+        return metrics
@@ -0,0 +1,138 @@
+import importlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# SUPPLIER_EVAL_WARMUP=0 skips the warm-up: /ready answers at once and heavy
+# dependencies are imported by the first request that needs them.
+WARMUP = os.getenv("SUPPLIER_EVAL_WARMUP", "1") != "0"
+# SUPPLIER_EVAL_PRELOAD=1 imports them while main is imported, for servers that
+# import the app once and fork their workers from it (gunicorn --preload), so
+# every worker starts with them already loaded.
+PRELOAD = os.getenv("SUPPLIER_EVAL_PRELOAD", "0") == "1"
+# Seconds the warm-up may take before the worker reports it failed
+WARMUP_TIMEOUT = float(os.getenv("SUPPLIER_EVAL_WARMUP_TIMEOUT", "120"))
+
+# Third-party modules the services import lazily (through LazyModule), in the
+# order the warm-up imports them. Importing all of them takes most of a
+# second, several times what the app itself takes to import.
+HEAVY_MODULES = (
+    "numpy", "pandas", "pyarrow", "pyarrow.dataset", "pyarrow.fs", "pyarrow.parquet", "pypdfium2", "pdfplumber", "openai",
+)
+
+
+class LazyModule:
+    """
+    Stands in for a module until one of its attributes is first read, and
+    imports it then. The module's namespace is copied in, so later reads are
+    plain attribute lookups.
+
+    Modules holding one should start with `from __future__ import annotations`
+    if their signatures are annotated with its types, or defining them would
+    import it.
+    """
+
+    def __init__(self, name: str):
+        self.__dict__["_lazy_name"] = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__dict__["_lazy_name"])
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self.__dict__['_lazy_name']!r}>"
+
+
+def preload(names) -> dict:
+    """
+    Imports the named modules; returns the seconds each took (about 0 for a
+    module that was already imported).
+    """
+    seconds = {}
+    for name in names:
+        started = time.perf_counter()
+        importlib.import_module(name)
+        seconds[name] = round(time.perf_counter() - started, 4)
+    return seconds
+
+
+class WarmUp:
+    """
+    Runs the start-up steps of a worker (imports, process pool) in background
+    threads, so the server accepts connections at once, and reports the state
+    for /ready: "warming" until every step has finished, then "ready", or
+    "failed" if a step raised or the steps took over WARMUP_TIMEOUT seconds.
+    """
+
+    def __init__(self, enabled: bool = WARMUP, timeout: float = WARMUP_TIMEOUT):
+        self.enabled = enabled
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._state = "pending"
+        self._steps = {}  # step -> seconds
+        self._details = {}  # step -> what the step returned
+        self._remaining = 0
+        self._error = None
+        self._started = None
+        self._finished = None
+
+    def start(self, steps: list):
+        """
+        Starts running `steps`, a list of (name, function) pairs, side by side:
+        the process pool's workers start while this process imports. Without
+        warm-up the worker is ready at once.
+        """
+        with self._lock:
+            if self._state != "pending":
+                return
+            self._started = time.monotonic()
+            if not self.enabled or not steps:
+                self._done()
+                return
+            self._state = "warming"
+            self._remaining = len(steps)
+        for name, step in steps:
+            threading.Thread(target=self._run, args=(name, step), name=f"supplier-eval-warmup-{name}", daemon=True).start()
+
+    def _run(self, name: str, step):
+        started = time.perf_counter()
+        try:
+            result = step()
+        except Exception as error:
+            logger.exception("Warm-up step %s failed", name)
+            with self._lock:
+                self._state, self._error = "failed", f"{name}: {error}"
+                self._finished = time.monotonic()
+            return
+        with self._lock:
+            self._steps[name] = round(time.perf_counter() - started, 4)
+            if result is not None:
+                self._details[name] = result
+            self._remaining -= 1
+            if self._remaining == 0 and self._state == "warming":
+                self._done()
+
+    def _done(self):
+        self._state = "ready"
+        self._finished = time.monotonic()
+
+    def status(self) -> dict:
+        with self._lock:
+            state, error = self._state, self._error
+            if state == "warming" and time.monotonic() - self._started > self.timeout:
+                state, error = "failed", f"warm-up took over {self.timeout:g} seconds"
+            end = self._finished if self._finished is not None else time.monotonic()
+            return {
+                "state": state,
+                "seconds": round(end - self._started, 4) if self._started is not None else None,
+                "steps": dict(self._steps),
+                "details": dict(self._details),
+                "error": error,
+            }
+
+
+warm_up = WarmUp()
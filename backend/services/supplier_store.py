@@ -0,0 +1,781 @@
+from __future__ import annotations
+
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from services.reconciliation import normalize_key
+from services.scorecard import lateness_days, on_time_mask, paid_mask, rate_metrics, scorecard_commentary
+from services.startup import LazyModule
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+# Persisted per-supplier scorecard state, so a week of new PO/invoice rows is
+# folded into what is already known instead of re-scoring the full history.
+#
+# Every PO line (po_number, sku) and invoice line (invoice_number, sku) is kept
+# once per supplier; a key repeated within one upload (two deliveries of a SKU
+# on one PO) is numbered, each repeat its own line. An upload is staged, compared against the stored lines in
+# SQL, and only new or changed lines move the supplier's running counts, so a
+# re-uploaded file is never double counted and a corrected line replaces the old
+# one. Reconciliation sums are maintained the same way: only the POs an upload
+# touches are re-reconciled, and their contribution before the upload is swapped
+# for their contribution after it. Reading a scorecard never touches the lines.
+#
+# The same deltas keep a performance cube per supplier x SKU x month (of the PO
+# or invoice date): PO lines, on-time and dated lines, the distribution of days
+# late, and invoice lines by paid/pending, so any slice or rolling window of a
+# supplier's delivery and payment performance is read from the cube alone.
+STORE_PATH = os.getenv(
+    "SUPPLIER_EVAL_SUPPLIER_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "suppliers.sqlite3"),
+)
+
+# Per line table: key columns (the last numbering repeats of the others within
+# an upload), value columns, the 0/1 flag behind a rate, the
+# supplier counters it feeds (lines, flagged lines, lines where the flag is
+# known, lines with a SKU), the performance cube measures it feeds (lines,
+# flagged lines, lines where the flag is known) and the value binned into the
+# cube's lateness distribution.
+LINE_TABLES = {
+    "po": {
+        "table": "po_lines",
+        "keys": ["po_number", "sku", "line"],
+        "values": ["quantity", "amount", "date", "on_time", "late_days"],
+        "flag": "on_time",
+        "counters": ("po_records", "on_time", "dated_records", "po_sku_records"),
+        "cube": ("po_lines", "on_time", "dated_lines"),
+        "distribution": "late_days",
+    },
+    "invoice": {
+        "table": "invoice_lines",
+        "keys": ["invoice_number", "sku", "line"],
+        "values": ["po_number", "quantity", "amount", "date", "paid"],
+        "flag": "paid",
+        "counters": ("inv_records", "paid", "status_records", "inv_sku_records"),
+        "cube": ("invoice_lines", "paid", "status_lines"),
+        "distribution": None,
+    },
+}
+COUNTERS = [counter for spec in LINE_TABLES.values() for counter in spec["counters"]]
+CUBE_MEASURES = [measure for spec in LINE_TABLES.values() for measure in spec["cube"]]
+# Dimensions a performance slice can be grouped by
+CUBE_DIMENSIONS = ("sku", "month")
+
+# Cube levels and the SKU their cells are stored under: per SKU, and every
+# SKU of the supplier rolled up, so unsliced series read one cell per month
+CUBE_LEVELS = {"sku": "sku", "all": "''"}
+
+# A line's cube month, from its epoch-seconds date; "" when it has none
+CUBE_MONTH = "COALESCE(strftime('%Y-%m', {}.date, 'unixepoch'), '')"
+
+# Bins of the lateness distribution in performance slices: (label, first day,
+# last day) of days delivered after the promised date
+LATENESS_BUCKETS = [
+    ("early", None, -1), ("on_day", 0, 0), ("1-3", 1, 3), ("4-7", 4, 7),
+    ("8-14", 8, 14), ("15-30", 15, 30), ("over_30", 31, None),
+]
+
+# Reconciliation sums per supplier and match level: "sku" matches on
+# po_number + sku, "po" on po_number alone (used when one side has no SKUs).
+MATCH_LEVELS = {"sku": ["po_number", "sku"], "po": ["po_number"]}
+RECONCILIATION_SUMS = [
+    "ordered_pos", "matched_keys", "matched_pos", "matched_invoice_lines",
+    "qty_pairs", "qty_matches", "amount_pairs", "po_amount", "invoiced_amount", "lag_count", "lag_sum",
+]
+
+# SQLite primary keys allow any number of NULLs, so a missing SKU is stored as ""
+NO_SKU = ""
+
+SECONDS_PER_DAY = 86_400
+
+
+def _keys(df: pd.DataFrame, column: str) -> np.ndarray:
+    # Normalized like the reconciliation keys (123, 123.0 and "123 " are one PO)
+    if column not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    labels = np.asarray(normalize_key(df[column]).astype(object), dtype=object)
+    missing = pd.isna(labels) | (labels == "")
+    labels[missing] = None
+    return labels
+
+
+def _numbers(df: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    values = pd.to_numeric(df[column], errors="coerce").astype(object)
+    return values.where(values.notna(), None).to_numpy()
+
+
+def _timestamps(df: pd.DataFrame, column: str) -> np.ndarray:
+    # Stored as epoch seconds
+    if column not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    dates = pd.to_datetime(df[column], errors="coerce")
+    values = (dates.to_numpy(dtype="datetime64[ns]").view("int64") // 10**9).astype(object)
+    values[dates.isna().to_numpy()] = None
+    return values
+
+
+def _flags(mask, length: int) -> np.ndarray:
+    if mask is None:
+        return np.full(length, None, dtype=object)
+    return mask.to_numpy(dtype="int64").astype(object)
+
+
+def _days(days, length: int) -> np.ndarray:
+    if days is None:
+        return np.full(length, None, dtype=object)
+    values = days.to_numpy(dtype="float64")
+    result = np.full(length, None, dtype=object)
+    known = ~np.isnan(values)
+    result[known] = values[known].astype("int64").astype(object)
+    return result
+
+
+def po_lines(po_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parsed PO rows as store lines; see LINE_TABLES["po"].
+    """
+    return pd.DataFrame({
+        "po_number": _keys(po_df, "po_number"),
+        "sku": _keys(po_df, "sku"),
+        "quantity": _numbers(po_df, "quantity"),
+        "amount": _numbers(po_df, "amount"),
+        "date": _timestamps(po_df, "date"),
+        "on_time": _flags(on_time_mask(po_df), len(po_df)),
+        "late_days": _days(lateness_days(po_df), len(po_df)),
+    })
+
+
+def invoice_lines(inv_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parsed invoice rows as store lines; see LINE_TABLES["invoice"].
+    """
+    return pd.DataFrame({
+        "invoice_number": _keys(inv_df, "invoice_number"),
+        "sku": _keys(inv_df, "sku"),
+        "po_number": _keys(inv_df, "po_number"),
+        "quantity": _numbers(inv_df, "quantity"),
+        "amount": _numbers(inv_df, "amount"),
+        "date": _timestamps(inv_df, "date"),
+        "paid": _flags(paid_mask(inv_df), len(inv_df)),
+    })
+
+
+def _rollup(agg: pd.DataFrame, sums: list, mins: list) -> pd.DataFrame:
+    """
+    Drops the SKU level, for matching on po_number alone.
+    """
+    grouped = agg.groupby("po_number", sort=False)
+    # min_count=1 keeps a sum over only-missing values missing, as in the reconciliation
+    rolled = grouped[sums].sum(min_count=1)
+    for column in mins:
+        rolled[column] = grouped[column].min()
+    return rolled.reset_index()
+
+
+def _match(po_agg: pd.DataFrame, inv_agg: pd.DataFrame, keys: list):
+    """
+    Reconciliation sums and lag-day counts over the given pre-aggregated keys,
+    matched the way services.reconciliation.reconcile matches them.
+    """
+    matched = po_agg.merge(inv_agg, on=keys)
+    qty = matched[["ordered_qty", "invoiced_qty"]].dropna()
+    amounts = matched[["po_amount", "invoiced_amount"]].dropna()
+    lag = np.floor_divide((matched["invoice_date"] - matched["po_date"]).dropna(), SECONDS_PER_DAY)
+    sums = {
+        "ordered_pos": po_agg["po_number"].nunique(),
+        "matched_keys": len(matched),
+        "matched_pos": matched["po_number"].nunique(),
+        "matched_invoice_lines": matched["invoice_lines"].sum(),
+        "qty_pairs": len(qty),
+        "qty_matches": np.isclose(qty["invoiced_qty"].to_numpy(), qty["ordered_qty"].to_numpy()).sum(),
+        "amount_pairs": len(amounts),
+        "po_amount": amounts["po_amount"].sum(),
+        "invoiced_amount": amounts["invoiced_amount"].sum(),
+        "lag_count": len(lag),
+        "lag_sum": lag.sum(),
+    }
+    return {name: value.item() if hasattr(value, "item") else value for name, value in sums.items()}, \
+        lag.astype("int64").value_counts()
+
+
+def _ranked(days: np.ndarray, cumulative: np.ndarray, positions: list) -> np.ndarray:
+    # Values at the given positions of the sorted lags the histogram stands for
+    return days[np.searchsorted(cumulative, positions, side="right")].astype("float64")
+
+
+def _median(days: np.ndarray, counts: np.ndarray) -> float:
+    cumulative = np.cumsum(counts)
+    total = int(cumulative[-1])
+    return float(np.median(_ranked(days, cumulative, [(total - 1) // 2, total // 2])))
+
+
+def _quantile(days: np.ndarray, counts: np.ndarray, q: float) -> float:
+    # np.quantile's default (linear) method, including its interpolation formula
+    cumulative = np.cumsum(counts)
+    index = (int(cumulative[-1]) - 1) * q
+    below = math.floor(index)
+    a, b = _ranked(days, cumulative, [below, min(below + 1, int(cumulative[-1]) - 1)])
+    t = index - below
+    return float(b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t)
+
+
+def _cube_lines(alias: str, supplier: str, sign: int, spec: dict) -> str:
+    # The SELECT list of lines for SupplierStore._add_to_cube
+    distribution = f"{alias}.{spec['distribution']}" if spec["distribution"] else "NULL"
+    return (
+        f"SELECT {supplier} AS supplier, {alias}.sku AS sku, {CUBE_MONTH.format(alias)} AS month, {sign} AS sign, "
+        f"{alias}.{spec['flag']} AS flag, {distribution} AS value"
+    )
+
+
+def _lateness(days: np.ndarray, counts: np.ndarray) -> dict:
+    """
+    Summary of a lateness distribution: days late, ascending, and the number
+    of lines late by each.
+    """
+    total = int(counts.sum())
+    buckets = {}
+    for label, first, last in LATENESS_BUCKETS:
+        inside = np.ones(len(days), dtype=bool)
+        if first is not None:
+            inside &= days >= first
+        if last is not None:
+            inside &= days <= last
+        buckets[label] = int(counts[inside].sum())
+    return {
+        "lines": total,
+        "mean": round(float((days * counts).sum()) / total, 2),
+        "median": _median(days, counts),
+        "p90": _quantile(days, counts, 0.9),
+        "max": int(days[-1]),
+        "buckets": buckets,
+    }
+
+
+def _trailing(df: pd.DataFrame, months: int) -> pd.DataFrame:
+    # Every row repeated into each of the `months` months whose trailing window
+    # holds it, so grouping by month sums rolling windows
+    periods = {month: pd.Period(month, freq="M") for month in df["month"].unique()}
+    return pd.concat([
+        df.assign(month=df["month"].map({month: str(period + shift) for month, period in periods.items()}))
+        for shift in range(months)
+    ], ignore_index=True)
+
+
+def _reconciliation_metrics(counts: dict, sums: dict, lags: pd.Series, by_sku: bool) -> dict:
+    """
+    The reconcile() result, from stored sums instead of lines.
+    """
+    if not counts["po_records"] or not counts["inv_records"]:
+        return {
+            "matched_pos": 0,
+            "matched_on": "N/A",
+            "unmatched_pos": sums["ordered_pos"],
+            "unmatched_invoices": counts["inv_records"],
+            "quantity_match_rate": "N/A (No matching records)",
+            "amount_variance": "N/A (No matching records)",
+            "amount_variance_pct": "N/A (No matching records)",
+            "po_to_invoice_lag_days": "N/A (No matching records)",
+        }
+
+    metrics = {
+        "matched_pos": sums["matched_pos"],
+        "unmatched_pos": sums["ordered_pos"] - sums["matched_pos"],
+        "unmatched_invoices": counts["inv_records"] - sums["matched_invoice_lines"],
+        "matched_on": "po_number+sku" if by_sku else "po_number",
+    }
+    if sums["qty_pairs"]:
+        metrics["quantity_match_rate"] = round(sums["qty_matches"] / sums["qty_pairs"] * 100, 2)
+    else:
+        metrics["quantity_match_rate"] = "N/A (Missing quantities)"
+
+    if sums["amount_pairs"]:
+        variance = float(sums["invoiced_amount"] - sums["po_amount"])
+        ordered = float(sums["po_amount"])
+        metrics["amount_variance"] = round(variance, 2)
+        metrics["amount_variance_pct"] = round(variance / ordered * 100, 2) if ordered else "N/A (Zero PO amount)"
+    else:
+        metrics["amount_variance"] = "N/A (Missing PO amounts)"
+        metrics["amount_variance_pct"] = "N/A (Missing PO amounts)"
+
+    if sums["lag_count"]:
+        days, lag_counts = lags.index.to_numpy(), lags.to_numpy()
+        metrics["po_to_invoice_lag_days"] = {
+            "mean": round(sums["lag_sum"] / sums["lag_count"], 2),
+            "median": _median(days, lag_counts),
+            "p90": _quantile(days, lag_counts, 0.9),
+        }
+    else:
+        metrics["po_to_invoice_lag_days"] = "N/A (Missing dates)"
+    return metrics
+
+
+def _line_table(spec: dict, name: str) -> str:
+    columns = spec["keys"] + spec["values"]
+    return (
+        f"CREATE TABLE IF NOT EXISTS {name} (supplier, {', '.join(columns)}, "
+        f"PRIMARY KEY (supplier, {', '.join(spec['keys'])})) WITHOUT ROWID"
+    )
+
+
+def _number_stored_lines(db, spec: dict, stored: set):
+    """
+    Stores from before repeated keys were numbered hold one line per key:
+    their line table is rebuilt with the `line` key, every line as line 0.
+    """
+    table = spec["table"]
+    copied = [column for column in ["supplier"] + spec["keys"] + spec["values"] if column in stored]
+    db.execute("BEGIN")
+    db.execute(f"ALTER TABLE {table} RENAME TO old_{table}")
+    db.execute(_line_table(spec, table))
+    db.execute(f"INSERT INTO {table} ({', '.join(copied)}, line) SELECT {', '.join(copied)}, 0 FROM old_{table}")
+    db.execute(f"DROP TABLE old_{table}")
+    db.commit()
+
+
+class SupplierStore:
+    """
+    SQLite-backed per-supplier aggregates. fold() merges parsed PO/invoice rows
+    in by delta; scorecard() and performance() read the result without
+    touching the lines.
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS suppliers (supplier TEXT PRIMARY KEY, "
+                + ", ".join(f"{counter} INTEGER NOT NULL DEFAULT 0" for counter in COUNTERS)
+                + ", updated_at REAL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS reconciliation_sums (supplier TEXT, level TEXT, "
+                + ", ".join(f"{name} NOT NULL DEFAULT 0" for name in RECONCILIATION_SUMS)
+                + ", PRIMARY KEY (supplier, level)) WITHOUT ROWID"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS lag_days (supplier TEXT, level TEXT, days INTEGER, lines INTEGER, "
+                "PRIMARY KEY (supplier, level, days)) WITHOUT ROWID"
+            )
+            new_cube = db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'performance_cube'"
+            ).fetchone() is None
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS performance_cube (supplier TEXT, level TEXT, sku TEXT, month TEXT, "
+                + ", ".join(f"{measure} INTEGER NOT NULL DEFAULT 0" for measure in CUBE_MEASURES)
+                + ", PRIMARY KEY (supplier, level, sku, month)) WITHOUT ROWID"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS lateness_days (supplier TEXT, level TEXT, sku TEXT, month TEXT, "
+                "days INTEGER, lines INTEGER, PRIMARY KEY (supplier, level, sku, month, days)) WITHOUT ROWID"
+            )
+            for spec in LINE_TABLES.values():
+                columns = spec["keys"] + spec["values"]
+                stored = {row[1] for row in db.execute(f"PRAGMA table_info({spec['table']})")}
+                if stored and "line" not in stored:
+                    _number_stored_lines(db, spec, stored)
+                db.execute(_line_table(spec, spec["table"]))
+                # Stores from before a value column existed get it, empty on their lines
+                stored = {row[1] for row in db.execute(f"PRAGMA table_info({spec['table']})")}
+                for column in spec["values"]:
+                    if column not in stored:
+                        db.execute(f"ALTER TABLE {spec['table']} ADD COLUMN {column}")
+                db.execute(
+                    f"CREATE TEMP TABLE IF NOT EXISTS staged_{spec['table']} ({', '.join(columns)}, "
+                    f"PRIMARY KEY ({', '.join(spec['keys'])})) WITHOUT ROWID"
+                )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS invoice_lines_po ON invoice_lines (supplier, po_number)"
+            )
+            db.execute("CREATE TEMP TABLE IF NOT EXISTS affected_pos (po_number PRIMARY KEY) WITHOUT ROWID")
+            db.execute("CREATE TEMP TABLE IF NOT EXISTS cube_lines (supplier, sku, month, sign, flag, value)")
+            if new_cube:
+                # Lines stored before the cube existed; their days late are
+                # unknown until they are uploaded again
+                with db:
+                    for spec in LINE_TABLES.values():
+                        self._add_to_cube(db, spec, _cube_lines("l", "l.supplier", 1, spec) + f" FROM {spec['table']} l")
+            self._db = db
+        return self._db
+
+    def fold(self, supplier: str, po_df: pd.DataFrame = None, inv_df: pd.DataFrame = None) -> dict:
+        """
+        Merges parsed PO and invoice rows into the supplier's aggregates and
+        returns per side how many rows were inserted, updated, unchanged
+        (already stored), or skipped for lack of a PO/invoice number.
+        """
+        uploads = {
+            "po": po_lines(po_df if po_df is not None else pd.DataFrame()),
+            "invoice": invoice_lines(inv_df if inv_df is not None else pd.DataFrame()),
+        }
+
+        with self._lock:
+            db = self._connection()
+            with db:
+                db.execute("INSERT OR IGNORE INTO suppliers (supplier) VALUES (?)", (supplier,))
+                summary = {}
+                for side, lines in uploads.items():
+                    summary[side] = self._stage(db, supplier, LINE_TABLES[side], lines)
+                # A re-upload of stored lines ends here, without touching the aggregates
+                if any(result["inserted"] or result["updated"] for result in summary.values()):
+                    self._stage_affected_pos(db, supplier)
+                    before = self._affected_reconciliation(db, supplier)
+                    for side in uploads:
+                        self._apply(db, supplier, LINE_TABLES[side])
+                    db.execute(
+                        "DELETE FROM performance_cube WHERE supplier = ? AND "
+                        + " AND ".join(f"{spec['cube'][0]} = 0" for spec in LINE_TABLES.values()),
+                        (supplier,),
+                    )
+                    db.execute("DELETE FROM lateness_days WHERE supplier = ? AND lines = 0", (supplier,))
+                    self._apply_reconciliation(db, supplier, before, self._affected_reconciliation(db, supplier))
+                    db.execute("UPDATE suppliers SET updated_at = ? WHERE supplier = ?", (time.time(), supplier))
+
+        return {
+            side: {name: result[name] for name in ("inserted", "updated", "unchanged", "skipped")}
+            for side, result in summary.items()
+            if (po_df if side == "po" else inv_df) is not None
+        }
+
+    def _stage(self, db, supplier: str, spec: dict, lines: pd.DataFrame) -> dict:
+        """
+        Loads the upload's lines into the staging table and drops those already
+        stored as they are, leaving only new and changed lines.
+        """
+        table, staged, keys, values = spec["table"], f"staged_{spec['table']}", spec["keys"], spec["values"]
+        keyed = lines[lines[keys[0]].notna()].copy()
+        keyed["sku"] = keyed["sku"].where(keyed["sku"].notna(), NO_SKU)
+        # Repeats of a key within the upload are distinct lines, numbered in file
+        # order, so the same file uploaded again lines up with the stored lines
+        keyed["line"] = keyed.groupby(keys[:-1], sort=False).cumcount()
+        keyed = keyed[keys + values]
+
+        db.execute(f"DELETE FROM {staged}")
+        db.executemany(
+            f"INSERT INTO {staged} VALUES ({', '.join('?' * len(keyed.columns))})",
+            keyed.itertuples(index=False, name=None),
+        )
+        unchanged = db.execute(
+            f"DELETE FROM {staged} WHERE EXISTS (SELECT 1 FROM {table} l WHERE l.supplier = ? AND "
+            + " AND ".join(f"l.{k} = {staged}.{k}" for k in keys) + " AND "
+            + " AND ".join(f"l.{v} IS {staged}.{v}" for v in values) + ")",
+            (supplier,),
+        ).rowcount
+        updated = db.execute(
+            f"SELECT COUNT(*) FROM {staged} s JOIN {table} l ON l.supplier = ? AND "
+            + " AND ".join(f"l.{k} = s.{k}" for k in keys),
+            (supplier,),
+        ).fetchone()[0]
+        return {
+            "inserted": len(keyed) - unchanged - updated,
+            "updated": updated,
+            "unchanged": unchanged,
+            "skipped": len(lines) - len(keyed),
+        }
+
+    def _stage_affected_pos(self, db, supplier: str):
+        # POs whose reconciliation may change: those on new or changed lines, and
+        # those that changed invoice lines pointed at before
+        db.execute("DELETE FROM affected_pos")
+        db.execute("INSERT OR IGNORE INTO affected_pos SELECT po_number FROM staged_po_lines")
+        db.execute(
+            "INSERT OR IGNORE INTO affected_pos SELECT po_number FROM staged_invoice_lines WHERE po_number IS NOT NULL"
+        )
+        db.execute(
+            "INSERT OR IGNORE INTO affected_pos SELECT l.po_number FROM staged_invoice_lines s "
+            "JOIN invoice_lines l ON l.supplier = ? AND l.invoice_number = s.invoice_number AND l.sku = s.sku "
+            "AND l.line = s.line "
+            "WHERE l.po_number IS NOT NULL",
+            (supplier,),
+        )
+
+    def _apply(self, db, supplier: str, spec: dict):
+        """
+        Writes the staged (new and changed) lines and moves the supplier's
+        counters and performance cube by their difference to the lines they
+        replace.
+        """
+        table, staged, keys, values, flag = (
+            spec["table"], f"staged_{spec['table']}", spec["keys"], spec["values"], spec["flag"]
+        )
+        join = f"{staged} s LEFT JOIN {table} l ON l.supplier = ? AND " + " AND ".join(f"l.{k} = s.{k}" for k in keys)
+        new = f"l.{keys[0]} IS NULL"
+        deltas = db.execute(
+            f"SELECT COALESCE(SUM({new}), 0), "
+            # Replaced lines give back what they contributed before
+            f"COALESCE(SUM(COALESCE(s.{flag}, 0) - COALESCE(l.{flag}, 0)), 0), "
+            f"COALESCE(SUM((s.{flag} IS NOT NULL) - (l.{flag} IS NOT NULL)), 0), "
+            f"COALESCE(SUM({new} AND s.sku != ''), 0) "
+            f"FROM {join}",
+            (supplier,),
+        ).fetchone()
+        self._add_to_cube(
+            db, spec,
+            _cube_lines("s", "?", 1, spec) + f" FROM {staged} s UNION ALL "
+            + _cube_lines("l", "l.supplier", -1, spec)
+            + f" FROM {staged} s JOIN {table} l ON l.supplier = ? AND " + " AND ".join(f"l.{k} = s.{k}" for k in keys),
+            (supplier, supplier),
+        )
+        db.execute(
+            f"INSERT OR REPLACE INTO {table} (supplier, {', '.join(keys + values)}) "
+            f"SELECT ?, {', '.join(keys + values)} FROM {staged}",
+            (supplier,),
+        )
+        db.execute(
+            "UPDATE suppliers SET "
+            + ", ".join(f"{counter} = {counter} + ?" for counter in spec["counters"])
+            + " WHERE supplier = ?",
+            (*deltas, supplier),
+        )
+
+    def _add_to_cube(self, db, spec: dict, lines: str, params: tuple = ()):
+        """
+        Adds lines to (or takes them out of) the performance cube. `lines`
+        selects per line the columns supplier, sku, month, sign (1 to add the
+        line, -1 to take it out), flag and value (of the distribution).
+        """
+        # Selected once: every level is rolled up from the same lines
+        db.execute("DELETE FROM cube_lines")
+        db.execute(f"INSERT INTO cube_lines {lines}", params)
+        measures = spec["cube"]
+        for level, sku in CUBE_LEVELS.items():
+            db.execute(
+                f"INSERT INTO performance_cube (supplier, level, sku, month, {', '.join(measures)}) "
+                f"SELECT supplier, '{level}', {sku}, month, SUM(sign), SUM(sign * COALESCE(flag, 0)), "
+                f"SUM(sign * (flag IS NOT NULL)) FROM cube_lines GROUP BY supplier, {sku}, month "
+                "ON CONFLICT (supplier, level, sku, month) DO UPDATE SET "
+                + ", ".join(f"{measure} = {measure} + excluded.{measure}" for measure in measures)
+            )
+            if spec["distribution"]:
+                db.execute(
+                    "INSERT INTO lateness_days (supplier, level, sku, month, days, lines) "
+                    f"SELECT supplier, '{level}', {sku}, month, value, SUM(sign) FROM cube_lines "
+                    f"WHERE value IS NOT NULL GROUP BY supplier, {sku}, month, value "
+                    "ON CONFLICT (supplier, level, sku, month, days) DO UPDATE SET lines = lines + excluded.lines"
+                )
+
+    def _affected_reconciliation(self, db, supplier: str) -> dict:
+        """
+        Reconciliation sums and lag counts of the affected POs, per match level.
+        """
+        po_agg = pd.read_sql_query(
+            "SELECT po_number, sku, SUM(quantity) AS ordered_qty, SUM(amount) AS po_amount, MIN(date) AS po_date "
+            "FROM po_lines WHERE supplier = ? AND po_number IN (SELECT po_number FROM affected_pos) "
+            "GROUP BY po_number, sku",
+            db, params=(supplier,),
+        )
+        inv_agg = pd.read_sql_query(
+            "SELECT po_number, sku, SUM(quantity) AS invoiced_qty, SUM(amount) AS invoiced_amount, "
+            "MIN(date) AS invoice_date, COUNT(*) AS invoice_lines "
+            "FROM invoice_lines WHERE supplier = ? AND po_number IN (SELECT po_number FROM affected_pos) "
+            "GROUP BY po_number, sku",
+            db, params=(supplier,),
+        )
+        # Typed even when no rows come back; dates are epoch seconds, exact as floats
+        po_agg = po_agg.astype({"ordered_qty": "float64", "po_amount": "float64", "po_date": "float64"})
+        inv_agg = inv_agg.astype({
+            "invoiced_qty": "float64", "invoiced_amount": "float64", "invoice_date": "float64", "invoice_lines": "int64"
+        })
+        return {
+            "sku": _match(po_agg, inv_agg, MATCH_LEVELS["sku"]),
+            "po": _match(
+                _rollup(po_agg, ["ordered_qty", "po_amount"], ["po_date"]),
+                _rollup(inv_agg, ["invoiced_qty", "invoiced_amount", "invoice_lines"], ["invoice_date"]),
+                MATCH_LEVELS["po"],
+            ),
+        }
+
+    def _apply_reconciliation(self, db, supplier: str, before: dict, after: dict):
+        for level in MATCH_LEVELS:
+            (sums_before, lags_before), (sums_after, lags_after) = before[level], after[level]
+            deltas = [sums_after[name] - sums_before[name] for name in RECONCILIATION_SUMS]
+            db.execute(
+                f"INSERT INTO reconciliation_sums (supplier, level, {', '.join(RECONCILIATION_SUMS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(RECONCILIATION_SUMS))}) "
+                "ON CONFLICT (supplier, level) DO UPDATE SET "
+                + ", ".join(f"{name} = {name} + excluded.{name}" for name in RECONCILIATION_SUMS),
+                (supplier, level, *deltas),
+            )
+            lag_deltas = lags_after.sub(lags_before, fill_value=0)
+            db.executemany(
+                "INSERT INTO lag_days VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (supplier, level, days) DO UPDATE SET lines = lines + excluded.lines",
+                ((supplier, level, int(days), int(lines)) for days, lines in lag_deltas[lag_deltas != 0].items()),
+            )
+        db.execute("DELETE FROM lag_days WHERE supplier = ? AND lines = 0", (supplier,))
+
+    def scorecard(self, supplier: str, policy=None):
+        """
+        Scorecard metrics, as calculate_scorecard would return them for every
+        stored line of the supplier, or None for an unknown supplier.
+        """
+        with self._lock:
+            db = self._connection()
+            row = db.execute(f"SELECT {', '.join(COUNTERS)} FROM suppliers WHERE supplier = ?", (supplier,)).fetchone()
+            if row is None:
+                return None
+            counts = dict(zip(COUNTERS, row))
+            level = "sku" if counts["po_sku_records"] and counts["inv_sku_records"] else "po"
+            sums = db.execute(
+                f"SELECT {', '.join(RECONCILIATION_SUMS)} FROM reconciliation_sums WHERE supplier = ? AND level = ?",
+                (supplier, level),
+            ).fetchone()
+            lags = db.execute(
+                "SELECT days, lines FROM lag_days WHERE supplier = ? AND level = ? ORDER BY days", (supplier, level)
+            ).fetchall()
+
+        metrics = rate_metrics(
+            counts["po_records"], counts["on_time"], counts["dated_records"] > 0,
+            counts["inv_records"], counts["paid"], counts["status_records"] > 0,
+        )
+        reconciliation = _reconciliation_metrics(
+            counts,
+            dict(zip(RECONCILIATION_SUMS, sums or [0] * len(RECONCILIATION_SUMS))),
+            pd.Series(dict(lags), dtype="int64"),
+            by_sku=level == "sku",
+        )
+        metrics["fulfillment_accuracy"] = reconciliation["quantity_match_rate"]
+        metrics["reconciliation"] = reconciliation
+        metrics["commentary"] = scorecard_commentary(metrics, policy)
+        return metrics
+
+    def performance(self, supplier: str, group_by=("month",), skus: list = None,
+                    start=None, end=None, rolling: int = None):
+        """
+        Delivery and payment performance per group of the performance cube:
+        `group_by` is any of CUBE_DIMENSIONS (none for totals), `skus` limits
+        it to some SKUs and `start`/`end` to the months from `start` to `end`
+        (both included; lines without a date only count when neither is
+        given). With `rolling`, each month sums the trailing `rolling` months.
+        Read from the cube alone, never the lines. None for an unknown supplier.
+        """
+        group_by = list(dict.fromkeys(group_by))
+        unknown = [dimension for dimension in group_by if dimension not in CUBE_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(unknown)}; choose from {', '.join(CUBE_DIMENSIONS)}")
+        if rolling is not None and (rolling < 1 or "month" not in group_by):
+            raise ValueError("A rolling window needs a positive number of months and grouping by month")
+        start = pd.Period(start, freq="M") if start is not None else None
+        end = pd.Period(end, freq="M") if end is not None else None
+
+        # Unsliced by SKU, the rolled-up cells hold the same sums in far fewer rows
+        level = "sku" if skus or "sku" in group_by else "all"
+        where, params = ["supplier = ?", "level = ?"], [supplier, level]
+        if skus:
+            labels = _keys(pd.DataFrame({"sku": skus}), "sku")
+            where.append(f"sku IN ({', '.join('?' * len(labels))})")
+            params += [NO_SKU if label is None else label for label in labels]
+        if start is not None or rolling:
+            # Months before `start` still count towards its rolling windows
+            where.append("month >= ?")
+            params.append(str(start - (rolling or 1) + 1) if start is not None else "0000-00")
+        if end is not None:
+            where.append("month != '' AND month <= ?")
+            params.append(str(end))
+
+        with self._lock:
+            db = self._connection()
+            if db.execute("SELECT 1 FROM suppliers WHERE supplier = ?", (supplier,)).fetchone() is None:
+                return None
+            # Rolled up to the requested grain in SQL; a constant key stands in
+            # for "no grouping", so totals take the same path
+            keys = group_by or ["total"]
+            dimensions = ", ".join(group_by or ["'' AS total"])
+            condition = " AND ".join(where)
+            cells = pd.read_sql_query(
+                f"SELECT {dimensions}, {', '.join(f'SUM({measure}) AS {measure}' for measure in CUBE_MEASURES)} "
+                f"FROM performance_cube WHERE {condition} GROUP BY {', '.join(keys)}",
+                db, params=params,
+            )
+            late = pd.read_sql_query(
+                f"SELECT {dimensions}, days, SUM(lines) AS lines FROM lateness_days WHERE {condition} "
+                f"GROUP BY {', '.join(keys)}, days",
+                db, params=params,
+            )
+
+        if rolling and len(cells):
+            first = str(start) if start is not None else cells["month"].min()
+            last = cells["month"].max()
+            cells, late = _trailing(cells, rolling), _trailing(late, rolling)
+            cells = cells[(cells["month"] >= first) & (cells["month"] <= last)]
+            late = late[(late["month"] >= first) & (late["month"] <= last)]
+
+        totals = cells.groupby(keys, sort=True)[CUBE_MEASURES].sum()
+        distribution = late.groupby(keys + ["days"], sort=True)["lines"].sum()
+        # Each group's days are one sorted run of the distribution
+        runs = {}
+        if len(distribution):
+            codes, groups = distribution.index.droplevel("days").factorize()
+            bounds = np.flatnonzero(np.diff(codes)) + 1
+            runs = {
+                group if isinstance(group, tuple) else (group,): slice(first, last)
+                for group, first, last in zip(groups, np.r_[0, bounds], np.r_[bounds, len(codes)])
+            }
+        days, day_counts = distribution.index.get_level_values("days").to_numpy(), distribution.to_numpy()
+
+        rows = []
+        for group, measures in zip(totals.index, totals.to_numpy(dtype="int64")):
+            group = group if isinstance(group, tuple) else (group,)
+            row = {dimension: value or None for dimension, value in zip(group_by, group)}
+            counts = dict(zip(CUBE_MEASURES, measures.tolist()))
+            row.update({
+                "po_lines": counts["po_lines"],
+                "on_time": counts["on_time"],
+                "invoice_lines": counts["invoice_lines"],
+                "paid": counts["paid"],
+                "pending": counts["status_lines"] - counts["paid"],
+            })
+            row.update(rate_metrics(
+                counts["po_lines"], counts["on_time"], counts["dated_lines"] > 0,
+                counts["invoice_lines"], counts["paid"], counts["status_lines"] > 0,
+            ))
+            run = runs.get(group)
+            if run is not None and day_counts[run].sum() > 0:
+                row["lateness_days"] = _lateness(days[run], day_counts[run])
+            else:
+                row["lateness_days"] = "N/A (Missing dates)"
+            rows.append(row)
+        return rows
+
+    def known(self, supplier: str) -> bool:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT 1 FROM suppliers WHERE supplier = ?", (supplier,)
+            ).fetchone() is not None
+
+    def suppliers(self) -> list:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT supplier, po_records, inv_records, updated_at FROM suppliers ORDER BY supplier"
+            ).fetchall()
+        return [
+            {"supplier": supplier, "po_records": po_records, "inv_records": inv_records, "updated_at": updated_at}
+            for supplier, po_records, inv_records, updated_at in rows
+        ]
+
+    def delete(self, supplier: str) -> bool:
+        with self._lock:
+            db = self._connection()
+            with db:
+                for table in [spec["table"] for spec in LINE_TABLES.values()] + [
+                    "reconciliation_sums", "lag_days", "performance_cube", "lateness_days"
+                ]:
+                    db.execute(f"DELETE FROM {table} WHERE supplier = ?", (supplier,))
+                return db.execute("DELETE FROM suppliers WHERE supplier = ?", (supplier,)).rowcount > 0
+
+
+supplier_store = SupplierStore()
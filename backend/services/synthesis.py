@@ -1,105 +1,75 @@
-def calculate_overall_score(scorecard_metrics: dict, financial_ratios: dict):
+from services.policy import current_policy
+
+def _is_number(value) -> bool:
+    """
+    True for int/float metric values. NaN (e.g. the on-time rate of a supplier
+    with no PO lines) counts as missing, like the "N/A (...)" strings.
+    """
+    return isinstance(value, (int, float)) and value == value
+
+def calculate_overall_score(scorecard_metrics: dict, financial_ratios: dict, policy=None, trends: dict = None):
     """
-    Calculates overall score and grade based on operational and financial metrics.
+    Calculates overall score and grade based on operational and financial metrics,
+    and year-over-year financial `trends` when statements for several years were
+    given, using the active scoring policy (policies/default.yaml) unless one is given.
     """
-    score = 0
-    max_score = 100
+    policy = policy or current_policy()
     
-    # Operational Score (50%)
+    # Operational Score (50% by default)
     op_score = 0
     
-    # On-Time Delivery (25%)
-    otd = scorecard_metrics.get("on_time_delivery_rate")
-    if isinstance(otd, (int, float)):
-        # Normalize: 100% -> 25 pts, 0% -> 0 pts
-        op_score += (otd / 100) * 25
+    # On-Time Delivery and Invoice Paid Rate
+    # Normalize: 100% -> full weight, 0% -> 0 pts
+    for metric, weight in policy.operational.items():
+        value = scorecard_metrics.get(metric)
+        if _is_number(value):
+            op_score += (value / 100) * weight
         
-    # Invoice Paid Rate (25%)
-    ipr = scorecard_metrics.get("invoice_paid_rate")
-    if isinstance(ipr, (int, float)):
-        op_score += (ipr / 100) * 25
-        
-    # Financial Score (50%)
+    # Financial Score (50% by default)
+    # Current Ratio, Net Margin and Debt to Equity, each scored by its threshold ladder
     fin_score = 0
-    
-    # Current Ratio (15%) - Target > 1.5
-    cr = financial_ratios.get("current_ratio")
-    if isinstance(cr, (int, float)):
-        if cr >= 1.5:
-            fin_score += 15
-        elif cr >= 1.0:
-            fin_score += 10
-        else:
-            fin_score += 5
-            
-    # Net Margin (15%) - Target > 10%
-    nm = financial_ratios.get("net_margin")
-    if isinstance(nm, (int, float)):
-        if nm >= 15:
-            fin_score += 15
-        elif nm >= 5:
-            fin_score += 10
-        elif nm > 0:
-            fin_score += 5
-            
-    # Debt to Equity (20%) - Target < 2.0
-    de = financial_ratios.get("debt_to_equity")
-    if isinstance(de, (int, float)):
-        if de <= 1.0:
-            fin_score += 20
-        elif de <= 2.0:
-            fin_score += 10
-        else:
-            fin_score += 0
-            
-    total_score = op_score + fin_score
+    for metric, ladder in policy.financial.items():
+        value = financial_ratios.get(metric)
+        if _is_number(value):
+            fin_score += ladder(value)
+
+    # Trend adjustments (revenue growth, margin drift, leverage change), which
+    # never take the total below 0
+    trend_score = 0
+    for metric, ladder in policy.trends.items():
+        value = (trends or {}).get(metric)
+        if _is_number(value):
+            trend_score += ladder(value)
+
+    base_score = op_score + fin_score
+    total_score = max(base_score + trend_score, min(base_score, 0))
     
     # Determine Grade
-    if total_score >= 85:
-        grade = "Great"
-    elif total_score >= 70:
-        grade = "Good"
-    elif total_score >= 50:
-        grade = "Fair"
-    else:
-        grade = "Poor"
+    grade = policy.grades(total_score)
         
     return {
         "score": round(total_score, 1),
         "grade": grade,
         "breakdown": {
             "operational_score": round(op_score, 1),
-            "financial_score": round(fin_score, 1)
+            "financial_score": round(fin_score, 1),
+            "trend_score": round(trend_score, 1)
         }
     }
 
-def identify_lender_concerns(scorecard_metrics: dict, financial_ratios: dict):
+def identify_lender_concerns(scorecard_metrics: dict, financial_ratios: dict, policy=None, trends: dict = None):
     """
     Identifies red flags for lenders.
     """
+    policy = policy or current_policy()
     concerns = []
+    metrics = {**(trends or {}), **financial_ratios, **scorecard_metrics}
     
-    # Operational Concerns
-    otd = scorecard_metrics.get("on_time_delivery_rate")
-    if isinstance(otd, (int, float)) and otd < 70:
-        concerns.append(f"Low On-Time Delivery Rate ({otd}%). Risk of supply chain disruption.")
-        
-    ipr = scorecard_metrics.get("invoice_paid_rate")
-    if isinstance(ipr, (int, float)) and ipr < 80:
-        concerns.append(f"Low Invoice Paid Rate ({ipr}%). Potential cash flow or dispute issues.")
-        
-    # Financial Concerns
-    cr = financial_ratios.get("current_ratio")
-    if isinstance(cr, (int, float)) and cr < 1.0:
-        concerns.append(f"Current Ratio is low ({cr}). Liquidity risk.")
-        
-    de = financial_ratios.get("debt_to_equity")
-    if isinstance(de, (int, float)) and de > 2.5:
-        concerns.append(f"High Leverage (Debt/Equity: {de}). Solvency risk.")
-        
-    nm = financial_ratios.get("net_margin")
-    if isinstance(nm, (int, float)) and nm < 0:
-        concerns.append(f"Negative Net Margin ({nm}%). Company is operating at a loss.")
+    # Operational concerns first, then financial ones, in policy order
+    for _, metric, _, compare, threshold, message in policy.concerns:
+        value = metrics.get(metric)
+        if _is_number(value) and compare(value, threshold):
+            concerns.append(message.format(value=value))
         
     return concerns
 
@@ -0,0 +1,92 @@
+import io
+import os
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+# Upload size limits. Oversized requests are refused from their Content-Length
+# before any of the body is read (or as soon as a chunked body passes the
+# limit); single files over MAX_FILE_BYTES are refused before they are parsed.
+MAX_FILE_BYTES = int(os.getenv("SUPPLIER_EVAL_MAX_FILE_BYTES", str(512 * 1024 * 1024)))
+MAX_REQUEST_BYTES = int(os.getenv("SUPPLIER_EVAL_MAX_REQUEST_BYTES", str(1024 * 1024 * 1024)))
+
+
+def _size(size: int) -> str:
+    if size < 1024 * 1024:
+        return f"{size:,} bytes"
+    return f"{size / (1024 * 1024):,.1f} MB"
+
+
+def request_too_large(limit: int = MAX_REQUEST_BYTES, size: int = None) -> str:
+    if size is None:
+        return f"Request body is over the limit of {_size(limit)} per request"
+    return f"Request body is {_size(size)}; the limit is {_size(limit)} per request"
+
+
+def oversized_file(files: list, limit: int = MAX_FILE_BYTES):
+    """
+    The 413 message for the first upload in `files` over `limit` bytes, or None.
+    """
+    for file in files:
+        if file is not None and (file.size or 0) > limit:
+            return f"{file.filename} is {_size(file.size)}; the limit is {_size(limit)} per file"
+    return None
+
+
+def upload_source(file):
+    """
+    What to hand a parser for an upload without reading it into memory: a path
+    to the upload's spooled temporary file that worker processes can open too
+    (/proc/<pid>/fd/<n>, Linux only), or else the upload's bytes.
+
+    Starlette keeps uploads under 1 MB in memory; those are rolled over to their
+    temporary file first, so every upload is read the same way.
+    """
+    spooled = file.file
+    try:
+        # SpooledTemporaryFile.fileno() rolls the upload over to disk
+        descriptor = spooled.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        descriptor = None
+    if descriptor is not None:
+        path = f"/proc/{os.getpid()}/fd/{descriptor}"
+        if os.path.exists(path):
+            return path
+    spooled.seek(0)
+    return spooled.read()
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware answering 413 for request bodies over `max_bytes`: at once
+    when Content-Length says so, else as soon as the bytes received pass it.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": request_too_large(self.max_bytes, int(length))}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised while the app reads the body; FastAPI answers it as a 413
+                    raise HTTPException(status_code=413, detail=request_too_large(self.max_bytes))
+            return message
+
+        await self.app(scope, receive_limited, send)
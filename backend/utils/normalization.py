@@ -1,57 +1,289 @@
+import hashlib
+import logging
+import os
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+PO_COLUMN_MAP = {
+    "po number": "po_number",
+    "po #": "po_number",
+    "order number": "po_number",
+    "date": "date",
+    "order date": "date",
+    "sku": "sku",
+    "item": "sku",
+    "quantity": "quantity",
+    "qty": "quantity",
+    "delivery date": "delivery_date",
+    "promised date": "delivery_date",
+    "vendor": "vendor",
+    "supplier": "vendor",
+    "amount": "amount",
+    "po amount": "amount",
+    "line amount": "amount",
+    # Case A specific
+    "oms_po_nbr": "po_number",
+    "issue_date": "date",
+    "must_arrive_by_date": "promised_date",
+    "del_gate_in_date": "delivery_date",
+    "item_id": "sku",
+    "ordered_qty": "quantity",
+    "po_amt": "amount"
+}
+
+INVOICE_COLUMN_MAP = {
+    "invoice number": "invoice_number",
+    "inv #": "invoice_number",
+    "po number": "po_number",
+    "po #": "po_number",
+    "amount": "amount",
+    "total": "amount",
+    "date": "date",
+    "invoice date": "date",
+    "status": "status",
+    "payment status": "status",
+    "sku": "sku",
+    "item": "sku",
+    "quantity": "quantity",
+    "qty": "quantity",
+    "vendor": "vendor",
+    "supplier": "vendor",
+    # Used to derive status when there is no status column
+    "amount_paid": "amount_paid",
+    "date_paid": "date_paid",
+    # Case A specific
+    "inv_nbr": "invoice_number",
+    "invoice_nbr": "invoice_number",
+    "po_nbr": "po_number",
+    "inv_amt": "amount",
+    "invoice_amt_due": "amount",
+    "inv_dt": "date",
+    "invoice_date": "date",
+    "inv_status": "status",
+    "item_id": "sku",
+    "inv_qty": "quantity",
+    "invoiced_qty": "quantity"
+}
+
+COLUMN_MAPS = {"po": PO_COLUMN_MAP, "invoice": INVOICE_COLUMN_MAP}
+
+# Headers that are not an exact key of the maps above are matched to canonical
+# fields on their tokens. A fuzzy match needs at least this confidence (0-1);
+# exact names always score 1.
+MATCH_THRESHOLD = float(os.getenv("SUPPLIER_EVAL_HEADER_MATCH_THRESHOLD", "0.7"))
+
+# Abbreviations in real exports, expanded before tokens are compared
+TOKEN_SYNONYMS = {
+    "#": "number",
+    "no": "number",
+    "nbr": "number",
+    "num": "number",
+    "qty": "quantity",
+    "amt": "amount",
+    "dt": "date",
+    "inv": "invoice",
+    "del": "delivery",
+}
+# Words too generic to identify a field on their own ("ship date" is not "date")
+GENERIC_TOKENS = {"date", "number", "id", "code", "name"}
+# Fields that key records for reconciliation. A header with a descriptive word
+# ("Item Description") never fuzzy-matches one, and of two otherwise equal
+# matches the header with an identifier word ("Item Number") wins.
+IDENTIFIER_FIELDS = {"po_number", "invoice_number", "sku"}
+DESCRIPTIVE_TOKENS = {"description", "desc", "name", "text"}
+IDENTIFIER_TOKENS = {"number", "id", "code"}
+# Two tokens within this SequenceMatcher ratio are the same word (typos, plurals)
+TOKEN_SIMILARITY = 0.85
+
+def normalize_header(header) -> str:
+    return str(header).strip().lower()
+
+def _tokens(header: str) -> tuple:
+    """
+    Words of a header: camelCase, punctuation and underscores split, known
+    abbreviations expanded, "purchase order" shortened to "po".
+    """
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", str(header)).lower()
+    words = [TOKEN_SYNONYMS.get(word, word) for word in re.findall(r"[a-z0-9]+|#", text)]
+    tokens = []
+    for word in words:
+        if word == "order" and tokens and tokens[-1] == "purchase":
+            tokens[-1] = "po"
+        else:
+            tokens.append(word)
+    return tuple(tokens)
+
+def _aliases(file_type: str) -> dict:
+    """
+    Canonical field -> token tuples of every name it is known by, its own name
+    included.
+    """
+    aliases = {}
+    for name, field in COLUMN_MAPS.get(file_type, {}).items():
+        aliases.setdefault(field, {_tokens(field)}).add(_tokens(name))
+    return aliases
+
+FIELD_ALIASES = {file_type: _aliases(file_type) for file_type in COLUMN_MAPS}
+
+def _same_token(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    if a.isdigit() or b.isdigit() or min(len(a), len(b)) < 4:
+        return False
+    matcher = SequenceMatcher(None, a, b)
+    return matcher.real_quick_ratio() >= TOKEN_SIMILARITY and matcher.ratio() >= TOKEN_SIMILARITY
+
+def _similarity(header_tokens: tuple, alias_tokens: tuple) -> float:
+    """
+    Confidence that a header with `header_tokens` names the alias: 0.95 for
+    the same words, 0.9 when they only differ by typos, 0.7-0.9 when the header
+    contains all of the alias's words, one of them specific ("total amount"
+    vs "amount"), and a
+    token overlap / string similarity blend below that.
+    """
+    if set(header_tokens) == set(alias_tokens):
+        return 0.95
+    unmatched = list(header_tokens)
+    matched = 0
+    specific = False
+    for token in alias_tokens:
+        for i, candidate in enumerate(unmatched):
+            if _same_token(token, candidate):
+                del unmatched[i]
+                matched += 1
+                specific = specific or token not in GENERIC_TOKENS
+                break
+    if not matched:
+        return 0.0
+    if matched == len(alias_tokens) == len(header_tokens):
+        return 0.9
+    if matched == len(alias_tokens) and specific:
+        return 0.7 + 0.2 * matched / len(header_tokens)
+    overlap = matched / (len(header_tokens) + len(alias_tokens) - matched)
+    return 0.5 * overlap + 0.4 * SequenceMatcher(None, " ".join(header_tokens), " ".join(alias_tokens)).ratio()
+
+@lru_cache(maxsize=4096)
+def field_scores(header: str, file_type: str = "po") -> tuple:
+    """
+    (confidence, rank, field) for every canonical field a raw header could
+    name, best first. Rank orders the exact (confidence 1) matches:
+      0  a key of the column map that is also the field's own name
+      1  the field's own name in another spelling ("DeliveryDate")
+      2  a key of the column map for the field ("promised date" -> delivery_date)
+      3  the field's own name, when the header is a key for another field, so
+         "promised date" alone still means delivery_date but takes
+         promised_date when a delivery date column is present
+    Fuzzy matches rank 4, or 5 for an identifier field named by a header
+    without an identifier word. Cached per header, so sniffing header rows
+    stays cheap.
+    """
+    column_map = COLUMN_MAPS.get(file_type, {})
+    name = normalize_header(header)
+    tokens = _tokens(str(header).strip())
+    scores = []
+    for field, aliases in FIELD_ALIASES.get(file_type, {}).items():
+        own_name = tokens == _tokens(field)
+        if column_map.get(name) == field:
+            scores.append((1.0, 0 if own_name else 2, field))
+        elif own_name:
+            scores.append((1.0, 3 if name in column_map else 1, field))
+        elif tokens:
+            identifier = field in IDENTIFIER_FIELDS
+            if identifier and DESCRIPTIVE_TOKENS.intersection(tokens):
+                continue
+            confidence = max(_similarity(tokens, alias) for alias in aliases)
+            if confidence >= MATCH_THRESHOLD:
+                rank = 5 if identifier and not IDENTIFIER_TOKENS.intersection(tokens) else 4
+                scores.append((round(confidence, 3), rank, field))
+    return tuple(sorted(scores, key=lambda score: (-score[0], score[1])))
+
+def header_signature(headers) -> str:
+    """
+    Stable hash of a header row, identifying an export format.
+    """
+    return hashlib.sha1("\x1f".join(normalize_header(h) for h in headers).encode("utf-8")).hexdigest()[:16]
+
+def _resolve(headers: tuple, file_type: str) -> dict:
+    # Best (header, field) pairs first; each header and each field is used once,
+    # so of two headers naming one field the better match keeps it and the
+    # other can still take its next-best field.
+    candidates = sorted(
+        (-confidence, rank, i, field)
+        for i, header in enumerate(headers)
+        for confidence, rank, field in field_scores(header, file_type)
+    )
+    mapping, confidence = {}, {}
+    taken = set()
+    for score, _, i, field in candidates:
+        if i in mapping or field in taken:
+            continue
+        mapping[i] = field
+        confidence[i] = -score
+        taken.add(field)
+    return {
+        "signature": header_signature(headers),
+        "columns": [
+            {"header": normalize_header(header), "field": mapping.get(i), "confidence": confidence.get(i, 0.0)}
+            for i, header in enumerate(headers)
+        ],
+    }
+
+@lru_cache(maxsize=256)
+def resolve_columns(headers: tuple, file_type: str = "po") -> dict:
+    """
+    Resolves a header row to canonical fields. Returns the row's signature and,
+    per header, the field it maps to (None if none does) with a confidence.
+    Cached per header row and file type: repeat uploads of the same export
+    format skip resolution. The result is shared, so do not modify it.
+    """
+    resolution = _resolve(tuple(str(header).strip() for header in headers), file_type)
+    fuzzy = [
+        f"'{column['header']}' -> {column['field']} ({column['confidence']:.2f})"
+        for column in resolution["columns"]
+        if column["field"] and column["confidence"] < 1.0
+    ]
+    if fuzzy:
+        logger.info("New %s header format %s: %s", file_type, resolution["signature"], ", ".join(fuzzy))
+    return resolution
+
+def resolution_cache_info() -> dict:
+    info = resolve_columns.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "formats": info.currsize}
+
+def header_row_score(cells, file_type="po") -> float:
+    """
+    How much a row looks like the header of a `file_type` table: the summed
+    confidence of its cells that resolve to distinct canonical fields. Data
+    rows (numbers, dates, codes) score about 0.
+    """
+    headers = tuple(cell.strip() for cell in cells if isinstance(cell, str) and cell.strip() and len(cell) <= 64)
+    return sum(column["confidence"] for column in _resolve(headers, file_type)["columns"])
+
+def mapped_columns(headers, file_type="po") -> list:
+    """
+    The raw headers of a header row that resolve to a canonical field.
+    """
+    resolution = resolve_columns(tuple(headers), file_type)
+    return [header for header, column in zip(headers, resolution["columns"]) if column["field"]]
+
+def is_mapped_column(header, file_type="po") -> bool:
+    """
+    True if the raw header maps to (or already is) a canonical column, i.e. it
+    would survive normalization with a known name.
+    """
+    return bool(field_scores(str(header).strip(), file_type))
 
 def normalize_columns(df, file_type="po"):
     """
-    Normalizes dataframe columns based on file type.
-    """
-    df.columns = df.columns.str.strip().str.lower()
-    
-    column_map = {}
-    
-    if file_type == "po":
-        column_map = {
-            "po number": "po_number",
-            "po #": "po_number",
-            "order number": "po_number",
-            "date": "date",
-            "order date": "date",
-            "sku": "sku",
-            "item": "sku",
-            "quantity": "quantity",
-            "qty": "quantity",
-            "delivery date": "delivery_date",
-            "promised date": "delivery_date",
-            "vendor": "vendor",
-            "supplier": "vendor",
-            # Case A specific
-            "oms_po_nbr": "po_number",
-            "issue_date": "date",
-            "must_arrive_by_date": "promised_date",
-            "del_gate_in_date": "delivery_date",
-            "item_id": "sku",
-            "ordered_qty": "quantity"
-        }
-    elif file_type == "invoice":
-        column_map = {
-            "invoice number": "invoice_number",
-            "inv #": "invoice_number",
-            "po number": "po_number",
-            "po #": "po_number",
-            "amount": "amount",
-            "total": "amount",
-            "date": "date",
-            "invoice date": "date",
-            "status": "status",
-            "payment status": "status",
-            # Case A specific
-            "inv_nbr": "invoice_number",
-            "invoice_nbr": "invoice_number",
-            "po_nbr": "po_number",
-            "inv_amt": "amount",
-            "invoice_amt_due": "amount",
-            "inv_dt": "date",
-            "invoice_date": "date",
-            "inv_status": "status"
-        }
-        
-    df = df.rename(columns=column_map)
+    Normalizes dataframe columns based on file type: headers are lower-cased
+    and the ones that resolve to a canonical field renamed to it (see
+    resolve_columns).
+    """
+    resolution = resolve_columns(tuple(df.columns), file_type)
+    df.columns = [
+        column["field"] or column["header"] for column in resolution["columns"]
+    ]
     return df
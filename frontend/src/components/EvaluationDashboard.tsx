@@ -4,28 +4,47 @@ import { ScoreGauge } from "./ScoreGauge";
 import { MetricCard } from "./MetricCard";
 import { TrendingUp, DollarSign, Clock, AlertTriangle, CheckCircle2 } from "lucide-react";
 
+// Results stream in stage by stage, so every part may still be missing
 interface EvaluationData {
-  supplier_grade: string;
-  overall_score: number;
-  rationale: string;
-  lender_concerns: string[];
-  strengths: string[];
+  supplier_grade?: string;
+  overall_score?: number;
+  rationale?: string;
+  lender_concerns?: string[];
+  strengths?: string[];
   details: {
-    operational_metrics: {
-      on_time_delivery_rate: number;
-      invoice_paid_rate: number;
+    operational_metrics?: {
+      on_time_delivery_rate: number | string;
+      invoice_paid_rate: number | string;
     };
-    financial_ratios: {
-      current_ratio: number;
-      debt_to_equity: number;
+    financial_ratios?: {
+      current_ratio?: number | string;
+      debt_to_equity?: number | string;
+    };
+    // Empty unless statements for two or more fiscal years were uploaded
+    financial_trends?: {
+      from_year?: number;
+      to_year?: number;
+      revenue_growth?: number | null;
+      net_margin_change?: number | null;
+      debt_to_equity_change?: number | null;
     };
   };
 }
 
+// Metric values can be "N/A (...)" strings; undefined means not computed yet
+const formatMetric = (value: number | string | undefined, digits: number) => {
+  if (value === undefined) return "…";
+  return typeof value === "number" ? value.toFixed(digits) : value;
+};
+
 interface EvaluationDashboardProps {
   data: EvaluationData | null;
 }
 
+const Pending = ({ label }: { label: string }) => (
+  <p className="text-sm text-muted-foreground animate-pulse">{label}</p>
+);
+
 export const EvaluationDashboard = ({ data }: EvaluationDashboardProps) => {
   if (!data) {
     return (
@@ -50,10 +69,18 @@ export const EvaluationDashboard = ({ data }: EvaluationDashboardProps) => {
             <h3 className="text-sm font-medium text-muted-foreground uppercase tracking-wider">
               Supplier Grade
             </h3>
-            <GradeBadge grade={data.supplier_grade} />
+            {data.supplier_grade !== undefined ? (
+              <GradeBadge grade={data.supplier_grade} />
+            ) : (
+              <Pending label="Scoring…" />
+            )}
           </div>
           <div className="flex flex-col items-center">
-            <ScoreGauge score={data.overall_score} />
+            {data.overall_score !== undefined ? (
+              <ScoreGauge score={data.overall_score} />
+            ) : (
+              <Pending label="Waiting for scorecard and financials…" />
+            )}
           </div>
         </div>
       </Card>
@@ -61,7 +88,16 @@ export const EvaluationDashboard = ({ data }: EvaluationDashboardProps) => {
       {/* Analysis Rationale */}
       <Card className="p-6 shadow-card bg-gradient-card">
         <h3 className="text-lg font-semibold text-foreground mb-3">Analysis</h3>
-        <p className="text-muted-foreground leading-relaxed">{data.rationale}</p>
+        {data.rationale !== undefined ? (
+          <p className="text-muted-foreground leading-relaxed">{data.rationale}</p>
+        ) : (
+          <Pending label="Scoring…" />
+        )}
+        {data.rationale !== undefined && data.strengths === undefined && (
+          <div className="mt-3">
+            <Pending label="Generating detailed analysis…" />
+          </div>
+        )}
       </Card>
 
       {/* Metrics Grid */}
@@ -69,27 +105,39 @@ export const EvaluationDashboard = ({ data }: EvaluationDashboardProps) => {
         <MetricCard
           icon={Clock}
           label="On-Time Delivery"
-          value={data.details.operational_metrics.on_time_delivery_rate.toFixed(1)}
+          value={formatMetric(data.details.operational_metrics?.on_time_delivery_rate, 1)}
           suffix="%"
         />
         <MetricCard
           icon={DollarSign}
           label="Invoice Paid Rate"
-          value={data.details.operational_metrics.invoice_paid_rate.toFixed(1)}
+          value={formatMetric(data.details.operational_metrics?.invoice_paid_rate, 1)}
           suffix="%"
         />
         <MetricCard
           icon={TrendingUp}
           label="Current Ratio"
-          value={data.details.financial_ratios.current_ratio.toFixed(2)}
+          value={formatMetric(data.details.financial_ratios?.current_ratio, 2)}
         />
         <MetricCard
           icon={DollarSign}
           label="Debt-to-Equity"
-          value={data.details.financial_ratios.debt_to_equity.toFixed(2)}
+          value={formatMetric(data.details.financial_ratios?.debt_to_equity, 2)}
         />
       </div>
 
+      {/* Year-over-year trends */}
+      {data.details.financial_trends?.to_year !== undefined && (
+        <Card className="p-4 shadow-card bg-gradient-card">
+          <p className="text-sm text-muted-foreground">
+            {data.details.financial_trends.from_year} → {data.details.financial_trends.to_year}: revenue{" "}
+            {formatMetric(data.details.financial_trends.revenue_growth ?? "N/A", 1)}%, net margin{" "}
+            {formatMetric(data.details.financial_trends.net_margin_change ?? "N/A", 1)} pts, debt-to-equity{" "}
+            {formatMetric(data.details.financial_trends.debt_to_equity_change ?? "N/A", 2)}
+          </p>
+        </Card>
+      )}
+
       {/* Risks and Strengths */}
       <div className="grid md:grid-cols-2 gap-6">
         <Card className="p-6 shadow-card bg-gradient-card">
@@ -97,8 +145,9 @@ export const EvaluationDashboard = ({ data }: EvaluationDashboardProps) => {
             <AlertTriangle className="w-5 h-5 text-destructive" />
             <h3 className="text-lg font-semibold text-foreground">Lender Concerns</h3>
           </div>
+          {data.lender_concerns === undefined && <Pending label="Scoring…" />}
           <ul className="space-y-3">
-            {data.lender_concerns.map((concern, index) => (
+            {(data.lender_concerns ?? []).map((concern, index) => (
               <li key={index} className="flex items-start gap-2 text-sm text-muted-foreground">
                 <span className="w-1.5 h-1.5 bg-destructive rounded-full mt-2 flex-shrink-0" />
                 <span>{concern}</span>
@@ -112,8 +161,9 @@ export const EvaluationDashboard = ({ data }: EvaluationDashboardProps) => {
             <CheckCircle2 className="w-5 h-5 text-success" />
             <h3 className="text-lg font-semibold text-foreground">Strengths</h3>
           </div>
+          {data.strengths === undefined && <Pending label="Generating detailed analysis…" />}
           <ul className="space-y-3">
-            {data.strengths.map((strength, index) => (
+            {(data.strengths ?? []).map((strength, index) => (
               <li key={index} className="flex items-start gap-2 text-sm text-muted-foreground">
                 <span className="w-1.5 h-1.5 bg-success rounded-full mt-2 flex-shrink-0" />
                 <span>{strength}</span>
@@ -6,6 +6,8 @@ import { useToast } from "@/hooks/use-toast";
 
 interface FileUploadProps {
   onUploadComplete: (data: any) => void;
+  // Called with the evaluation so far each time a stage of it arrives
+  onPartialResult?: (data: any) => void;
 }
 
 interface FileCategory {
@@ -14,7 +16,24 @@ interface FileCategory {
   files: File[];
 }
 
-export const FileUpload = ({ onUploadComplete }: FileUploadProps) => {
+// Folds one NDJSON stage of /upload/full_evaluation/stream into the evaluation so far
+const applyStage = (evaluation: any, event: any) => {
+  const { stage, data } = event;
+  if (stage === "error") {
+    throw new Error(event.detail || "Evaluation failed");
+  }
+  if (stage === "scorecard" || stage === "financials") {
+    return { ...evaluation, details: { ...evaluation.details, ...data } };
+  }
+  if (stage === "score") {
+    const { score_breakdown, ...score } = data;
+    return { ...evaluation, ...score, details: { ...evaluation.details, score_breakdown } };
+  }
+  // "analysis" carries the complete evaluation
+  return data;
+};
+
+export const FileUpload = ({ onUploadComplete, onPartialResult }: FileUploadProps) => {
   const { toast } = useToast();
   const [isUploading, setIsUploading] = useState(false);
   const [categories] = useState<FileCategory[]>([
@@ -76,7 +95,7 @@ export const FileUpload = ({ onUploadComplete }: FileUploadProps) => {
 
     try {
       console.log("Starting upload to backend...");
-      const response = await fetch("https://c5269af321bf.ngrok-free.app/upload/full_evaluation", {
+      const response = await fetch("https://c5269af321bf.ngrok-free.app/upload/full_evaluation/stream", {
         method: "POST",
         headers: {
           "ngrok-skip-browser-warning": "69420",
@@ -92,7 +111,27 @@ export const FileUpload = ({ onUploadComplete }: FileUploadProps) => {
         throw new Error(`Upload failed: ${response.status} ${response.statusText}`);
       }
 
-      const data = await response.json();
+      // One JSON line per stage, as soon as the backend has it
+      const reader = response.body!.getReader();
+      const decoder = new TextDecoder();
+      let buffered = "";
+      let data: any = { details: {} };
+      for (;;) {
+        const { done, value } = await reader.read();
+        buffered += decoder.decode(value, { stream: !done });
+        const lines = buffered.split("\n");
+        buffered = done ? "" : lines.pop()!;
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          console.log("Received stage:", event.stage);
+          data = applyStage(data, event);
+          if (event.stage !== "analysis") {
+            onPartialResult?.(data);
+          }
+        }
+        if (done) break;
+      }
       console.log("Upload successful, received data:", data);
       onUploadComplete(data);
       
@@ -21,7 +21,7 @@ const Index = () => {
 
       {/* Main Content */}
       <main className="container mx-auto px-4 py-8 space-y-8">
-        <FileUpload onUploadComplete={setEvaluationData} />
+        <FileUpload onUploadComplete={setEvaluationData} onPartialResult={setEvaluationData} />
         <EvaluationDashboard data={evaluationData} />
       </main>
     </div>